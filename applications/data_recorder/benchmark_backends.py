@@ -0,0 +1,156 @@
+# benchmark_backends.py
+
+import os
+import glob
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from modules.inference_backends import BACKENDS
+from modules.model_registry import registry
+from modules.detection import load_detr, run_detr, prepare_detection_input
+from modules.image_captioning import load_blip, BLIP_LARGE_MODEL_ID
+from modules.depth_estimation import initialize_depth_pipeline
+from modules.sort_tracker import iou_batch, linear_assignment
+
+
+MODELS = ("detr", "blip", "depth")
+
+
+def load_images(args):
+    """
+    The fixed image set: every image in --images, or the first --limit snapshot images
+    under --recordings, in sorted order so repeated runs use the same set.
+    """
+    if args.images:
+        paths = sorted(
+            path for path in glob.glob(os.path.join(args.images, "*"))
+            if path.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+    else:
+        paths = sorted(glob.glob(os.path.join(args.recordings, "*", "snapshot_*", "clean_image.jpg")))
+    paths = paths[:args.limit]
+    images = [cv2.imread(path) for path in paths]
+    return [image for image in images if image is not None]
+
+
+def run_model(name, backend, image, device):
+    if name == "detr":
+        processor, model = load_detr(device, backend=backend)
+        rgb, region = prepare_detection_input(image)
+        return run_detr(processor, model, [rgb], [region], 0.5, device)[0]
+    if name == "blip":
+        processor, model = load_blip(BLIP_LARGE_MODEL_ID, device, backend=backend)
+        inputs = processor(images=Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)), return_tensors="pt").to(device)
+        with torch.no_grad():
+            out = model.generate(**inputs, max_length=16, num_beams=4)
+        return processor.decode(out[0], skip_special_tokens=True)
+    if name == "depth":
+        pipe = initialize_depth_pipeline(device, backend=backend)
+        with torch.no_grad():
+            return np.asarray(pipe(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))["depth"], dtype=np.float32)
+    raise ValueError(name)
+
+
+def agreement(name, reference, output):
+    """
+    How closely a backend's output matches the eager output for the same image (1.0 = same).
+    """
+    if name == "detr":
+        if not reference and not output:
+            return 1.0
+        if not reference or not output:
+            return 0.0
+        overlaps = iou_batch([obj["box"] for obj in reference], [obj["box"] for obj in output])
+        same_label = np.array([[a["label"] == b["label"] for b in output] for a in reference])
+        valid = (overlaps >= 0.5) & same_label
+        # One-to-one matching: the most label+IoU>=0.5 pairs, higher IoU breaking ties
+        pairs = linear_assignment(-np.where(valid, 1.0 + overlaps, 0.0))
+        matched = int(valid[pairs[:, 0], pairs[:, 1]].sum())
+        # F1 of those matches against the eager detections
+        return 2 * matched / (len(reference) + len(output))
+    if name == "blip":
+        reference_words, output_words = set(reference.split()), set(output.split())
+        if not reference_words and not output_words:
+            return 1.0
+        return len(reference_words & output_words) / len(reference_words | output_words)
+    if name == "depth":
+        # 1 - mean absolute error of the normalised depth maps
+        reference = (reference - reference.min()) / max(float(np.ptp(reference)), 1e-6)
+        output = (output - output.min()) / max(float(np.ptp(output)), 1e-6)
+        return float(1.0 - np.mean(np.abs(reference - output)))
+    raise ValueError(name)
+
+
+def benchmark(name, backends, images, device, warmup):
+    rows = []
+    reference = None
+    for backend in backends:
+        start = time.perf_counter()
+        try:
+            run_model(name, backend, images[0], device)
+        except Exception as e:
+            print(f"{name}/{backend}: failed ({e})")
+            continue
+        load_seconds = time.perf_counter() - start
+        for image in images[:warmup]:
+            run_model(name, backend, image, device)
+
+        outputs, latencies = [], []
+        for image in images:
+            start = time.perf_counter()
+            outputs.append(run_model(name, backend, image, device))
+            latencies.append((time.perf_counter() - start) * 1000)
+        if reference is None:
+            reference = outputs
+
+        rows.append({
+            "model": name,
+            "backend": backend,
+            "images": len(images),
+            "load_and_first_call_s": round(load_seconds, 2),
+            "median_ms": round(float(np.median(latencies)), 1),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+            "agreement": round(float(np.mean([agreement(name, r, o) for r, o in zip(reference, outputs)])), 3),
+        })
+        print(f"{name:>6} {backend:>8} {rows[-1]['median_ms']:10.1f} {rows[-1]['p95_ms']:9.1f} {rows[-1]['agreement']:10.3f}")
+        # Free the model before loading the next variant
+        registry.clear()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compares latency and output agreement of the inference backends on a fixed image set."
+    )
+    parser.add_argument("--images", default=None, help="Directory of images to use")
+    parser.add_argument("--recordings", default="recordings", help="Use snapshot images from here if --images is not given")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of images")
+    parser.add_argument("--models", default=",".join(MODELS), help=f"Comma separated subset of {MODELS}")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help=f"Comma separated subset of {BACKENDS}")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed calls per backend (torch.compile compiles here)")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--output", default="backend_report.json", help="Where to write the report")
+    args = parser.parse_args()
+
+    images = load_images(args)
+    if not images:
+        parser.error("No images found; pass --images or record some snapshots first")
+
+    # eager always runs first: it is the reference for agreement
+    backends = ["eager"] + [backend for backend in args.backends.split(",") if backend != "eager"]
+    print(f"{'model':>6} {'backend':>8} {'median ms':>10} {'p95 ms':>9} {'agreement':>10}")
+    report = []
+    for name in args.models.split(","):
+        report.extend(benchmark(name, backends, images, args.device, args.warmup))
+
+    with open(args.output, "w") as f:
+        json.dump({"device": args.device, "torch": torch.__version__, "results": report}, f, indent=4)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmark_emotions.py
+
+import os
+import glob
+import json
+import time
+import argparse
+import cv2
+from modules.emotion_detection import EmotionAnalyzer, FACE_DETECTORS
+
+
+def load_images(args):
+    """
+    The first --limit snapshot images under --recordings (or every image in --images),
+    in sorted order so repeated runs use the same set.
+    """
+    if args.images:
+        paths = sorted(
+            path for path in glob.glob(os.path.join(args.images, "*"))
+            if path.lower().endswith((".jpg", ".jpeg", ".png"))
+        )
+    else:
+        paths = sorted(glob.glob(os.path.join(args.recordings, "*", "snapshot_*", "clean_image.jpg")))
+    images = [cv2.imread(path) for path in paths[:args.limit]]
+    return [image for image in images if image is not None]
+
+
+def benchmark_deepface_analyze(images):
+    """
+    The previous approach: one DeepFace.analyze call per image.
+    """
+    from deepface import DeepFace
+    DeepFace.analyze(images[0], actions=["emotion"], enforce_detection=False, silent=True)
+    start = time.perf_counter()
+    faces = 0
+    for image in images:
+        faces += len(DeepFace.analyze(image, actions=["emotion"], enforce_detection=False, silent=True))
+    seconds = time.perf_counter() - start
+    return {"method": "DeepFace.analyze", "detector": "opencv", "batch_size": 1, "faces": faces,
+            "images_without_faces": None, "seconds": seconds}
+
+
+def benchmark_analyzer(images, detector, batch_size):
+    analyzer = EmotionAnalyzer(detector)
+    # Warm up: loads the models and builds the Keras graph
+    analyzer.analyze_batch(images[:batch_size])
+    analyzer.images = analyzer.faces = analyzer.images_without_faces = 0
+    start = time.perf_counter()
+    for offset in range(0, len(images), batch_size):
+        analyzer.analyze_batch(images[offset:offset + batch_size])
+    seconds = time.perf_counter() - start
+    stats = analyzer.stats()
+    return {"method": "EmotionAnalyzer", "detector": detector, "batch_size": batch_size, "faces": stats["faces"],
+            "images_without_faces": stats["images_without_faces"], "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures emotion analysis throughput on recorded snapshots."
+    )
+    parser.add_argument("--images", default=None, help="Directory of images to use")
+    parser.add_argument("--recordings", default="recordings", help="Use snapshot images from here if --images is not given")
+    parser.add_argument("--limit", type=int, default=200, help="Maximum number of images")
+    parser.add_argument("--detectors", default="opencv", help=f"Comma separated subset of {FACE_DETECTORS}")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma separated batch sizes")
+    parser.add_argument("--skip-baseline", action="store_true", help="Do not time per-image DeepFace.analyze")
+    parser.add_argument("--output", default="emotion_report.json", help="Where to write the report")
+    args = parser.parse_args()
+
+    images = load_images(args)
+    if not images:
+        parser.error("No images found; pass --images or record some snapshots first")
+
+    runs = []
+    if not args.skip_baseline:
+        runs.append(lambda: benchmark_deepface_analyze(images))
+    for detector in args.detectors.split(","):
+        for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+            runs.append(lambda detector=detector, batch_size=batch_size: benchmark_analyzer(images, detector, batch_size))
+
+    print(f"{len(images)} images")
+    print(f"{'method':>17} {'detector':>10} {'batch':>6} {'images/s':>9} {'faces':>6} {'no face':>8}")
+    report = []
+    for run in runs:
+        try:
+            row = run()
+        except Exception as e:
+            print(f"Run failed: {e}")
+            continue
+        row["images"] = len(images)
+        row["images_per_second"] = round(len(images) / row["seconds"], 2) if row["seconds"] > 0 else 0.0
+        row["seconds"] = round(row["seconds"], 2)
+        report.append(row)
+        without_faces = "-" if row["images_without_faces"] is None else row["images_without_faces"]
+        print(f"{row['method']:>17} {row['detector']:>10} {row['batch_size']:>6} "
+              f"{row['images_per_second']:>9.1f} {row['faces']:>6} {without_faces:>8}")
+
+    with open(args.output, "w") as f:
+        json.dump({"results": report}, f, indent=4)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
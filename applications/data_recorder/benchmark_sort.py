@@ -0,0 +1,148 @@
+# benchmark_sort.py
+
+import argparse
+import time
+import numpy as np
+from modules.sort_tracker import (
+    iou, iou_batch, linear_assignment, associate_detections_to_trackers, Sort, KalmanBoxTracker
+)
+
+
+def random_boxes(rng, count, width=640, height=480):
+    x1 = rng.uniform(0, width - 20, count)
+    y1 = rng.uniform(0, height - 20, count)
+    w = rng.uniform(10, 120, count)
+    h = rng.uniform(10, 120, count)
+    scores = rng.uniform(0.5, 1.0, count)
+    return np.stack([x1, y1, x1 + w, y1 + h, scores], axis=1)
+
+
+def jitter(rng, boxes, pixels=4.0):
+    moved = boxes.copy()
+    moved[:, :4] += rng.normal(0, pixels, (len(boxes), 4))
+    return moved
+
+
+def associate_loop(detections, trackers, iou_threshold=0.3):
+    """
+    The previous per-pair implementation, kept here as the baseline.
+    """
+    iou_matrix = np.zeros((len(detections), len(trackers)), dtype=np.float32)
+    for d, det in enumerate(detections):
+        for t, trk in enumerate(trackers):
+            iou_matrix[d, t] = iou(det[:4], trk[:4])
+    matched_indices = linear_assignment(-iou_matrix)
+
+    unmatched_detections = [d for d in range(len(detections)) if d not in matched_indices[:, 0]]
+    unmatched_trackers = [t for t in range(len(trackers)) if t not in matched_indices[:, 1]]
+    matches = []
+    for m in matched_indices:
+        if iou_matrix[m[0], m[1]] < iou_threshold:
+            unmatched_detections.append(m[0])
+            unmatched_trackers.append(m[1])
+        else:
+            matches.append(m)
+    return np.array(matches).reshape(-1, 2), np.array(unmatched_detections), np.array(unmatched_trackers)
+
+
+def moving_objects_sequence(rng, count, frames):
+    """
+    Synthetic detections for `count` objects moving at constant speed, with missed
+    detections, empty frames and per-frame shuffling.
+    """
+    position = rng.uniform(0, 500, (count, 2))
+    velocity = rng.normal(0, 3, (count, 2))
+    size = rng.uniform(20, 80, (count, 2))
+    sequence = []
+    for _ in range(frames):
+        position += velocity
+        boxes = np.concatenate([position, position + size, rng.uniform(0.5, 1.0, (count, 1))], axis=1)
+        boxes[:, :4] += rng.normal(0, 2, (count, 4))
+        boxes = boxes[rng.random(count) > 0.15]
+        if rng.random() < 0.05:
+            boxes = boxes[:0]
+        sequence.append(boxes[rng.permutation(len(boxes))])
+    return sequence
+
+
+def load_sequence(path):
+    """
+    Loads recorded detections from an .npz with a `frame` column (frame index per
+    detection) and a `dets` table ([x1,y1,x2,y2,score] per detection).
+    """
+    with np.load(path) as data:
+        frames, dets = data["frame"], data["dets"]
+    frame_count = int(frames.max()) + 1 if len(frames) else 0
+    return [dets[frames == index] for index in range(frame_count)]
+
+
+def run_tracker(sequence, batched):
+    KalmanBoxTracker.count = 0
+    tracker = Sort(max_age=5, min_hits=2, iou_threshold=0.3, batched=batched)
+    start = time.perf_counter()
+    outputs = [tracker.update(dets) for dets in sequence]
+    return outputs, (time.perf_counter() - start) / max(1, len(sequence)) * 1000
+
+
+def compare_trackers(name, sequence):
+    expected, per_object_ms = run_tracker(sequence, batched=False)
+    actual, batched_ms = run_tracker(sequence, batched=True)
+    identical = all(np.array_equal(e, a) for e, a in zip(expected, actual))
+    print(f"{name:>12} {per_object_ms:16.3f} {batched_ms:13.3f} {per_object_ms / batched_ms:7.1f}x {str(identical):>10}")
+    if not identical:
+        raise AssertionError(f"Batched Sort output differs from the per-object tracker on {name}")
+
+
+def time_call(func, repeats, *args):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func(*args)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks SORT association and the batched Kalman mode against the per-object baseline."
+    )
+    parser.add_argument("--sizes", default="1,5,10,25,50,100,200,500", help="Comma separated box counts")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=300, help="Frames per synthetic tracking sequence")
+    parser.add_argument("--sequence", action="append", default=[], help="Recorded detections (.npz) to replay")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    print(f"{'dets x trks':>12} {'loop iou (ms)':>14} {'batch iou (ms)':>15} {'loop assoc (ms)':>16} {'vector assoc (ms)':>18} {'speedup':>8}")
+    for size in sizes:
+        trackers = random_boxes(rng, size)
+        detections = jitter(rng, trackers)[rng.permutation(size)]
+
+        expected = associate_loop(detections, trackers)
+        actual = associate_detections_to_trackers(detections, trackers)
+        for e, a in zip(expected, actual):
+            if not np.array_equal(np.asarray(e, dtype=int), np.asarray(a, dtype=int)):
+                raise AssertionError(f"Vectorized association differs from the baseline at size {size}")
+
+        loop_repeats = max(1, args.repeats // 10) if size >= 200 else args.repeats
+        loop_iou = time_call(
+            lambda d, t: [[iou(a[:4], b[:4]) for b in t] for a in d], loop_repeats, detections, trackers
+        )
+        batch_iou = time_call(iou_batch, args.repeats, detections, trackers)
+        loop_assoc = time_call(associate_loop, loop_repeats, detections, trackers)
+        vector_assoc = time_call(associate_detections_to_trackers, args.repeats, detections, trackers)
+        print(f"{f'{size} x {size}':>12} {loop_iou:14.3f} {batch_iou:15.3f} {loop_assoc:16.3f} {vector_assoc:18.3f} {loop_assoc / vector_assoc:7.1f}x")
+
+    print()
+    print(f"{'objects':>12} {'per-object (ms)':>16} {'batched (ms)':>13} {'speedup':>8} {'identical':>10}")
+    for size in sizes:
+        if size > 200:
+            continue
+        compare_trackers(str(size), moving_objects_sequence(rng, size, args.frames))
+    for path in args.sequence:
+        compare_trackers(path, load_sequence(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# convert_sessions.py
+
+import os
+import argparse
+from modules.session_store import convert_session_directory, has_session_store
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Converts sessions recorded with per-snapshot JSON files into session stores."
+    )
+    parser.add_argument("--recordings", default="recordings", help="Base recordings directory")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Snapshots per store chunk")
+    parser.add_argument("--remove-json", action="store_true", help="Delete the JSON files after converting")
+    args = parser.parse_args()
+
+    for session_folder in sorted(os.listdir(args.recordings)):
+        session_path = os.path.join(args.recordings, session_folder)
+        if not os.path.isdir(session_path):
+            continue
+        if has_session_store(session_path):
+            print(f"Skipping {session_path}: already has a session store")
+            continue
+        count = convert_session_directory(session_path, chunk_size=args.chunk_size, remove_json=args.remove_json)
+        print(f"Converted {count} snapshots in {session_path}")
+
+
+if __name__ == "__main__":
+    main()
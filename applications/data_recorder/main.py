@@ -1,41 +1,86 @@
 # main.py
 
+import time
+_IMPORT_START = time.perf_counter()  # Used by the startup timing report
+
 import shutil
 import sys
-import json
 import threading
 import cv2
 import numpy as np
-import time
 import os
 import torch
 import wave
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QLabel, QLineEdit, QPushButton,
-    QVBoxLayout, QWidget, QFileDialog, QComboBox, QSlider
+    QVBoxLayout, QWidget, QFileDialog, QComboBox, QSlider, QCheckBox
 )
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtCore import QTimer, Qt, QThread
 from modules.speech_recognition import SpeechToTextWorker
-from modules.sort_tracker import Sort
 from modules.depth_estimation import initialize_depth_pipeline
-from modules.image_captioning import SFImageCaptioningThread
-from modules.audio_recording import AudioRecorderThread
-from modules.detection import LiveDetectionThread, detect_objects_with_huggingface
-from modules.emotion_detection import detect_emotions_deepface
-from modules.keypoint_detection import detect_keypoints_superpoint
-from modules.utils import simulate_joint_outputs
-from transformers import (
-    VisionEncoderDecoderModel, ViTImageProcessor, AutoTokenizer,
-    BlipProcessor, BlipForConditionalGeneration, ViltProcessor,
-    ViltForQuestionAnswering
+from modules.image_captioning import (
+    SFImageCaptioningThread, load_blip, load_vit_gpt2, load_vilt, BLIP_BASE_MODEL_ID
 )
-from PIL import Image
+from modules.audio_recording import AudioRecorderThread, resolve_audio_format
+from modules.detection import LiveDetectionThread, interpolate_tracks
+from modules.post_processing import BatchPostProcessingWorker
+from modules.utils import simulate_joint_outputs
+from modules.model_registry import registry
+from modules.inference_backends import configure_backends
+from modules.inference_scheduler import InferenceScheduler
+from modules.profiling import StartupTimer, latency
+from modules.session_store import SessionStoreWriter
+from modules.timing_index import TimingIndexWriter
+from modules.snapshot_writer import SnapshotWriter, SnapshotRequest
+from modules.capture_scheduler import CaptureScheduler
+from modules.frame_buffer import FrameRingBuffer
 
 
 # CONSTANTS AND GLOBALS
 FRAME_RATE = 20
 FEED_RESOLUTION = (1280, 720)
+POST_PROCESS_BATCH_SIZE = 8
+POST_PROCESS_WORKERS = 4
+FRAME_BUFFER_SLOTS = 4
+SNAPSHOT_WRITER_WORKERS = 2
+SNAPSHOT_QUEUE_SIZE = 32
+SNAPSHOT_BACKPRESSURE_POLICY = "drop"  # "drop", "oldest" or "block"
+SESSION_STORE_FLUSH_SECONDS = 5  # Snapshot rows buffered in memory are written at least this often
+# Model memory limits; both can be overridden with the environment variables
+# DATA_RECORDER_MODEL_MEMORY_MB and DATA_RECORDER_MODEL_IDLE_SECONDS ("none" disables them)
+MODEL_MEMORY_BUDGET_MB = None  # Cap for cached models, e.g. 4000; None keeps everything loaded
+MODEL_IDLE_EVICT_SECONDS = 600  # Unload cached models not used for this long; None keeps them
+MODEL_EVICT_CHECK_MS = 30000  # How often idle models are looked for
+LIVE_DETECTION_ADAPTIVE = True  # Detect every K frames and let the tracker predict in between
+LIVE_DETECTION_CPU_BUDGET = 0.5  # Share of wall time live detection may use (sets K)
+LIVE_DETECTION_LATENCY_MS = None  # Optional staleness target for tracked boxes, e.g. 500
+LIVE_DETECTION_INFERENCE_SIZE = 640  # Long side of the image DETR sees; None uses the processor default
+LIVE_DETECTION_ROI = False  # Detect in a crop around current tracks (full frame every few detections)
+INFERENCE_WORKERS = 2  # Worker threads shared by all live models
+INFERENCE_TORCH_THREADS = None  # torch.set_num_threads; None splits the cores between the workers
+LATENCY_TRACE_NAME = "latency_trace.json"  # Chrome trace format, open in chrome://tracing or Perfetto
+LATENCY_CSV_NAME = "latency_trace.csv"
+CAPTION_CHANGE_THRESHOLD = 0.04  # Mean thumbnail difference (0-1) needed before BLIP captions again
+CAPTION_STOP_TIMEOUT = 1.0  # Seconds stop_recording waits for the captioning thread
+AUDIO_FORMAT = "wav"  # "wav" or "flac" (lossless, about half the size; needs soundfile)
+# Speech to text for the Instruction/Intent fields: "google" (online) or "vosk" (offline,
+# streams partial text while speaking; needs a model from https://alphacephei.com/vosk/models)
+SPEECH_BACKEND = "google"
+VOSK_MODEL_PATH = "models/vosk-model-small-en-us-0.15"
+# Per-model inference backend: "eager", "int8" (CPU dynamic quantization) or "compile".
+# Pick settings per machine with benchmark_backends.py.
+INFERENCE_BACKENDS = {"detr": "eager", "blip": "eager", "depth": "eager"}
+
+def env_limit(name, default):
+    """
+    Returns the number in environment variable `name`, None for "none", else `default`.
+    """
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    return None if value.lower() == "none" else float(value)
+
 
 class DataRecorderApp(QMainWindow):
     """
@@ -47,34 +92,29 @@ class DataRecorderApp(QMainWindow):
       - Saves snapshot images, depth maps, JSON metadata, and audio (WAV) for training
       - Adds a confidence threshold slider for adjusting detection
       - Performs Facial Expression Recognition and Emotion Analysis in Post-Processing
+
+    Models are not loaded at startup; each one is loaded in the background through the
+    model registry the first time the feature that needs it is enabled.
     """
     def __init__(self):
         super().__init__()
+        self.startup = StartupTimer(start=_IMPORT_START)
+        self.startup.record("imports", time.perf_counter() - _IMPORT_START)
+        self.first_frame_shown = False
+        self.detection_announced = False
+
         # Set up
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.device = device
+        registry.set_memory_budget(env_limit("DATA_RECORDER_MODEL_MEMORY_MB", MODEL_MEMORY_BUDGET_MB))
+        self.model_idle_seconds = env_limit("DATA_RECORDER_MODEL_IDLE_SECONDS", MODEL_IDLE_EVICT_SECONDS)
+        configure_backends(INFERENCE_BACKENDS)
+        # Live models (detection, captioning) share one prioritized worker pool
+        self.inference = InferenceScheduler(num_workers=INFERENCE_WORKERS, torch_threads=INFERENCE_TORCH_THREADS)
+        self.inference.start()
         self.start_time = None
         self.num_snapshots = 0
-
-        # Initialize Depth Estimation Pipeline
-        self.depth_pipe = initialize_depth_pipeline()
-
-        # Initialize Captioning Models
-        self.caption_model = VisionEncoderDecoderModel.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-        self.feature_extractor = ViTImageProcessor.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-        self.caption_tokenizer = AutoTokenizer.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-
-        # Initialize Blip Processor and Model
         self.sf_captioning_thread = None  # To be initialized when recording starts
-        self.blip_processor = BlipProcessor.from_pretrained("salesforce/blip-image-captioning-base")
-        self.blip_model = BlipForConditionalGeneration.from_pretrained("salesforce/blip-image-captioning-base")
-
-        # Initialize VILT Processor and Model
-
-        self.vilt_processor = ViltProcessor.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
-        self.vilt_model = ViltForQuestionAnswering.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
-        self.vilt_model
-        self.vilt_model.eval()
 
 
         # Set up the main window
@@ -86,19 +126,30 @@ class DataRecorderApp(QMainWindow):
         # Initialize recording state
         self.recording = False
         self.session_dir = None
-        self.timer = QTimer(self)
+        self.session_store = None
+        self.timing_index = None
+        self.capture_scheduler = None
+        # Held while a snapshot is queued and while recording stops, so a snapshot never
+        # goes to a session store that stop_recording has already closed
+        self.recording_lock = threading.Lock()
         self.running = False
-        self.frame = None
+        self.frames = FrameRingBuffer(capacity=FRAME_BUFFER_SLOTS)
+        self.last_displayed_seq = 0
+        self.display_buffer = None
+        self.rgb_buffer = None
         self.lock = threading.Lock()
 
         # Live detection data
         self.live_detected_objects = []
+        self.live_tracks = None
+        self.previous_live_tracks = None
         self.live_joint_outputs = []
 
         # Confidence threshold for detection
         self.confidence_threshold = 0.5
 
         # Set up the main layout
+        ui_start = time.perf_counter()
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.main_layout = QVBoxLayout(self.central_widget)
@@ -120,12 +171,17 @@ class DataRecorderApp(QMainWindow):
         self.instruction_label = QLabel("Instruction:")
         self.main_layout.addWidget(self.instruction_label)
         self.instruction_input = QLineEdit()
+        self.instruction_input.textChanged.connect(self.on_instruction_changed)
         self.main_layout.addWidget(self.instruction_input)
 
         self.intent_label = QLabel("Intent:")
         self.main_layout.addWidget(self.intent_label)
         self.intent_input = QLineEdit()
+        self.intent_input.textChanged.connect(self.on_intent_changed)
         self.main_layout.addWidget(self.intent_input)
+        # Cached copies of the text fields, readable from the camera thread
+        self.current_instruction = ""
+        self.current_intent = ""
 
         # Slider for detection confidence threshold
         self.threshold_label = QLabel("Confidence: 0.50")
@@ -140,12 +196,32 @@ class DataRecorderApp(QMainWindow):
         self.threshold_slider.valueChanged.connect(self.on_threshold_changed)
         self.main_layout.addWidget(self.threshold_slider)
 
+        # Feature toggles (models load in the background the first time a feature is enabled)
+        self.live_detection_checkbox = QCheckBox("Live Detection")
+        self.live_detection_checkbox.setChecked(False)
+        self.live_detection_checkbox.toggled.connect(self.on_live_detection_toggled)
+        self.main_layout.addWidget(self.live_detection_checkbox)
+
+        self.live_captioning_checkbox = QCheckBox("Live Captioning (while recording)")
+        self.live_captioning_checkbox.setChecked(True)
+        self.main_layout.addWidget(self.live_captioning_checkbox)
+
+        self.latency_hud_checkbox = QCheckBox("Show Latency HUD")
+        self.latency_hud_checkbox.setChecked(False)
+        self.main_layout.addWidget(self.latency_hud_checkbox)
+
         # Snapshot interval
         self.interval_label = QLabel("Snapshot Interval (ms):")
         self.main_layout.addWidget(self.interval_label)
         self.interval_input = QLineEdit("1000")  # Changed default to 1000ms for better performance
         self.main_layout.addWidget(self.interval_input)
 
+        # Optional frame-count based sampling (overrides the interval when > 0)
+        self.frame_sampling_label = QLabel("Snapshot Every N Frames (0 = use interval):")
+        self.main_layout.addWidget(self.frame_sampling_label)
+        self.frame_sampling_input = QLineEdit("0")
+        self.main_layout.addWidget(self.frame_sampling_input)
+
         # Set Save Directory
         self.save_dir_button = QPushButton("Set Save Directory")
         self.save_dir_button.clicked.connect(self.set_save_directory)
@@ -183,18 +259,80 @@ class DataRecorderApp(QMainWindow):
         self.feedback_label = QLabel("")
         self.main_layout.addWidget(self.feedback_label)
 
+        # Snapshot writer status
+        self.snapshot_status_label = QLabel("")
+        self.main_layout.addWidget(self.snapshot_status_label)
+
+        # Background snapshot writer (JPEG encoding and disk I/O off the GUI thread)
+        self.snapshot_writer = SnapshotWriter(
+            num_workers=SNAPSHOT_WRITER_WORKERS,
+            max_queue=SNAPSHOT_QUEUE_SIZE,
+            policy=SNAPSHOT_BACKPRESSURE_POLICY
+        )
+        self.snapshot_writer.start()
+
         self.cap = None
         self.audio_thread = None  # Thread for audio recording
 
-        # Initialize SORT tracker
-        self.tracker = Sort(max_age=5, min_hits=2, iou_threshold=0.3)
+        self.startup.record("ui setup", time.perf_counter() - ui_start)
 
         # Start camera
-        self.start_camera()
+        with self.startup.stage("camera open"):
+            self.start_camera()
+
+        # Start the background detection thread (idle until Live Detection is enabled)
+        with self.startup.stage("detection thread start"):
+            self.detection_thread = LiveDetectionThread(
+                self,
+                interval=0.1,
+                adaptive=LIVE_DETECTION_ADAPTIVE,
+                cpu_budget=LIVE_DETECTION_CPU_BUDGET,
+                latency_ms=LIVE_DETECTION_LATENCY_MS,
+                inference_size=LIVE_DETECTION_INFERENCE_SIZE,
+                roi=LIVE_DETECTION_ROI
+            )
+            self.detection_thread.start()
+
+        # Unload models that have not been used for a while
+        if self.model_idle_seconds is not None:
+            self.model_evict_timer = QTimer(self)
+            self.model_evict_timer.timeout.connect(self.evict_idle_models)
+            self.model_evict_timer.start(MODEL_EVICT_CHECK_MS)
+
+        self.startup.mark("window ready")
+        print(self.startup.report())
+
+    # Models used by the (currently disabled) snapshot annotations, loaded on first access
+    @property
+    def depth_pipe(self):
+        return initialize_depth_pipeline(self.device)
+
+    @property
+    def caption_models(self):
+        return load_vit_gpt2(self.device)
+
+    @property
+    def blip_models(self):
+        return load_blip(BLIP_BASE_MODEL_ID, self.device)
+
+    @property
+    def vilt_models(self):
+        return load_vilt(self.device)
+
+    def on_live_detection_toggled(self, checked):
+        """
+        Enables/disables live detection. The DETR model is loaded on the detection thread
+        the first time this is switched on, so the GUI keeps running while it loads.
+        """
+        if checked and self.detection_thread.load_seconds is None:
+            self.feedback_label.setText("Loading detection model in the background...")
+        self.detection_thread.enabled = checked
+        if not checked:
+            with self.lock:
+                self.live_detected_objects = []
+                self.live_tracks = None
+                self.previous_live_tracks = None
 
-        # Start the background detection thread
-        self.detection_thread = LiveDetectionThread(self, interval=0.1)
-        self.detection_thread.start()
     def purge_recordings(self):
         """
         Deletes all files and subdirectories in the recordings folder.
@@ -216,104 +354,52 @@ class DataRecorderApp(QMainWindow):
     def post_process_snapshots(self):
         """
         Processes all `clean_image.jpg` files in snapshot folders and updates the associated JSON files.
+        Runs the batched post-processing engine on a background QThread.
         """
-        try:
-            if not os.path.exists(self.base_save_dir):
-                self.feedback_label.setText("Recordings folder does not exist.")
-                return
-
-            # Iterate over each session folder
-            for session_folder in os.listdir(self.base_save_dir):
-                session_path = os.path.join(self.base_save_dir, session_folder)
-                if not os.path.isdir(session_path):
-                    continue  # Skip if it's not a directory
-
-                for snapshot_folder in os.listdir(session_path):
-                    snapshot_path = os.path.join(session_path, snapshot_folder)
-                    if not os.path.isdir(snapshot_path):
-                        continue  # Skip if it's not a directory
-
-                    # Locate clean_image.jpg
-                    clean_image_path = os.path.join(snapshot_path, "clean_image.jpg")
-                    json_path = os.path.join(snapshot_path, f"data_{snapshot_folder.split('_')[-1]}.json")
-
-                    if not os.path.exists(clean_image_path) or not os.path.exists(json_path):
-                        print(f"Skipping incomplete snapshot folder: {snapshot_path}")
-                        continue
-
-                    # Load the clean image
-                    image = cv2.imread(clean_image_path)
-                    if image is None:
-                        print(f"Error reading image: {clean_image_path}")
-                        continue
-
-                    # Perform Post-Processing
-                    detected_objects = detect_objects_with_huggingface(image)
-                    emotions = detect_emotions_deepface(image)
-                    keypoints = detect_keypoints_superpoint(
-                        image,
-                        processor=self.detection_thread.processor,
-                        model=self.detection_thread.model,
-                        device=self.device
-                    )
-
-                    # Convert keypoints to Python-native types
-                    keypoints = keypoints.astype(float).tolist()
-
-                    # Convert detected objects' data to native types
-                    detected_objects = [
-                        {k: float(v) if isinstance(v, (np.integer, np.floating)) else v for k, v in obj.items()}
-                        for obj in detected_objects
-                    ]
-
-                    # Convert emotions data to native types
-                    emotions = [
-                        {
-                            "dominant_emotion": emo["dominant_emotion"],
-                            "emotions": {k: float(v) for k, v in emo["emotions"].items()},
-                            "region": {k: int(v) if isinstance(v, (np.integer)) else v for k, v in emo["region"].items()}
-                        }
-                        for emo in emotions
-                    ]
-
-                    print(f"Post-Processing Snapshot: {snapshot_path}")
-                    print(f"Detected Objects: {detected_objects}")
-                    print(f"Emotions: {emotions}")
-                    print(f"Keypoints: {keypoints}")
-
-                    if not os.path.exists(snapshot_path):
-                        print(f"Error: Snapshot path does not exist: {snapshot_path}")
-                    else:
-                        print(f"Processing Snapshot: {snapshot_path}")
-
-                    # Ensure JSON file exists
-
-                    if not os.path.exists(json_path):
-                        print(f"Error: JSON file does not exist: {json_path}")
-                        continue
-                    
-                    # Update JSON with new data
-                    with open(json_path, "r") as f:
-                        data = json.load(f)
-
-                    print(f"Original JSON Data: {data}")
-
-                    # Add post-processed data
-                    data["post_processing"] = {
-                        "detected_objects": detected_objects,
-                        "emotions": emotions,
-                        "keypoints": keypoints,
-                    }
-
-                    print(f"Updated JSON Data: {data}")
-
-                    # Save updated JSON
-                    with open(json_path, "w") as f:
-                        json.dump(data, f, indent=4)
+        if not os.path.exists(self.base_save_dir):
+            self.feedback_label.setText("Recordings folder does not exist.")
+            return
 
-            self.feedback_label.setText("Post-processing completed successfully.")
-        except Exception as e:
-            self.feedback_label.setText(f"Error during post-processing: {e}")
+        self.post_process_button.setEnabled(False)
+        self.feedback_label.setText("Post-processing started...")
+        self.post_process_thread = QThread()
+        self.post_process_worker = BatchPostProcessingWorker(
+            self.base_save_dir,
+            device=self.device,
+            batch_size=POST_PROCESS_BATCH_SIZE,
+            num_workers=POST_PROCESS_WORKERS
+        )
+        self.post_process_worker.moveToThread(self.post_process_thread)
+        self.post_process_thread.started.connect(self.post_process_worker.run)
+        self.post_process_worker.finished.connect(self.post_process_thread.quit)
+        self.post_process_worker.finished.connect(self.post_process_worker.deleteLater)
+        self.post_process_thread.finished.connect(self.post_process_thread.deleteLater)
+        self.post_process_worker.progress.connect(self.update_post_process_progress)
+        self.post_process_worker.result.connect(self.handle_post_process_result)
+        self.post_process_worker.error.connect(self.handle_post_process_error)
+        self.post_process_thread.start()
+
+    def update_post_process_progress(self, done, total):
+        self.feedback_label.setText(f"Post-processing: {done}/{total} snapshots")
+
+    def handle_post_process_result(self, summary):
+        self.feedback_label.setText(
+            f"Post-processing completed successfully: {summary['processed']} processed, "
+            f"{summary['failed']} failed in {summary['seconds']}s."
+        )
+        self.post_process_button.setEnabled(True)
+
+    def handle_post_process_error(self, error):
+        self.feedback_label.setText(f"Error during post-processing: {error}")
+        self.post_process_button.setEnabled(True)
+
+    def create_speech_worker(self):
+        """
+        A speech worker for the configured backend. Backends are shared, so the model
+        is only loaded on the first recording.
+        """
+        options = {"model_path": VOSK_MODEL_PATH} if SPEECH_BACKEND == "vosk" else {}
+        return SpeechToTextWorker(backend=SPEECH_BACKEND, backend_options=options)
 
     def record_instruction(self):
         """
@@ -321,13 +407,14 @@ class DataRecorderApp(QMainWindow):
         """
         self.record_instruction_button.setEnabled(False)
         self.speech_thread_instruction = QThread()
-        self.speech_worker_instruction = SpeechToTextWorker()
+        self.speech_worker_instruction = self.create_speech_worker()
         self.speech_worker_instruction.moveToThread(self.speech_thread_instruction)
         self.speech_thread_instruction.started.connect(self.speech_worker_instruction.run)
         self.speech_worker_instruction.finished.connect(self.speech_thread_instruction.quit)
         self.speech_worker_instruction.finished.connect(self.speech_worker_instruction.deleteLater)
         self.speech_thread_instruction.finished.connect(self.speech_thread_instruction.deleteLater)
         self.speech_worker_instruction.result.connect(self.update_instruction)
+        self.speech_worker_instruction.finished.connect(self.instruction_speech_finished)
         self.speech_worker_instruction.error.connect(self.handle_speech_error)
         self.speech_thread_instruction.start()
 
@@ -337,28 +424,35 @@ class DataRecorderApp(QMainWindow):
         """
         self.record_intent_button.setEnabled(False)
         self.speech_thread_intent = QThread()
-        self.speech_worker_intent = SpeechToTextWorker()
+        self.speech_worker_intent = self.create_speech_worker()
         self.speech_worker_intent.moveToThread(self.speech_thread_intent)
         self.speech_thread_intent.started.connect(self.speech_worker_intent.run)
         self.speech_worker_intent.finished.connect(self.speech_thread_intent.quit)
         self.speech_worker_intent.finished.connect(self.speech_worker_intent.deleteLater)
         self.speech_thread_intent.finished.connect(self.speech_thread_intent.deleteLater)
         self.speech_worker_intent.result.connect(self.update_intent)
+        self.speech_worker_intent.finished.connect(self.intent_speech_finished)
         self.speech_worker_intent.error.connect(self.handle_speech_error)
         self.speech_thread_intent.start()
 
     def update_instruction(self, text):
         """
-        Updates the Instruction QLineEdit with the transcribed text.
+        Updates the Instruction QLineEdit with the transcribed text (partial text while
+        a streaming backend is still listening).
         """
         self.instruction_input.setText(text)
+
+    def instruction_speech_finished(self):
         self.record_instruction_button.setEnabled(True)
 
     def update_intent(self, text):
         """
-        Updates the Intent QLineEdit with the transcribed text.
+        Updates the Intent QLineEdit with the transcribed text (partial text while
+        a streaming backend is still listening).
         """
         self.intent_input.setText(text)
+
+    def intent_speech_finished(self):
         self.record_intent_button.setEnabled(True)
 
     def handle_speech_error(self, error):
@@ -369,6 +463,12 @@ class DataRecorderApp(QMainWindow):
         self.record_instruction_button.setEnabled(True)
         self.record_intent_button.setEnabled(True)
 
+    def on_instruction_changed(self, text):
+        self.current_instruction = text
+
+    def on_intent_changed(self, text):
+        self.current_intent = text
+
     def on_threshold_changed(self):
         new_val = self.threshold_slider.value() / 100.0
         self.confidence_threshold = new_val
@@ -389,7 +489,7 @@ class DataRecorderApp(QMainWindow):
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FEED_RESOLUTION[1])
 
         self.running = True
-        self.camera_thread = threading.Thread(target=self.camera_loop, daemon=True)
+        self.camera_thread = threading.Thread(target=self.camera_loop, name="camera", daemon=True)
         self.camera_thread.start()
 
         self.camera_timer = QTimer(self)
@@ -397,55 +497,145 @@ class DataRecorderApp(QMainWindow):
         self.camera_timer.start(30)
 
     def camera_loop(self):
+        frame_index = 0
+        frame_shape = None
         while self.running:
             if self.cap:
-                ret, frame = self.cap.read()
-                if ret:
-                    with self.lock:
-                        self.frame = frame.copy()
-                time.sleep(0.01)
+                if frame_shape is None:
+                    # First frame: learn the camera's frame shape
+                    ret, frame = self.cap.read()
+                    if not ret:
+                        time.sleep(0.01)
+                        continue
+                    frame_shape = frame.shape
+                    slot, slot_array = self.frames.acquire_write_slot(frame_shape)
+                    np.copyto(slot_array, frame)
+                else:
+                    # Decode straight into a free ring buffer slot (no per-frame copy)
+                    slot, slot_array = self.frames.acquire_write_slot(frame_shape)
+                    if slot is None:
+                        # Every slot is being read; grab and discard to keep the camera flowing
+                        self.cap.grab()
+                        continue
+                    with latency.measure("capture.read"):
+                        ret, frame = self.cap.read(slot_array)
+                    if not ret:
+                        self.frames.cancel_write(slot)
+                        time.sleep(0.01)
+                        continue
+                    frame_shape = frame.shape
+
+                # Snapshot cadence is driven by the frame's capture time, not a GUI timer
+                frame_time = time.time()
+                frame_time_ms = time.monotonic() * 1000
+                seq = self.frames.publish(slot, int(frame_time * 1000), frame_time_ms, array=frame)
+                frame_index += 1
+
+                with self.recording_lock:
+                    scheduler = self.capture_scheduler
+                    if self.recording and scheduler is not None and scheduler.should_capture(frame_time_ms, frame_index):
+                        ref = self.frames.acquire_latest()
+                        if ref is not None:
+                            with ref:
+                                # The writer keeps the frame until it is encoded, so give it its own copy
+                                self.take_snapshot(ref.array.copy(), ref.timestamp_ms, ref.monotonic_ms)
+                # No sleep here: cap.read() blocks until the camera delivers the next frame,
+                # and consumers are woken by publish() rather than polling
+
+    def report_background_loads(self):
+        """
+        Adds background model loads to the startup report once they finish, and reports
+        models that failed to load (switching their feature off again).
+        """
+        error = self.detection_thread.load_error
+        if error is not None:
+            self.detection_thread.load_error = None
+            self.live_detection_checkbox.setChecked(False)
+            self.feedback_label.setText(f"Could not load the detection model: {error}")
+        captioning = self.sf_captioning_thread
+        if captioning is not None and captioning.load_error is not None:
+            # The thread has already ended
+            self.sf_captioning_thread = None
+            self.live_captioning_checkbox.setChecked(False)
+            self.feedback_label.setText(f"Could not load the captioning model: {captioning.load_error}")
+        if not self.detection_announced and self.detection_thread.load_seconds is not None:
+            self.detection_announced = True
+            self.startup.record("detection model (background)", self.detection_thread.load_seconds)
+            self.feedback_label.setText(
+                f"Detection model loaded in {self.detection_thread.load_seconds:.1f}s."
+            )
+
+    def evict_idle_models(self):
+        """
+        Unloads cached models that nothing has used for model_idle_seconds. Live detection
+        and captioning fetch their model from the registry on every use, so they are only
+        unloaded once those features are off.
+        """
+        for model_id, device, _ in registry.evict_idle(self.model_idle_seconds):
+            print(f"Unloaded idle model {model_id} on {device}")
 
     def update_camera_feed(self):
-        if self.frame is not None:
+        self.report_background_loads()
+        if self.recording:
+            self.update_snapshot_status()
+        # Only redraw when the camera has published a frame we have not shown yet
+        ref = self.frames.acquire_latest(after_seq=self.last_displayed_seq)
+        if ref is not None:
+            if not self.first_frame_shown:
+                self.first_frame_shown = True
+                self.startup.mark("first frame displayed")
+                print(self.startup.report())
+
+            # One copy into a reusable buffer: the overlay is drawn on it
+            render_start = time.perf_counter()
+            with ref:
+                self.last_displayed_seq = ref.seq
+                frame_time_ms = ref.monotonic_ms
+                if self.display_buffer is None or self.display_buffer.shape != ref.array.shape:
+                    self.display_buffer = np.empty_like(ref.array)
+                np.copyto(self.display_buffer, ref.array)
+            display_frame = self.display_buffer
+
             with self.lock:
-                display_frame = self.frame.copy()
-                detected_objects = self.live_detected_objects
+                live_tracks = self.live_tracks
+                previous_tracks = self.previous_live_tracks
                 joint_outputs = self.live_joint_outputs
 
-            # Prepare detections for SORT
-            detections = []
-            labeled_detected_objects = []
-            for obj in detected_objects:
-                x1, y1, x2, y2 = obj["box"]
-                score = obj["score"]
-                label = obj["label"]
-                detections.append([x1, y1, x2, y2, score])
-                labeled_detected_objects.append([x1, y1, x2, y2, score, label])
-            dets = np.array(detections)
-
-            # Update tracker
-            tracked_objects = self.tracker.update(dets)
+            # Tracking runs on the detection thread; here we only move the boxes to this frame's time
+            tracked_objects = interpolate_tracks(previous_tracks, live_tracks, frame_time_ms)
 
             # Draw tracked bounding boxes with IDs
-            for (x1, y1, x2, y2, score, label) in labeled_detected_objects:
+            for obj in tracked_objects:
+                x1, y1, x2, y2 = obj["box"]
                 cv2.rectangle(display_frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                cv2.putText(display_frame, f"{label} ({score:.2f})", (int(x1), int(y1) - 10),
+                cv2.putText(display_frame, f"{obj['label']} #{obj['id']} ({obj['score']:.2f})", (int(x1), int(y1) - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
 
             # Handle video recording
             if self.recording and hasattr(self, 'video_writer') and self.video_writer is not None:
                 self.video_writer.write(display_frame)
+                if self.timing_index is not None:
+                    self.timing_index.add_video_frame(frame_time_ms)
 
-            display_frame = cv2.resize(display_frame, FEED_RESOLUTION)
+            if (display_frame.shape[1], display_frame.shape[0]) != FEED_RESOLUTION:
+                display_frame = cv2.resize(display_frame, FEED_RESOLUTION)
 
             # Flip the frame horizontally
             cv2.flip(display_frame, 1, display_frame)
-            rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
+            if self.latency_hud_checkbox.isChecked():
+                # Drawn after the video write so the HUD never ends up in recordings
+                self.draw_latency_hud(display_frame)
+            if self.rgb_buffer is None or self.rgb_buffer.shape != display_frame.shape:
+                self.rgb_buffer = np.empty_like(display_frame)
+            rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB, dst=self.rgb_buffer)
 
             h, w, ch = rgb_frame.shape
             bytes_per_line = ch * w
             q_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
             self.feed_label.setPixmap(QPixmap.fromImage(q_image))
+            latency.record("display.render", (time.perf_counter() - render_start) * 1000, render_start)
+            # Camera capture to frame on screen
+            latency.record("display.frame_age", time.monotonic() * 1000 - frame_time_ms)
 
     def start_recording(self):
         # We need to record the time when recording starts
@@ -461,47 +651,77 @@ class DataRecorderApp(QMainWindow):
         except ValueError:
             self.feedback_label.setText("Invalid interval value. Setting to 1000 ms.")
             interval = 1000
+        try:
+            every_n_frames = max(0, int(self.frame_sampling_input.text()))
+        except ValueError:
+            every_n_frames = 0
 
         timestamp = int(self.start_time * 1000)
         self.session_dir = os.path.join(self.base_save_dir, f"session_{timestamp}")
         os.makedirs(self.session_dir, exist_ok=True)
 
-        # Start image captioning thread
-        self.sf_captioning_thread = SFImageCaptioningThread(self, interval=0.5)
-        self.sf_captioning_thread.start()
-
-        # Start audio recording
-        audio_filename = os.path.join(self.session_dir, "audio.wav")
-        self.audio_thread = AudioRecorderThread(output_path=audio_filename)
-        self.audio_thread.start()
-
-        # Initialize video writer
+        # Initialize video writer first: if it cannot be opened nothing else has been
+        # started yet, so there is nothing to clean up
         video_filename = os.path.join(self.session_dir, "video.avi")
         fourcc = cv2.VideoWriter_fourcc(*'XVID')  # type: ignore
-        self.video_writer = cv2.VideoWriter(video_filename, fourcc, 20.0, FEED_RESOLUTION)
-        if not self.video_writer.isOpened():
+        video_writer = cv2.VideoWriter(video_filename, fourcc, float(FRAME_RATE), FEED_RESOLUTION)
+        if not video_writer.isOpened():
+            video_writer.release()
+            self.start_time = None
             self.feedback_label.setText("Error: Could not open video writer.")
             return
+        self.video_writer = video_writer
+
+        # Capture times of video frames, audio chunks and snapshots on one clock
+        self.timing_index = TimingIndexWriter(self.session_dir, origin_wall_ms=self.start_time * 1000)
+        audio_name = f"audio.{resolve_audio_format(AUDIO_FORMAT)}"
+        self.session_store = SessionStoreWriter(self.session_dir, metadata={
+            "start_time": self.start_time,
+            "audio": audio_name,
+            "video": "video.avi",
+        }, flush_interval=SESSION_STORE_FLUSH_SECONDS)
+
+        # Start image captioning thread (the model loads on the thread itself)
+        if self.live_captioning_checkbox.isChecked():
+            self.sf_captioning_thread = SFImageCaptioningThread(
+                self, interval=0.5, change_threshold=CAPTION_CHANGE_THRESHOLD
+            )
+            self.sf_captioning_thread.start()
+
+        # Start audio recording (streamed to disk as it is captured)
+        audio_filename = os.path.join(self.session_dir, audio_name)
+        self.audio_thread = AudioRecorderThread(
+            output_path=audio_filename, audio_format=AUDIO_FORMAT, timing_index=self.timing_index
+        )
+        self.audio_thread.start()
 
+        # Snapshots are triggered from camera_loop by the capture scheduler
+        self.capture_scheduler = CaptureScheduler(interval_ms=interval, every_n_frames=every_n_frames)
+        # Keep a per-stage latency trace for the session (written out on stop)
+        latency.start_trace()
         self.recording = True
         self.feedback_label.setText(f"Recording started. Saving to {self.session_dir}.")
-        self.timer.timeout.connect(self.take_snapshot)
-        self.timer.start(FRAME_RATE)
 
     def stop_recording(self):
         if not self.recording:
             self.feedback_label.setText("Not currently recording.")
             return
 
-        self.recording = False
-        self.timer.stop()
+        # Waits for a snapshot being queued by camera_loop; none are queued after this
+        with self.recording_lock:
+            self.recording = False
         self.start_time = None
 
-        # Stop image captioning thread
+        # Stop image captioning thread. It may still be loading BLIP, which cannot be
+        # interrupted: don't block the GUI on it, it exits by itself once the load is done
         if self.sf_captioning_thread and self.sf_captioning_thread.is_alive():
             self.sf_captioning_thread.stop()
-            self.sf_captioning_thread.join()
-            self.sf_captioning_thread = None
+            self.sf_captioning_thread.join(timeout=CAPTION_STOP_TIMEOUT)
+            if self.sf_captioning_thread.is_alive():
+                print("Live captioning is still loading its model; it will stop once loaded.")
+            else:
+                print(f"Live captioning: {self.sf_captioning_thread.counters()}")
+        self.sf_captioning_thread = None
 
         # Stop audio recording
         if self.audio_thread and self.audio_thread.is_alive():
@@ -514,6 +734,24 @@ class DataRecorderApp(QMainWindow):
             self.video_writer.release()
             self.video_writer = None
 
+        # Wait for queued snapshots, then write any buffered snapshot rows
+        self.snapshot_writer.flush()
+        self.update_snapshot_status()
+        if self.session_store is not None:
+            self.session_store.close()
+            self.session_store = None
+        # Written last: the audio thread, video writer and snapshots have all finished
+        if self.timing_index is not None:
+            self.timing_index.close()
+            self.timing_index = None
+
+        latency.stop_trace()
+        try:
+            latency.export_json(os.path.join(self.session_dir, LATENCY_TRACE_NAME))
+            latency.export_csv(os.path.join(self.session_dir, LATENCY_CSV_NAME))
+        except Exception as e:
+            print(f"Could not write latency trace: {e}")
+
         self.feedback_label.setText(f"Recording stopped. Session data is in {self.session_dir}.")
 
     def set_save_directory(self):
@@ -540,30 +778,21 @@ class DataRecorderApp(QMainWindow):
             print(f"DINOv2 feature extraction error: {e}")
             return None
 
-    def take_snapshot(self):
-        if self.frame is None:
-            return
-
-        with self.lock:
-            snapshot_frame = self.frame.copy()
+    def take_snapshot(self, snapshot_frame, timestamp, capture_ms=None):
+        """
+        Queues a camera frame for the background snapshot writer. Called from camera_loop
+        when the capture scheduler says a snapshot is due; resizing, JPEG encoding and
+        disk I/O happen on the writer threads.
 
-        snapshot_frame = cv2.resize(snapshot_frame, FEED_RESOLUTION)    
-        timestamp = int(time.time() * 1000)
+        Parameters:
+            snapshot_frame (np.ndarray): The captured BGR frame (not modified afterwards).
+            timestamp (int): Wall-clock capture time in milliseconds.
+            capture_ms (float, optional): Monotonic capture time, for the session timing index.
+        """
         if self.session_dir is None:
-            self.feedback_label.setText("Error: Session directory is not set.")
+            print("Error: Session directory is not set.")
             return
 
-        snapshot_subdir = os.path.join(self.session_dir, f"snapshot_{timestamp}")
-        os.makedirs(snapshot_subdir, exist_ok=True)
-
-        # Define filenames for clean and annotated snapshots
-        clean_snapshot_filename = os.path.join(snapshot_subdir, "clean_image.jpg")
-        annotated_snapshot_filename = os.path.join(snapshot_subdir, "annotated_image.jpg")
-        depth_map_filename = os.path.join(snapshot_subdir, "depth_map.jpg")
-
-        # Save the clean snapshot (unannotated)
-        cv2.imwrite(clean_snapshot_filename, snapshot_frame)
-
         # Perform Object Detection in Post-Processing
         # detected_objects = detect_objects_with_huggingface(snapshot_frame)
 
@@ -590,7 +819,7 @@ class DataRecorderApp(QMainWindow):
         # tracked_objects = self.tracker.update(dets)
 
         # Generate Depth Map from Clean Snapshot
-        pil_clean_snapshot = Image.fromarray(cv2.cvtColor(snapshot_frame, cv2.COLOR_BGR2RGB))
+        # pil_clean_snapshot = Image.fromarray(cv2.cvtColor(snapshot_frame, cv2.COLOR_BGR2RGB))
         # depth_result = self.depth_pipe(pil_clean_snapshot)
         # if isinstance(depth_result, dict) and "depth" in depth_result:
         #     depth_map = depth_result["depth"]
@@ -664,56 +893,103 @@ class DataRecorderApp(QMainWindow):
 
         # VILT Question Answering Post-Processing
         # question = "What is going on in the image?"
-        # encoding = self.vilt_processor(pil_clean_snapshot, question, return_tensors="pt") # type: ignore
-        # outputs = self.vilt_model(**encoding)
+        # vilt_processor, vilt_model = self.vilt_models
+        # encoding = vilt_processor(pil_clean_snapshot, question, return_tensors="pt") # type: ignore
+        # outputs = vilt_model(**encoding)
         # logits = outputs.logits
         # idx = logits.argmax(-1).item()
-        # answer = self.vilt_model.config.id2label[idx]
-
-        # Prepare JSON data
-        data_json = {
-            "snapshot_id": self.num_snapshots,
-            "recording_data": {
-                "start_time": self.start_time,
-            },
-            "timestamp": timestamp,
-            "instruction": self.instruction_input.text(),
-            "intent": self.intent_input.text(),
-            # "detected_objects": detected_objects,
-            # "tracked_objects": tracking_data,
-            # "depth_map": os.path.basename(depth_map_filename),
-            # "annoted_snapshot": os.path.basename(annotated_snapshot_filename),
-            "audio": os.path.basename("audio.wav"),
-            "video": os.path.basename("video.avi"),
-            # "emotions": emotion_data_cleaned,
-            # "vilt_answer": answer,
-            # "keypoints": keypoints.astype(float).tolist(),
-            "joint_outputs": joints.tolist()
-        }
-
-        json_file = os.path.join(snapshot_subdir, f"data_{timestamp}.json")
-        with open(json_file, "w") as f:
-            json.dump(data_json, f, indent=4)
-
-        self.feedback_label.setText(f"Snapshot + depth map saved in {snapshot_subdir}")
+        # answer = vilt_model.config.id2label[idx]
+
+        # Prepare snapshot data
+        # The full JSON layout is still available through SessionStoreReader.snapshot():
+        # "detected_objects", "tracked_objects", "depth_map", "annoted_snapshot",
+        # "emotions", "vilt_answer" and "keypoints" are filled in by post-processing.
+        self.snapshot_writer.submit(SnapshotRequest(
+            snapshot_frame,
+            timestamp,
+            self.num_snapshots,
+            self.session_dir,
+            self.session_store,
+            joints,
+            self.current_instruction,
+            self.current_intent,
+            resolution=FEED_RESOLUTION
+        ))
+        if self.timing_index is not None and capture_ms is not None:
+            self.timing_index.add_snapshot(self.num_snapshots, timestamp, capture_ms)
         self.num_snapshots += 1
 
+    def draw_latency_hud(self, frame):
+        """
+        Draws the per-stage p50/p95/p99 latencies in the top-left corner of the frame.
+        """
+        lines = latency.hud_lines()
+        if not lines:
+            return
+        line_height = 16
+        height = line_height * len(lines) + 8
+        width = max(cv2.getTextSize(line, cv2.FONT_HERSHEY_PLAIN, 1.0, 1)[0][0] for line in lines) + 12
+        cv2.rectangle(frame, (0, 0), (width, height), (0, 0, 0), -1)
+        for index, line in enumerate(lines):
+            cv2.putText(frame, line, (6, line_height * (index + 1)),
+                        cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 255), 1)
+
+    def update_snapshot_status(self):
+        """
+        Shows the snapshot writer counters (queued / written / dropped) and the captioning
+        generated / skipped counters in the UI.
+        """
+        counters = self.snapshot_writer.counters()
+        status = (
+            f"Snapshots - queued: {counters['queued']}  written: {counters['written']}  "
+            f"dropped: {counters['dropped']}  failed: {counters['failed']}  pending: {counters['pending']}"
+        )
+        if self.capture_scheduler is not None:
+            stats = self.capture_scheduler.stats()
+            status += (
+                f"  |  rate: {stats['rate_hz']:.2f} Hz  interval: {stats['mean_interval_ms']:.0f} ms  "
+                f"jitter: {stats['jitter_ms']:.1f} ms  missed: {stats['missed']}"
+            )
+        captioning = self.sf_captioning_thread
+        if captioning is not None:
+            counters = captioning.counters()
+            status += f"  |  captions generated: {counters['generated']}  skipped: {counters['skipped']}"
+        for model, stats in self.inference.stats().items():
+            if stats["run_ms"] is not None:
+                status += f"  |  {model}: queue {stats['queued']}  run {stats['run_ms']:.0f} ms  wait {stats['wait_ms']:.0f} ms"
+        self.snapshot_status_label.setText(status)
+
     def closeEvent(self, event):
+        with self.recording_lock:
+            self.recording = False
+        self.running = False
+        # Wake any consumer blocked waiting for a frame
+        self.frames.close()
         if self.cap:
             self.cap.release()
-        if self.timer:
-            self.timer.stop()
-        self.running = False
 
         if hasattr(self, 'detection_thread'):
             self.detection_thread.stop()
             self.detection_thread.join()
+        if self.sf_captioning_thread and self.sf_captioning_thread.is_alive():
+            # A daemon thread: one still loading BLIP does not keep the app open
+            self.sf_captioning_thread.stop()
+            self.sf_captioning_thread.join(timeout=CAPTION_STOP_TIMEOUT)
+        self.inference.stop()
 
         if self.audio_thread and self.audio_thread.is_alive():
             self.audio_thread.stop()
             self.audio_thread.join()
             self.audio_thread = None
 
+        self.snapshot_writer.stop()
+        if self.session_store is not None:
+            self.session_store.close()
+            self.session_store = None
+        if self.timing_index is not None:
+            self.timing_index.close()
+            self.timing_index = None
+
         event.accept()
 
 
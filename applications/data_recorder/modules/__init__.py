@@ -5,7 +5,18 @@ from .sort_tracker import Sort, associate_detections_to_trackers
 from .depth_estimation import initialize_depth_pipeline
 from .image_captioning import SFImageCaptioningThread
 from .audio_recording import AudioRecorderThread
-from .detection import LiveDetectionThread, detect_objects_with_huggingface
-from .emotion_detection import detect_emotions_deepface
-from .keypoint_detection import detect_keypoints_superpoint
-from .utils import simulate_joint_outputs
\ No newline at end of file
+from .detection import LiveDetectionThread, detect_objects_with_huggingface, detect_objects_batch
+from .emotion_detection import detect_emotions_deepface, EmotionAnalyzer, get_emotion_analyzer
+from .keypoint_detection import detect_keypoints_superpoint, detect_keypoints_superpoint_batch
+from .utils import simulate_joint_outputs
+from .model_registry import ModelRegistry, registry, get_model
+from .batch_post_processing import BatchPostProcessor, discover_snapshots
+from .post_processing_manifest import PostProcessingManifest
+from .video_reader import iter_video_frames, timestamps_to_frame_numbers
+from .session_store import SessionStoreWriter, SessionStoreReader, convert_session_directory
+from .snapshot_writer import SnapshotWriter, SnapshotRequest
+from .frame_buffer import FrameRingBuffer, FrameRef, FrameSubscriber
+from .offline_tracking import OfflineTracker
+from .inference_scheduler import InferenceScheduler
+from .timing_index import TimingIndex, TimingIndexWriter
+from .session_transcription import SessionTranscriber
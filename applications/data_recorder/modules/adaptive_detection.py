@@ -0,0 +1,118 @@
+# modules/adaptive_detection.py
+
+import math
+
+
+class DetectionStrideController:
+    """
+    Decides on which camera frames the live detector runs; the tracker predicts the
+    boxes for the frames in between. The stride K (camera frames per detection) is
+    retuned after every detection from smoothed measurements of the detector's run
+    time and the camera's frame period:
+
+      - cpu_budget: the fraction of wall time detection may use. K is the smallest
+        stride that keeps detection_time / (K * frame_period) within the budget.
+      - latency_ms: how stale the last real detection may be when it is replaced,
+        about K * frame_period + detection_time. K is the largest stride that meets it.
+
+    With both set the budget is a hard limit and the latency target picks a larger
+    (cheaper) stride when it allows one. A detection can also be requested early,
+    e.g. when the tracker loses confidence.
+    """
+    def __init__(self, cpu_budget=0.5, latency_ms=None, min_stride=1, max_stride=30, smoothing=0.2):
+        self.cpu_budget = cpu_budget
+        self.latency_ms = latency_ms
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.smoothing = smoothing
+
+        self.stride = self.min_stride
+        self.frames_since_detection = None
+        self.detection_seconds = None
+        self.frame_seconds = None
+        self.last_frame_ms = None
+        self.forced = False
+
+        self.frames = 0
+        self.detections = 0
+        self.early_detections = 0
+
+    def restart(self):
+        """
+        Forgets the frame history (timings are kept) so the next frame is detected;
+        used when tracking starts over.
+        """
+        self.frames_since_detection = None
+        self.last_frame_ms = None
+        self.forced = False
+
+    def _smooth(self, current, sample):
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def record_frame(self, frame_time_ms, steps=1):
+        """
+        Called for every frame the detection thread receives; steps is the number of
+        camera frames since the previous one (frames dropped while busy count too).
+        """
+        steps = max(1, steps)
+        if self.last_frame_ms is not None and frame_time_ms > self.last_frame_ms:
+            period = (frame_time_ms - self.last_frame_ms) / 1000.0 / steps
+            self.frame_seconds = self._smooth(self.frame_seconds, period)
+        self.last_frame_ms = frame_time_ms
+        if self.frames_since_detection is not None:
+            self.frames_since_detection += steps
+        self.frames += 1
+
+    def should_detect(self):
+        if self.forced or self.frames_since_detection is None:
+            return True
+        return self.frames_since_detection >= self.stride
+
+    def request_detection(self):
+        """
+        Runs detection on the next frame regardless of the stride.
+        """
+        if not self.forced and not self.should_detect():
+            self.early_detections += 1
+        self.forced = True
+
+    def record_detection(self, seconds):
+        self.detection_seconds = self._smooth(self.detection_seconds, seconds)
+        self.frames_since_detection = 0
+        self.forced = False
+        self.detections += 1
+        self.stride = self.tune()
+
+    def tune(self):
+        """
+        Returns the stride for the current measurements.
+        """
+        if self.detection_seconds is None or not self.frame_seconds:
+            return self.stride
+
+        budget_stride = self.min_stride
+        if self.cpu_budget:
+            budget_stride = math.ceil(self.detection_seconds / (self.cpu_budget * self.frame_seconds))
+
+        stride = budget_stride
+        if self.latency_ms:
+            latency_stride = math.floor((self.latency_ms / 1000.0 - self.detection_seconds) / self.frame_seconds)
+            stride = max(budget_stride, latency_stride) if self.cpu_budget else latency_stride
+
+        return min(max(stride, self.min_stride), self.max_stride)
+
+    def stats(self):
+        detection_ms = self.detection_seconds * 1000 if self.detection_seconds is not None else 0.0
+        frame_ms = self.frame_seconds * 1000 if self.frame_seconds else 0.0
+        return {
+            "stride": self.stride,
+            "detection_ms": round(detection_ms, 1),
+            "frame_ms": round(frame_ms, 1),
+            "cpu_share": round(detection_ms / (self.stride * frame_ms), 2) if frame_ms else 0.0,
+            "staleness_ms": round(self.stride * frame_ms + detection_ms, 1),
+            "frames": self.frames,
+            "detections": self.detections,
+            "early_detections": self.early_detections,
+        }
@@ -1,18 +1,151 @@
 # modules/audio_recording.py
 
+import os
+import struct
 import threading
+import time
 import pyaudio
-import wave
+
+
+AUDIO_FORMATS = ("wav", "flac")
+
+
+class StreamingWavWriter:
+    """
+    Writes 16-bit PCM to a WAV file as it arrives instead of collecting it in memory.
+
+    The RIFF and data chunk sizes in the header are rewritten (and the file flushed)
+    every header_interval seconds, so after a crash the file on disk is a valid WAV
+    holding everything up to the last fix-up. Memory use is one chunk regardless of
+    the session length.
+    """
+    def __init__(self, path, channels, sample_width, rate, header_interval=2.0):
+        self.path = path
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.header_interval = header_interval
+        self.data_bytes = 0
+        self.last_fixup = time.monotonic()
+        self.file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        block_align = self.channels * self.sample_width
+        self.file.write(struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 36 + self.data_bytes, b"WAVE",
+            b"fmt ", 16, 1, self.channels, self.rate, self.rate * block_align, block_align, self.sample_width * 8,
+            b"data", self.data_bytes,
+        ))
+
+    def _fix_header(self):
+        self.file.flush()
+        position = self.file.tell()
+        self.file.seek(4)
+        self.file.write(struct.pack("<I", 36 + self.data_bytes))
+        self.file.seek(40)
+        self.file.write(struct.pack("<I", self.data_bytes))
+        self.file.seek(position)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_fixup = time.monotonic()
+
+    def write(self, data):
+        self.file.write(data)
+        self.data_bytes += len(data)
+        if time.monotonic() - self.last_fixup >= self.header_interval:
+            self._fix_header()
+
+    @property
+    def frames_written(self):
+        return self.data_bytes // (self.channels * self.sample_width)
+
+    def close(self):
+        if self.file.closed:
+            return
+        # A WAV chunk must have an even length
+        if self.data_bytes % 2:
+            self.file.write(b"\x00")
+        self._fix_header()
+        self.file.close()
+
+
+class StreamingFlacWriter:
+    """
+    Same interface as StreamingWavWriter, compressed losslessly with FLAC (needs the
+    optional soundfile package). FLAC is written in self-contained frames, so a file
+    cut short by a crash still decodes up to the last complete frame.
+    """
+    def __init__(self, path, channels, sample_width, rate, header_interval=2.0):
+        import numpy as np
+        import soundfile as sf
+        self._np = np
+        self.path = path
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.header_interval = header_interval
+        self.frames_written = 0
+        self.last_flush = time.monotonic()
+        self.file = sf.SoundFile(path, mode="w", samplerate=rate, channels=channels, format="FLAC", subtype="PCM_16")
+
+    def write(self, data):
+        samples = self._np.frombuffer(data, dtype=self._np.int16).reshape(-1, self.channels)
+        self.file.write(samples)
+        self.frames_written += len(samples)
+        if time.monotonic() - self.last_flush >= self.header_interval:
+            self.file.flush()
+            self.last_flush = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def resolve_audio_format(audio_format="wav", sample_width=2):
+    """
+    Returns the format that will actually be written: FLAC falls back to WAV (with a
+    message) if soundfile is not installed or the samples are not 16-bit.
+    """
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Unknown audio format '{audio_format}', expected one of {AUDIO_FORMATS}")
+    if audio_format == "flac":
+        if sample_width != 2:
+            print("FLAC output needs 16-bit samples; recording audio as WAV")
+            return "wav"
+        try:
+            import soundfile  # noqa: F401
+        except ImportError:
+            print("soundfile is not installed; recording audio as WAV")
+            return "wav"
+    return audio_format
+
+
+def open_audio_writer(path, channels, sample_width, rate, audio_format="wav", header_interval=2.0):
+    """
+    Returns (writer, path) for the requested format; the path's extension follows the
+    format actually used.
+    """
+    audio_format = resolve_audio_format(audio_format, sample_width)
+    path = os.path.splitext(path)[0] + "." + audio_format
+    if audio_format == "flac":
+        return StreamingFlacWriter(path, channels, sample_width, rate, header_interval), path
+    return StreamingWavWriter(path, channels, sample_width, rate, header_interval), path
 
 
 class AudioRecorderThread(threading.Thread):
     """
-    A background thread that records audio from the system's microphone
-    and saves it as a WAV file once stopped.
+    A background thread that records audio from the system's microphone and streams
+    it to disk (WAV, or FLAC with audio_format="flac") while recording. With a
+    timing_index (TimingIndexWriter) the capture time of every chunk is recorded too.
     """
-    def __init__(self, output_path="audio.wav"):
+    def __init__(self, output_path="audio.wav", audio_format="wav", header_interval=2.0, timing_index=None):
         super().__init__(daemon=True)
         self.output_path = output_path
+        self.timing_index = timing_index
+        self.audio_format = audio_format
+        self.header_interval = header_interval
         self.stop_flag = False
 
         # Audio parameters
@@ -21,36 +154,47 @@ class AudioRecorderThread(threading.Thread):
         self.channels = 1
         self.rate = 44100
 
-        self.frames = []
         self.audio = pyaudio.PyAudio()
         self.stream = None
+        self.writer = None
 
     def run(self):
-        self.stream = self.audio.open(
-            format=self.format,
-            channels=self.channels,
-            rate=self.rate,
-            input=True,
-            frames_per_buffer=self.chunk
-        )
-
-        while not self.stop_flag:
-            try:
-                data = self.stream.read(self.chunk, exception_on_overflow=False)
-                self.frames.append(data)
-            except Exception as e:
-                print(f"Audio recording error: {e}")
+        try:
+            self.writer, self.output_path = open_audio_writer(
+                self.output_path, self.channels, self.audio.get_sample_size(self.format), self.rate,
+                audio_format=self.audio_format, header_interval=self.header_interval
+            )
+            self.stream = self.audio.open(
+                format=self.format,
+                channels=self.channels,
+                rate=self.rate,
+                input=True,
+                frames_per_buffer=self.chunk
+            )
+
+            while not self.stop_flag:
+                try:
+                    data = self.stream.read(self.chunk, exception_on_overflow=False)
+                    if self.timing_index is not None:
+                        # read() returns once the chunk is complete; its first sample is one chunk older
+                        captured_ms = time.monotonic() * 1000 - self.chunk * 1000 / self.rate
+                        self.timing_index.add_audio_chunk(self.writer.frames_written, captured_ms, self.rate)
+                    self.writer.write(data)
+                except Exception as e:
+                    print(f"Audio recording error: {e}")
+        except Exception as e:
+            print(f"Audio recording error: {e}")
+        finally:
+            # The stream is only touched from this thread, so close it here
+            if self.stream is not None:
+                self.stream.stop_stream()
+                self.stream.close()
+            self.audio.terminate()
+            if self.writer is not None:
+                self.writer.close()
 
     def stop(self):
+        """
+        Ends the recording; the file is complete once the thread has been joined.
+        """
         self.stop_flag = True
-        if self.stream is not None:
-            self.stream.stop_stream()
-            self.stream.close()
-        self.audio.terminate()
-
-        wf = wave.open(self.output_path, 'wb')
-        wf.setnchannels(self.channels)
-        wf.setsampwidth(self.audio.get_sample_size(self.format))
-        wf.setframerate(self.rate)
-        wf.writeframes(b''.join(self.frames))
-        wf.close()
\ No newline at end of file
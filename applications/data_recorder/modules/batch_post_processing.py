@@ -0,0 +1,308 @@
+# modules/batch_post_processing.py
+
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from modules.detection import detect_objects_batch, DETR_MODEL_ID
+from modules.emotion_detection import get_emotion_analyzer, DEFAULT_FACE_DETECTOR
+from modules.keypoint_detection import detect_keypoints_superpoint_batch, load_superpoint, SUPERPOINT_MODEL_ID
+from modules.post_processing_manifest import PostProcessingManifest, build_fingerprint
+from modules.session_store import SessionStoreWriter, has_session_store
+
+
+CLEAN_IMAGE_NAME = "clean_image.jpg"
+
+
+class SnapshotJob:
+    """
+    Paths for a single snapshot folder discovered under the recordings directory.
+    Sessions recorded with the session store have no per-snapshot JSON; their results
+    are appended to the store instead.
+    """
+    def __init__(self, session_dir, snapshot_dir):
+        self.session_dir = session_dir
+        self.snapshot_dir = snapshot_dir
+        self.image_path = os.path.join(snapshot_dir, CLEAN_IMAGE_NAME)
+        snapshot_name = os.path.basename(snapshot_dir)
+        self.snapshot_name = snapshot_name
+        self.timestamp = int(snapshot_name.split('_')[-1])
+        self.json_path = os.path.join(snapshot_dir, f"data_{snapshot_name.split('_')[-1]}.json")
+        self.has_json = os.path.exists(self.json_path)
+
+    def __repr__(self):
+        return f"SnapshotJob({self.snapshot_dir!r})"
+
+
+def discover_snapshots(base_dir):
+    """
+    Finds every snapshot folder under base_dir/<session>/<snapshot> that has a
+    clean_image.jpg and either its data_<timestamp>.json file or a session store.
+    Folders not named snapshot_<timestamp> (e.g. copies like snapshot_123_old) are skipped.
+    """
+    jobs = []
+    if not os.path.isdir(base_dir):
+        return jobs
+    for session_folder in sorted(os.listdir(base_dir)):
+        session_path = os.path.join(base_dir, session_folder)
+        if not os.path.isdir(session_path):
+            continue
+        session_has_store = has_session_store(session_path)
+        for snapshot_folder in sorted(os.listdir(session_path)):
+            snapshot_path = os.path.join(session_path, snapshot_folder)
+            if not os.path.isdir(snapshot_path) or not snapshot_folder.startswith("snapshot_"):
+                continue
+            if not snapshot_folder.split('_')[-1].isdigit():
+                print(f"Skipping snapshot folder without a numeric timestamp: {snapshot_path}")
+                continue
+            job = SnapshotJob(session_path, snapshot_path)
+            if not os.path.exists(job.image_path) or not (job.has_json or session_has_store):
+                print(f"Skipping incomplete snapshot folder: {snapshot_path}")
+                continue
+            jobs.append(job)
+    return jobs
+
+
+def to_native_detections(detected_objects):
+    """
+    Converts detected objects' data to JSON-serialisable Python types.
+    """
+    return [
+        {k: float(v) if isinstance(v, (np.integer, np.floating)) else v for k, v in obj.items()}
+        for obj in detected_objects
+    ]
+
+
+def to_native_emotions(emotions):
+    """
+    Converts DeepFace emotion results to JSON-serialisable Python types.
+    """
+    return [
+        {
+            "dominant_emotion": emo["dominant_emotion"],
+            "emotions": {k: float(v) for k, v in emo["emotions"].items()},
+            "region": {k: int(v) if isinstance(v, (np.integer)) else v for k, v in emo["region"].items()}
+        }
+        for emo in emotions
+    ]
+
+
+def _load_image(job):
+    image = cv2.imread(job.image_path)
+    if image is None:
+        print(f"Error reading image: {job.image_path}")
+    return image
+
+
+def _write_results(job, result, manifest=None, fingerprint=None):
+    with open(job.json_path, "r") as f:
+        data = json.load(f)
+    data["post_processing"] = result
+    # Write to a temporary file first so an interrupted run never leaves truncated JSON
+    tmp_path = job.json_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, job.json_path)
+    if manifest is not None:
+        manifest.record(job.snapshot_name, job.image_path, fingerprint)
+
+
+def _write_store_results(store_writer, items, manifest=None, fingerprint=None):
+    for job, result in items:
+        store_writer.append_post_processing(job.timestamp, result)
+    # Flush before touching the manifest so a recorded snapshot is always on disk
+    store_writer.flush()
+    if manifest is not None:
+        for job, _ in items:
+            manifest.record(job.snapshot_name, job.image_path, fingerprint)
+
+
+class BatchPostProcessor:
+    """
+    Headless post-processing engine for recorded sessions.
+
+    Snapshot images are decoded on a thread pool (the next batch is decoded while the
+    current one runs through the models), DETR and SuperPoint run on whole batches,
+    and the JSON write-back also happens on the pool. Usable from the CLI
+    (post_process.py) and from the GUI through BatchPostProcessingWorker.
+
+    Each session keeps a PostProcessingManifest; snapshots already processed with the
+    same model versions and thresholds are skipped unless force=True.
+    """
+    def __init__(self, device="cpu", batch_size=8, num_workers=4, confidence_threshold=0.5,
+                 run_detection=True, run_emotions=True, run_keypoints=True, progress_callback=None,
+                 force=False, face_detector=DEFAULT_FACE_DETECTOR):
+        self.device = device
+        self.batch_size = max(1, int(batch_size))
+        self.num_workers = max(1, int(num_workers))
+        self.confidence_threshold = confidence_threshold
+        self.run_detection = run_detection
+        self.run_emotions = run_emotions
+        self.run_keypoints = run_keypoints
+        self.face_detector = face_detector
+        self.progress_callback = progress_callback
+        self.force = force
+        self.stop_flag = False
+
+    def stop(self):
+        self.stop_flag = True
+
+    def config(self):
+        """
+        Settings that affect the post-processing output, used for the manifest fingerprint.
+        """
+        return {
+            "detection_model": DETR_MODEL_ID if self.run_detection else None,
+            "keypoint_model": SUPERPOINT_MODEL_ID if self.run_keypoints else None,
+            "emotion_model": f"deepface/{self.face_detector}" if self.run_emotions else None,
+            "confidence_threshold": self.confidence_threshold,
+        }
+
+    def filter_pending(self, jobs, manifests, fingerprint):
+        """
+        Returns the jobs that are new or stale according to their session manifests.
+        """
+        if self.force:
+            return list(jobs)
+        pending = []
+        for job in jobs:
+            manifest = manifests[job.session_dir]
+            if not manifest.is_current(job.snapshot_name, job.image_path, fingerprint):
+                pending.append(job)
+        return pending
+
+    def process_images(self, images):
+        """
+        Runs every enabled model on a batch of BGR images and returns one
+        post_processing dict per image, or None for images whose emotions could not
+        be analyzed.
+        """
+        if self.run_detection:
+            detections = detect_objects_batch(images, self.confidence_threshold, self.device)
+        else:
+            detections = [[] for _ in images]
+
+        if self.run_keypoints:
+            processor, model = load_superpoint(self.device)
+            keypoints = detect_keypoints_superpoint_batch(images, processor, model, self.device)
+        else:
+            keypoints = [np.array([]) for _ in images]
+
+        emotions_per_image = [[] for _ in images]
+        if self.run_emotions:
+            try:
+                emotions_per_image = get_emotion_analyzer(self.face_detector).analyze_batch(images)
+            except Exception as e:
+                print(f"Emotion detection error: {e}")
+                emotions_per_image = [None for _ in images]
+
+        results = []
+        for detected_objects, image_keypoints, emotions in zip(detections, keypoints, emotions_per_image):
+            if emotions is None:
+                # Counted as failed and left out of the manifest, so the next run retries it
+                results.append(None)
+                continue
+            results.append({
+                "detected_objects": to_native_detections(detected_objects),
+                "emotions": to_native_emotions(emotions),
+                "keypoints": np.asarray(image_keypoints).astype(float).tolist(),
+            })
+        return results
+
+    def run_jobs(self, jobs):
+        """
+        Processes the given SnapshotJobs and returns a summary dict.
+        """
+        start = time.time()
+        fingerprint, description = build_fingerprint(self.config())
+        print(f"Post-processing configuration {fingerprint}: {description}")
+        manifests = {}
+        for job in jobs:
+            if job.session_dir not in manifests:
+                manifests[job.session_dir] = PostProcessingManifest(job.session_dir)
+
+        pending = self.filter_pending(jobs, manifests, fingerprint)
+        summary = {
+            "total": len(pending),
+            "skipped": len(jobs) - len(pending),
+            "processed": 0,
+            "failed": 0,
+            "seconds": 0.0,
+        }
+        jobs = pending
+        batches = [jobs[i:i + self.batch_size] for i in range(0, len(jobs), self.batch_size)]
+
+        store_writers = {}
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            pending_writes = []
+            next_images = [pool.submit(_load_image, job) for job in batches[0]] if batches else []
+
+            for index, batch in enumerate(batches):
+                if self.stop_flag:
+                    break
+                images = [future.result() for future in next_images]
+                # Prefetch the next batch while the models run on this one
+                if index + 1 < len(batches):
+                    next_images = [pool.submit(_load_image, job) for job in batches[index + 1]]
+
+                valid = [(job, image) for job, image in zip(batch, images) if image is not None]
+                summary["failed"] += len(batch) - len(valid)
+                if not valid:
+                    continue
+
+                try:
+                    results = self.process_images([image for _, image in valid])
+                except Exception as e:
+                    print(f"Post-processing batch error: {e}")
+                    summary["failed"] += len(valid)
+                    continue
+
+                store_items = {}
+                failed = 0
+                for (job, _), result in zip(valid, results):
+                    if result is None:
+                        failed += 1
+                        continue
+                    result["fingerprint"] = fingerprint
+                    if job.has_json:
+                        pending_writes.append(([job], pool.submit(
+                            _write_results, job, result, manifests[job.session_dir], fingerprint
+                        )))
+                    else:
+                        store_items.setdefault(job.session_dir, []).append((job, result))
+
+                for session_dir, items in store_items.items():
+                    if session_dir not in store_writers:
+                        store_writers[session_dir] = SessionStoreWriter(session_dir)
+                    pending_writes.append(([job for job, _ in items], pool.submit(
+                        _write_store_results, store_writers[session_dir], items, manifests[session_dir], fingerprint
+                    )))
+
+                summary["processed"] += len(valid) - failed
+                summary["failed"] += failed
+                if self.progress_callback is not None:
+                    self.progress_callback(summary["processed"], summary["total"])
+
+            for written_jobs, future in pending_writes:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error writing results for {written_jobs[0].snapshot_dir}: {e}")
+                    summary["processed"] -= len(written_jobs)
+                    summary["failed"] += len(written_jobs)
+
+        for manifest in manifests.values():
+            if manifest.entries:
+                manifest.compact()
+
+        summary["fingerprint"] = fingerprint
+        summary["seconds"] = round(time.time() - start, 2)
+        return summary
+
+    def run(self, base_dir):
+        """
+        Discovers every snapshot under base_dir and post-processes them.
+        """
+        return self.run_jobs(discover_snapshots(base_dir))
@@ -0,0 +1,93 @@
+# modules/capture_scheduler.py
+
+import math
+import threading
+
+
+class CaptureScheduler:
+    """
+    Decides which camera frames become snapshots, based on the frames' capture
+    timestamps rather than wall-clock timer ticks, so GUI load does not shift the cadence.
+
+    Time mode (default): a snapshot is due every interval_ms on a fixed grid anchored at
+    the first frame; the first frame at or after each due time is captured. If the camera
+    stalls past several due times, the grid skips ahead (counted as missed) instead of
+    bursting to catch up.
+
+    Frame mode (every_n_frames set): every Nth camera frame is captured, which keeps the
+    cadence deterministic regardless of timing.
+    """
+    def __init__(self, interval_ms=1000, every_n_frames=None):
+        self.interval_ms = float(interval_ms)
+        self.every_n_frames = every_n_frames if every_n_frames and every_n_frames > 0 else None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.next_due_ms = None
+            self.first_frame_index = None
+            self.missed = 0
+            # Running interval statistics (Welford) so long sessions use constant memory
+            self.captures = 0
+            self.last_capture_ms = None
+            self.interval_mean = 0.0
+            self.interval_m2 = 0.0
+
+    def should_capture(self, frame_time_ms, frame_index):
+        """
+        Called once per camera frame with its capture time (monotonic, in ms) and index.
+        Returns True if this frame should be saved as a snapshot.
+        """
+        with self.lock:
+            if self.first_frame_index is None:
+                self.first_frame_index = frame_index
+
+            if self.every_n_frames is not None:
+                due = (frame_index - self.first_frame_index) % self.every_n_frames == 0
+            elif self.next_due_ms is None:
+                due = True
+                self.next_due_ms = frame_time_ms + self.interval_ms
+            elif frame_time_ms >= self.next_due_ms:
+                due = True
+                # Advance on the fixed grid; skip slots the camera never delivered a frame for
+                slots = math.floor((frame_time_ms - self.next_due_ms) / self.interval_ms)
+                self.missed += slots
+                self.next_due_ms += (slots + 1) * self.interval_ms
+            else:
+                due = False
+
+            if due:
+                self._record_capture(frame_time_ms)
+            return due
+
+    def _record_capture(self, frame_time_ms):
+        self.captures += 1
+        if self.last_capture_ms is not None:
+            interval = frame_time_ms - self.last_capture_ms
+            count = self.captures - 1
+            delta = interval - self.interval_mean
+            self.interval_mean += delta / count
+            self.interval_m2 += delta * (interval - self.interval_mean)
+        self.last_capture_ms = frame_time_ms
+
+    def stats(self):
+        """
+        Returns the number of captures, achieved rate (Hz), mean interval and jitter
+        (standard deviation of the capture interval), both in ms, and missed slots.
+        """
+        with self.lock:
+            captures = self.captures
+            mean_interval = self.interval_mean
+            m2 = self.interval_m2
+            missed = self.missed
+
+        result = {"captures": captures, "rate_hz": 0.0, "mean_interval_ms": 0.0, "jitter_ms": 0.0, "missed": missed}
+        if captures < 2:
+            return result
+
+        variance = m2 / (captures - 1)
+        result["mean_interval_ms"] = round(mean_interval, 2)
+        result["jitter_ms"] = round(math.sqrt(variance), 2)
+        result["rate_hz"] = round(1000.0 / mean_interval, 3) if mean_interval > 0 else 0.0
+        return result
@@ -1,37 +1,52 @@
 # modules/depth_estimation.py
 
 from transformers import pipeline
+from modules.model_registry import get_model
+from modules.inference_backends import resolve_backend, optimize_model, registry_dtype
 
-def get_depth_map(frame):
+
+DEPTH_MODEL_ID = "depth-anything/Depth-Anything-V2-Small-hf"
+
+
+def get_depth_map(frame, device="cpu"):
     """
     Estimates depth map from a given frame.
     
     Parameters:
         frame (numpy.ndarray): Input frame
-        pipe (transformers.Pipeline): Depth estimation pipeline
+        device (str): Device to run the model on ('cpu' or 'cuda')
     
     Returns:
         numpy.ndarray: Depth map
     """
-    pipe = initialize_depth_pipeline()
+    pipe = initialize_depth_pipeline(device)
     result = pipe(frame)
     depth_map = result["depth"] # type: ignore
     return depth_map
 
 
-def initialize_depth_pipeline(device="cpu"):
+def initialize_depth_pipeline(device="cpu", backend=None):
     """
-    Initializes the depth estimation pipeline.
+    Initializes the depth estimation pipeline. The pipeline is cached in the shared
+    model registry, so repeated calls return the same instance.
     
     Parameters:
         device (str): Device to run the model on ('cpu' or 'cuda')
+        backend (str, optional): Inference backend for the pipeline's model
+            (see modules.inference_backends); defaults to the one configured for "depth"
     
     Returns:
         transformers.Pipeline: The initialized depth estimation pipeline
     """
-    pipe = pipeline(
-        task="depth-estimation",
-        model="depth-anything/Depth-Anything-V2-Small-hf",
-        device=device
-    )
-    return pipe
\ No newline at end of file
+    backend = resolve_backend("depth", DEPTH_MODEL_ID, backend)
+
+    def loader():
+        pipe = pipeline(
+            task="depth-estimation",
+            model=DEPTH_MODEL_ID,
+            device=device
+        )
+        pipe.model = optimize_model(pipe.model, backend, device)
+        return pipe
+
+    return get_model(DEPTH_MODEL_ID, loader, device=device, dtype=registry_dtype(backend))
\ No newline at end of file
@@ -6,7 +6,16 @@ import cv2
 import numpy as np
 import torch
 from transformers import DetrImageProcessor, DetrForObjectDetection
-from PIL import Image
+from modules.model_registry import get_model
+from modules.inference_backends import resolve_backend, optimize_model, registry_dtype
+from modules.frame_buffer import FrameSubscriber
+from modules.sort_tracker import Sort, iou_batch
+from modules.adaptive_detection import DetectionStrideController
+from modules.inference_scheduler import PRIORITY_DETECTION
+from modules.profiling import latency
+
+
+DETR_MODEL_ID = "facebook/detr-resnet-50"
 
 
 
@@ -17,23 +26,32 @@ def simulate_joint_outputs():
     """
     return np.random.rand(360, 3)
 
-def detect_objects_with_huggingface(image, confidence_threshold=0.5):
+def load_detr(device="cpu", backend=None):
     """
-    Runs DETR object detection on 'image' and filters results below self.confidence_threshold.
+    Returns the shared (processor, model) pair for DETR, loading it on first use.
+    backend selects an optimized inference backend (see modules.inference_backends);
+    by default the one configured for "detr" is used.
     """
-    pil_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-    processor = DetrImageProcessor.from_pretrained("facebook/detr-resnet-50")
-    inputs = processor(images=pil_image, return_tensors="pt")
-    model = DetrForObjectDetection.from_pretrained("facebook/detr-resnet-50")
-    outputs = model(**inputs)
+    backend = resolve_backend("detr", DETR_MODEL_ID, backend)
+
+    def loader():
+        processor = DetrImageProcessor.from_pretrained(DETR_MODEL_ID)
+        model = DetrForObjectDetection.from_pretrained(DETR_MODEL_ID)
+        model.to(device)
+        model.eval()
+        return processor, optimize_model(model, backend, device)
 
-    target_sizes = [pil_image.size[::-1]]
-    results = processor.post_process_object_detection(outputs, target_sizes=target_sizes, threshold=0.0)[0]
+    return get_model(DETR_MODEL_ID, loader, device=device, dtype=registry_dtype(backend))
 
+def format_detections(results, id2label, confidence_threshold=0.5):
+    """
+    Converts one DETR post-processing result into a list of
+    {"label", "score", "box"} dicts, dropping detections below confidence_threshold.
+    """
     detected_objects = []
     for score, label, box in zip(results["scores"], results["labels"], results["boxes"]):
         if score.item() >= confidence_threshold:
-            label_name = model.config.id2label[label.item()]
+            label_name = id2label[label.item()]
             box = [round(i, 2) for i in box.tolist()]
             detected_objects.append({
                 "label": label_name,
@@ -42,57 +60,383 @@ def detect_objects_with_huggingface(image, confidence_threshold=0.5):
             })
     return detected_objects
 
+def prepare_detection_input(frame, inference_size=None, roi=None):
+    """
+    Crops a BGR frame to roi ([x1, y1, x2, y2] in frame pixels), shrinks it so its long
+    side is at most inference_size and converts it to RGB. Resizing before the colour
+    conversion keeps the cost proportional to the inference size, not the camera resolution.
+
+    Returns:
+        tuple: (rgb_array, region) where region = (x, y, width, height) is the part of the
+        frame the array covers, for mapping detections back with detections_to_frame().
+    """
+    x, y = 0, 0
+    if roi is not None:
+        x1, y1, x2, y2 = roi
+        frame = frame[y1:y2, x1:x2]
+        x, y = x1, y1
+    height, width = frame.shape[:2]
+    if inference_size and max(height, width) > inference_size:
+        scale = inference_size / max(height, width)
+        frame = cv2.resize(
+            frame, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA
+        )
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), (x, y, width, height)
+
+def detections_to_frame(detected_objects, region):
+    """
+    Moves boxes detected inside a region (as returned by prepare_detection_input) back
+    to full-frame coordinates. DETR post-processing already scales them to the region size.
+    """
+    x, y = region[0], region[1]
+    if x == 0 and y == 0:
+        return detected_objects
+    for obj in detected_objects:
+        x1, y1, x2, y2 = obj["box"]
+        obj["box"] = [round(x1 + x, 2), round(y1 + y, 2), round(x2 + x, 2), round(y2 + y, 2)]
+    return detected_objects
+
+def roi_around_boxes(boxes, frame_shape, margin=0.25, min_size=64):
+    """
+    Returns the region [x1, y1, x2, y2] that covers all boxes plus a margin (a fraction
+    of the covered size on each side), clamped to the frame, or None if there are no boxes.
+    """
+    if len(boxes) == 0:
+        return None
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    frame_height, frame_width = frame_shape[:2]
+    x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+    x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+    pad_x = max((x2 - x1) * margin, (min_size - (x2 - x1)) / 2, 0)
+    pad_y = max((y2 - y1) * margin, (min_size - (y2 - y1)) / 2, 0)
+    x1 = int(max(0, np.floor(x1 - pad_x)))
+    y1 = int(max(0, np.floor(y1 - pad_y)))
+    x2 = int(min(frame_width, np.ceil(x2 + pad_x)))
+    y2 = int(min(frame_height, np.ceil(y2 + pad_y)))
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return None
+    return [x1, y1, x2, y2]
+
+def run_detr(processor, model, rgb_images, regions, confidence_threshold=0.5, device="cpu", resize=True):
+    """
+    Runs DETR on RGB arrays and returns detections in frame coordinates. With
+    resize=False the arrays are fed at their own size instead of the processor's
+    default 800px short side.
+    """
+    inputs = processor(images=rgb_images, return_tensors="pt", do_resize=resize).to(device)
+    with torch.no_grad():
+        outputs = model(**inputs)
+
+    target_sizes = [(region[3], region[2]) for region in regions]
+    results = processor.post_process_object_detection(outputs, target_sizes=target_sizes, threshold=0.0)
+    return [
+        detections_to_frame(format_detections(result, model.config.id2label, confidence_threshold), region)
+        for result, region in zip(results, regions)
+    ]
+
+def detect_objects_batch(images, confidence_threshold=0.5, device="cpu", inference_size=None):
+    """
+    Runs DETR object detection on a list of BGR images in a single forward pass.
+    With inference_size set, images are downscaled so their long side is at most that
+    many pixels; boxes are still returned in the original image coordinates.
+
+    Returns:
+        list: One list of detected objects per input image.
+    """
+    if len(images) == 0:
+        return []
+    prepared = [prepare_detection_input(image, inference_size) for image in images]
+    processor, model = load_detr(device)
+    return run_detr(
+        processor, model,
+        [rgb for rgb, _ in prepared], [region for _, region in prepared],
+        confidence_threshold, device, resize=inference_size is None
+    )
+
+def track_objects(tracker, detected_objects, track_info=None):
+    """
+    Runs one SORT step on a list of detections (as returned by format_detections) and
+    returns the confirmed tracks as {"id", "label", "score", "box"} dicts. SORT does not
+    carry labels, so each track takes the label and score of the detection it overlaps most.
+    If track_info (a dict) is given, it is updated with id -> (label, score) for coast_objects().
+    """
+    if detected_objects:
+        dets = np.array([obj["box"] + [obj["score"]] for obj in detected_objects], dtype=float)
+    else:
+        dets = np.empty((0, 5))
+    tracked = tracker.update(dets)
+    if len(tracked) == 0:
+        return []
+
+    best = np.argmax(iou_batch(tracked, dets), axis=1) if len(dets) else None
+    tracks = []
+    for row, track in enumerate(tracked):
+        source = detected_objects[best[row]] if best is not None else {"label": "", "score": 0.0}
+        tracks.append({
+            "id": int(track[4]),
+            "label": source["label"],
+            "score": source["score"],
+            "box": [round(float(v), 2) for v in track[:4]],
+        })
+    if track_info is not None:
+        for obj in tracks:
+            track_info[obj["id"]] = (obj["label"], obj["score"])
+    return tracks
+
+def coast_objects(tracker, track_info):
+    """
+    Advances the tracker one frame without detections (Sort.coast) and returns the
+    predicted tracks in the same format as track_objects, labelled from track_info.
+    """
+    tracks = []
+    for x1, y1, x2, y2, track_id in tracker.coast():
+        label, score = track_info.get(int(track_id), ("", 0.0))
+        tracks.append({
+            "id": int(track_id),
+            "label": label,
+            "score": score,
+            "box": [round(float(v), 2) for v in (x1, y1, x2, y2)],
+        })
+    return tracks
+
+def interpolate_tracks(previous, current, time_ms):
+    """
+    Estimates track boxes at time_ms from the last two tracking results, each a
+    {"time_ms", "objects"} dict (see LiveDetectionThread). Boxes of tracks present in
+    both results move along their velocity, by at most one detection interval, so the
+    overlay keeps moving between detection updates. Other tracks are shown as they are.
+    """
+    if current is None:
+        return []
+    if previous is None or current["time_ms"] <= previous["time_ms"]:
+        return current["objects"]
+
+    span = current["time_ms"] - previous["time_ms"]
+    alpha = min(max((time_ms - current["time_ms"]) / span, 0.0), 1.0)
+    previous_boxes = {obj["id"]: obj["box"] for obj in previous["objects"]}
+
+    objects = []
+    for obj in current["objects"]:
+        before = previous_boxes.get(obj["id"])
+        if before is None or alpha == 0.0:
+            objects.append(obj)
+            continue
+        box = [now + (now - then) * alpha for now, then in zip(obj["box"], before)]
+        objects.append(dict(obj, box=box))
+    return objects
+
+def detect_objects_with_huggingface(image, confidence_threshold=0.5, device="cpu"):
+    """
+    Runs DETR object detection on 'image' and filters results below self.confidence_threshold.
+    """
+    return detect_objects_batch([image], confidence_threshold, device)[0]
+
 class LiveDetectionThread(threading.Thread):
     """
-    A background thread that periodically runs detection on the latest frame
-    to update bounding boxes for the live feed without blocking the GUI.
+    A background thread that runs detection on new camera frames to update bounding
+    boxes for the live feed without blocking the GUI.
+
+    Each detection result is also fed through a SORT tracker once, here rather than on
+    every GUI tick, and the tracks (with IDs) are published as app.live_tracks together
+    with the previous result (app.previous_live_tracks), stamped with the capture time of
+    the frame they came from, so the display can interpolate between updates.
+
+    The thread blocks until the camera publishes a new frame (at most one every
+    `interval` seconds) and sleeps on an event while detection is disabled, so it does
+    not wake up when there is nothing to do.
+
+    In adaptive mode the thread takes every camera frame but only runs DETR on every
+    Kth one (see DetectionStrideController, which tunes K to a CPU budget and/or overlay
+    latency target); on the other frames the Kalman filters predict the boxes. Detection
+    also runs early when the prediction looks unreliable: a detection lost a track that
+    the previous one had (so it is looked for again on the next frame instead of K frames
+    later) or a predicted box left the frame.
+
+    inference_size caps the long side of the image given to DETR (None lets the processor
+    resize the full frame). With roi enabled, detection runs on a crop around the current
+    tracks, with a full-frame pass every roi_full_frame_every detections (and whenever
+    nothing is tracked) so new objects are still found.
+
+    The DETR forward pass itself is submitted to app.inference (InferenceScheduler) at
+    detection priority; this thread only prepares frames and tracks.
+
+    The DETR model is only loaded (on this thread) the first time detection is enabled.
+    If that fails, detection switches itself off and the error is left in load_error
+    for the GUI to report.
     """
-    def __init__(self, app, interval=0.5):
+    def __init__(self, app, interval=0.5, enabled=False, adaptive=False, cpu_budget=0.5,
+                 latency_ms=None, max_stride=30, inference_size=None, roi=False,
+                 roi_margin=0.25, roi_full_frame_every=5):
         super().__init__(daemon=True)
         self.app = app
         self.interval = interval
+        self.enabled_event = threading.Event()
+        self.enabled = enabled
         self.stop_flag = False
+        self.adaptive = adaptive
+        # Adaptive mode needs every frame so the tracker can predict each one
+        max_rate_hz = None if adaptive or not interval else 1.0 / interval
+        self.subscriber = FrameSubscriber(app.frames, max_rate_hz=max_rate_hz)
+        self.stride_controller = DetectionStrideController(
+            cpu_budget=cpu_budget, latency_ms=latency_ms, max_stride=max_stride
+        ) if adaptive else None
+        self.tracker = None
+        self.track_info = {}
+        self.tracked_ids = set()
+        self.last_seq = 0
+        self.last_objects = []
+
+        self.inference_size = inference_size
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.roi_full_frame_every = roi_full_frame_every
+        self.detections_since_full_frame = 0
+
+        self.processor = None
+        self.model = None
+        self.load_seconds = None
+        self.load_error = None
 
-        # Initialize object detection model
-        self.processor = DetrImageProcessor.from_pretrained("facebook/detr-resnet-50")
-        self.model = DetrForObjectDetection.from_pretrained("facebook/detr-resnet-50")
-        self.model.to(self.app.device)
-        self.model.eval()
+    def load_model(self):
+        """
+        Gets DETR from the model registry, loading it the first time. Called for every
+        frame while detection is on, which keeps the model from counting as idle in the
+        registry. Returns False (with the message in load_error) if it could not be loaded.
+        """
+        start = time.time()
+        try:
+            self.processor, self.model = load_detr(self.app.device)
+        except Exception as e:
+            print(f"Error loading detection model: {e}")
+            self.load_error = str(e)
+            return False
+        if self.load_seconds is None:
+            self.load_seconds = time.time() - start
+        return True
 
-    def run(self, disable=True):
+    @property
+    def enabled(self):
+        return self.enabled_event.is_set()
+
+    @enabled.setter
+    def enabled(self, value):
+        if value:
+            self.enabled_event.set()
+        else:
+            self.enabled_event.clear()
+
+    def run(self):
         while not self.stop_flag:
-            frame_copy = None
+            if not self.enabled_event.wait(timeout=1.0):
+                # Start from fresh tracks the next time detection is switched on, and let
+                # the registry unload DETR if it stays unused
+                self.tracker = None
+                self.processor = None
+                self.model = None
+                continue
+            if self.stop_flag:
+                # Woken by stop(); do not load the model on the way out
+                break
+
+            if not self.load_model():
+                self.enabled = False
+                continue
+            if self.tracker is None:
+                self.tracker = Sort(max_age=5, min_hits=2, iou_threshold=0.3, batched=True)
+                self.track_info = {}
+                self.last_seq = 0
+                self.last_objects = []
+                self.tracked_ids = set()
+                if self.adaptive:
+                    self.stride_controller.restart()
+
+            # Wait for a frame we have not processed yet; the timeout lets us notice stop()
+            ref = self.subscriber.next_frame(timeout=1.0)
+            if ref is None:
+                continue
+
+            with ref:
+                frame_time_ms = ref.monotonic_ms
+                frame_height, frame_width = ref.array.shape[:2]
+                steps = ref.seq - self.last_seq if self.last_seq else 1
+                self.last_seq = ref.seq
+                run_detection = True
+                if self.adaptive:
+                    self.stride_controller.record_frame(frame_time_ms, steps)
+                    run_detection = self.stride_controller.should_detect()
+                if run_detection:
+                    with latency.measure("detection.prepare"):
+                        rgb_image, region = prepare_detection_input(
+                            ref.array, self.inference_size, self.choose_roi(ref.array.shape)
+                        )
+
+            if self.adaptive:
+                # Keep the Kalman filters in step with camera frames dropped while we were busy
+                for _ in range(steps - 1):
+                    self.tracker.coast()
+
+            detected_objects = None
+            if run_detection:
+                start = time.perf_counter()
+                # DETR runs on the shared inference pool, ahead of lower priority models
+                detected_objects = self.app.inference.run(
+                    "detr", self.detect, rgb_image, region, priority=PRIORITY_DETECTION, replace=True
+                )
+                if detected_objects is None:
+                    # Dropped because the scheduler is shutting down
+                    continue
+                latency.record("detection.inference", (time.perf_counter() - start) * 1000, start)
+                with latency.measure("detection.tracking"):
+                    objects = track_objects(self.tracker, detected_objects, self.track_info)
+                if self.adaptive:
+                    self.stride_controller.record_detection(time.perf_counter() - start)
+                    ids = {obj["id"] for obj in objects}
+                    if self.tracked_ids - ids:
+                        self.stride_controller.request_detection()
+                    self.tracked_ids = ids
+            else:
+                with latency.measure("detection.tracking"):
+                    objects = coast_objects(self.tracker, self.track_info)
+                # Coasting only drops tracks whose prediction became invalid
+                if len(objects) < len(self.tracked_ids) or any(
+                    not (0 <= (obj["box"][0] + obj["box"][2]) / 2 < frame_width and
+                         0 <= (obj["box"][1] + obj["box"][3]) / 2 < frame_height)
+                    for obj in objects
+                ):
+                    self.stride_controller.request_detection()
+            self.last_objects = objects
+            tracks = {"time_ms": frame_time_ms, "objects": objects}
+
+            joints = simulate_joint_outputs()
+
+            if not self.enabled:
+                # Switched off while this frame was being processed
+                continue
             with self.app.lock:
-                if self.app.frame is not None:
-                    frame_copy = self.app.frame.copy()
-
-            if frame_copy is not None and not disable:
-                pil_image = Image.fromarray(frame_copy[:, :, ::-1])  # Convert BGR to RGB
-                inputs = self.processor(images=pil_image, return_tensors="pt").to(self.app.device)
-                with torch.no_grad():
-                    outputs = self.model(**inputs)
-
-                target_sizes = [pil_image.size[::-1]]
-                results = self.processor.post_process_object_detection(outputs, target_sizes=target_sizes, threshold=0.0)[0]
-
-                detected_objects = []
-                for score, label, box in zip(results["scores"], results["labels"], results["boxes"]):
-                    if score.item() >= self.app.confidence_threshold:
-                        label_name = self.model.config.id2label[label.item()]
-                        box = [round(i, 2) for i in box.tolist()]
-                        detected_objects.append({
-                            "label": label_name,
-                            "score": round(score.item(), 2),
-                            "box": box
-                        })
-
-                joints = simulate_joint_outputs()
-
-                with self.app.lock:
+                if detected_objects is not None:
                     self.app.live_detected_objects = detected_objects
                     self.app.live_joint_outputs = joints
+                self.app.previous_live_tracks = self.app.live_tracks
+                self.app.live_tracks = tracks
+            # Camera capture to tracks available for the overlay
+            latency.record("detection.frame_to_tracks", time.monotonic() * 1000 - frame_time_ms)
+
+    def choose_roi(self, frame_shape):
+        """
+        Returns the crop to detect in, or None for the full frame.
+        """
+        roi = None
+        if self.roi and self.detections_since_full_frame < self.roi_full_frame_every - 1:
+            roi = roi_around_boxes([obj["box"] for obj in self.last_objects], frame_shape, self.roi_margin)
+        self.detections_since_full_frame = self.detections_since_full_frame + 1 if roi is not None else 0
+        return roi
 
-            time.sleep(self.interval)
+    def detect(self, rgb_image, region):
+        return run_detr(
+            self.processor, self.model, [rgb_image], [region],
+            self.app.confidence_threshold, self.app.device, resize=self.inference_size is None
+        )[0]
 
     def stop(self):
-        self.stop_flag = True
\ No newline at end of file
+        self.stop_flag = True
+        self.enabled_event.set()
\ No newline at end of file
@@ -1,29 +1,232 @@
 # modules/emotion_detection.py
 
-from deepface import DeepFace
+import os
+import inspect
+import threading
+import cv2
+import numpy as np
+from modules.model_registry import get_model
+from modules.session_store import EMOTION_LABELS
 
 
-def detect_emotions_deepface(image):
+EMOTION_INPUT_SIZE = (48, 48)
+# "opencv" uses a Haar cascade directly (fastest); the others go through DeepFace's detectors
+FACE_DETECTORS = ("opencv", "ssd", "yunet", "mtcnn", "retinaface", "mediapipe")
+DEFAULT_FACE_DETECTOR = "opencv"
+
+_analyzers = {}
+_analyzers_lock = threading.Lock()
+
+
+def load_emotion_model():
     """
-    Runs DeepFace emotion detection on 'image' and returns a list of detected emotions with bounding boxes.
+    Loads DeepFace's facial expression model once and returns the underlying Keras model.
+    Tested with deepface 0.0.102 (pinned in requirements.txt); older releases without
+    build_model's task argument are supported too.
     """
-    try:
-        analysis = DeepFace.analyze(image, actions=['emotion'], enforce_detection=False)
-        emotions = []
-        if isinstance(analysis, list):
-            for face in analysis:
-                emotions.append({
-                    "dominant_emotion": face["dominant_emotion"],
-                    "emotions": face["emotion"],
-                    "region": face["region"]
-                })
+    def loader():
+        from deepface import DeepFace
+        if "task" in inspect.signature(DeepFace.build_model).parameters:
+            # Since 0.0.93 "Emotion" is only registered as a facial attribute model
+            model = DeepFace.build_model("Emotion", task="facial_attribute")
         else:
-            emotions.append({
-                "dominant_emotion": analysis["dominant_emotion"],
-                "emotions": analysis["emotion"],
-                "region": analysis["region"]
-            })
+            model = DeepFace.build_model("Emotion")
+        # Newer DeepFace versions wrap the Keras model in a client object
+        return getattr(model, "model", model)
+    return get_model("deepface:Emotion", loader)
+
+
+def load_face_cascade():
+    """
+    Returns OpenCV's frontal face Haar cascade, or None if this OpenCV build has no
+    cascade support or does not ship the cascade file.
+    """
+    data = getattr(cv2, "data", None)
+    if not hasattr(cv2, "CascadeClassifier") or not hasattr(data, "haarcascades"):
+        return None
+    path = os.path.join(data.haarcascades, "haarcascade_frontalface_default.xml")
+    if not os.path.exists(path):
+        return None
+    cascade = cv2.CascadeClassifier(path)
+    return None if cascade.empty() else cascade
+
+
+class EmotionAnalyzer:
+    """
+    Facial expression analysis with models that are loaded once and reused.
+
+    DeepFace.analyze rebuilds its pipeline and runs face detection with the default
+    detector on every call, and with enforce_detection=False it classifies the whole
+    image when no face is found. Here the face detector (detector_backend, see
+    FACE_DETECTORS) and the emotion model stay loaded, faces from a whole batch of frames
+    are classified in one model call, and frames without a face skip classification and
+    return no emotions.
+
+    Results have the same layout as detect_emotions_deepface: a list per image of
+    {"dominant_emotion", "emotions" (percent per label), "region" (x, y, w, h)}.
+    """
+    def __init__(self, detector_backend=DEFAULT_FACE_DETECTOR, min_face_size=30, min_confidence=0.5):
+        if detector_backend not in FACE_DETECTORS:
+            raise ValueError(f"Unknown face detector '{detector_backend}', expected one of {FACE_DETECTORS}")
+        self.detector_backend = detector_backend
+        self.min_face_size = min_face_size
+        self.min_confidence = min_confidence
+        self.model = load_emotion_model()
+        self.cascade = None
+        if detector_backend == "opencv":
+            # None (e.g. OpenCV 5, which ships no cascade files) falls back to DeepFace's
+            # opencv detector, which downloads the cascade itself
+            self.cascade = load_face_cascade()
+        # The cascade and the Keras model are not safe to share between threads
+        self.lock = threading.Lock()
+        self.images = 0
+        self.images_without_faces = 0
+        self.faces = 0
+
+    def detect_faces(self, image):
+        """
+        Returns the face regions in a BGR image as {"x", "y", "w", "h"} dicts.
+        """
+        if self.cascade is not None:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            boxes = self.cascade.detectMultiScale(
+                gray, scaleFactor=1.1, minNeighbors=5, minSize=(self.min_face_size, self.min_face_size)
+            )
+            return [{"x": int(x), "y": int(y), "w": int(w), "h": int(h)} for x, y, w, h in boxes]
+
+        from deepface import DeepFace
+        # DeepFace keeps its detector models cached between calls
+        faces = DeepFace.extract_faces(
+            image, detector_backend=self.detector_backend, enforce_detection=False, align=False
+        )
+        regions = []
+        for face in faces:
+            area = face["facial_area"]
+            # With enforce_detection=False a frame without faces comes back as one
+            # whole-image "face" with confidence 0
+            if face.get("confidence", 0) < self.min_confidence:
+                continue
+            if min(area["w"], area["h"]) < self.min_face_size:
+                continue
+            regions.append({key: int(area[key]) for key in ("x", "y", "w", "h")})
+        return regions
+
+    def _face_input(self, image, region):
+        x, y, w, h = region["x"], region["y"], region["w"], region["h"]
+        crop = image[max(0, y):y + h, max(0, x):x + w]
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        gray = cv2.resize(gray, EMOTION_INPUT_SIZE, interpolation=cv2.INTER_AREA)
+        return gray.astype(np.float32) / 255.0
+
+    def classify(self, faces):
+        """
+        Runs the emotion model on a batch of 48x48 grayscale faces (values in [0, 1])
+        and returns an (N, 7) array of probabilities.
+        """
+        if not faces:
+            return np.empty((0, len(EMOTION_LABELS)), dtype=np.float32)
+        batch = np.stack(faces)[..., np.newaxis]
+        return np.asarray(self.model.predict(batch, verbose=0), dtype=np.float32)
+
+    def _image_faces(self, image):
+        regions = self.detect_faces(image)
+        return regions, [self._face_input(image, region) for region in regions]
+
+    def analyze_batch(self, images):
+        """
+        Detects faces in every image, classifies all faces in one batch and returns
+        one list of emotion results per image. Images that could not be analyzed
+        (unreadable, or the detector or model failed on them) get None instead, so
+        one bad image does not lose the results of the rest of the batch.
+        """
+        with self.lock:
+            per_image = []
+            for index, image in enumerate(images):
+                try:
+                    per_image.append(self._image_faces(image))
+                except Exception as e:
+                    print(f"Emotion detection error on image {index}: {e}")
+                    per_image.append(None)
+
+            analyzed = [item for item in per_image if item is not None]
+            try:
+                probabilities = self.classify([face for _, faces in analyzed for face in faces])
+                probabilities_per_image = []
+                row = 0
+                for _, faces in analyzed:
+                    probabilities_per_image.append(probabilities[row:row + len(faces)])
+                    row += len(faces)
+            except Exception as e:
+                # Find the images the model fails on instead of failing the batch
+                print(f"Emotion classification error, retrying image by image: {e}")
+                probabilities_per_image = []
+                for _, faces in analyzed:
+                    try:
+                        probabilities_per_image.append(self.classify(faces))
+                    except Exception as e:
+                        print(f"Emotion classification error: {e}")
+                        probabilities_per_image.append(None)
+
+            results = []
+            analyzed_probabilities = iter(probabilities_per_image)
+            for item in per_image:
+                image_probabilities = next(analyzed_probabilities) if item is not None else None
+                if image_probabilities is None:
+                    results.append(None)
+                    continue
+                regions, _ = item
+                results.append([
+                    {
+                        "dominant_emotion": EMOTION_LABELS[int(np.argmax(percent))],
+                        "emotions": {label: float(value) for label, value in zip(EMOTION_LABELS, percent)},
+                        "region": region,
+                    }
+                    for region, percent in zip(regions, image_probabilities * 100.0)
+                ])
+
+            done = [emotions for emotions in results if emotions is not None]
+            self.images += len(done)
+            self.images_without_faces += sum(1 for emotions in done if not emotions)
+            self.faces += sum(len(emotions) for emotions in done)
+        return results
+
+    def analyze(self, image):
+        """
+        Analyzes one image; raises if it could not be analyzed.
+        """
+        emotions = self.analyze_batch([image])[0]
+        if emotions is None:
+            raise RuntimeError("Emotion analysis failed")
         return emotions
+
+    def stats(self):
+        return {
+            "detector_backend": self.detector_backend,
+            "images": self.images,
+            "images_without_faces": self.images_without_faces,
+            "faces": self.faces,
+        }
+
+
+def get_emotion_analyzer(detector_backend=DEFAULT_FACE_DETECTOR):
+    """
+    Returns the shared EmotionAnalyzer for a face detector, creating it on first use.
+    """
+    with _analyzers_lock:
+        analyzer = _analyzers.get(detector_backend)
+        if analyzer is None:
+            analyzer = EmotionAnalyzer(detector_backend)
+            _analyzers[detector_backend] = analyzer
+        return analyzer
+
+
+def detect_emotions_deepface(image, detector_backend=DEFAULT_FACE_DETECTOR):
+    """
+    Runs emotion detection on 'image' and returns a list of detected emotions with bounding
+    boxes (empty when there is no face). Uses the shared EmotionAnalyzer.
+    """
+    try:
+        return get_emotion_analyzer(detector_backend).analyze(image)
     except Exception as e:
         print(f"Emotion detection error: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,205 @@
+# modules/frame_buffer.py
+
+import threading
+import time
+import numpy as np
+
+
+class FrameRef:
+    """
+    Read access to one frame in a FrameRingBuffer. The slot is not reused by the
+    camera while the reference is held, so `array` can be read without copying.
+    Use as a context manager, or call release() when done.
+    """
+    def __init__(self, buffer, slot, seq, timestamp_ms, monotonic_ms, array):
+        self.buffer = buffer
+        self.slot = slot
+        self.seq = seq
+        self.timestamp_ms = timestamp_ms
+        self.monotonic_ms = monotonic_ms
+        self.array = array
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.buffer._release(self.slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class FrameRingBuffer:
+    """
+    A small set of preallocated frame slots shared between the camera thread and its
+    consumers (display, snapshots, live detection, captioning).
+
+    The camera reads directly into a free slot (cap.read(slot)) and publishes it with a
+    sequence number. Consumers acquire the latest frame as a read-only, reference
+    counted view instead of copying it, and compare sequence numbers to tell whether
+    they have already seen it. A slot is only rewritten once no reader holds it.
+
+    Consumers that want every new frame block in wait_for_frame() (or through a
+    FrameSubscriber) and are woken by publish() instead of sleep-polling.
+    """
+    def __init__(self, capacity=4):
+        if capacity < 2:
+            raise ValueError("FrameRingBuffer needs at least 2 slots")
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
+        self.closed = False
+        self.slots = [None] * capacity
+        self.refcounts = [0] * capacity
+        self.slot_seq = [0] * capacity
+        self.slot_times = [(0, 0.0)] * capacity
+        self.latest_slot = None
+        self.latest_seq = 0
+        self.next_slot = 0
+        self.dropped = 0
+
+    def acquire_write_slot(self, shape, dtype=np.uint8):
+        """
+        Returns (slot_index, array) for the camera to fill, or (None, None) when every
+        other slot is still being read (the caller should then skip this frame).
+        Slot arrays are allocated on first use and reallocated if the frame shape changes.
+        """
+        with self.lock:
+            for offset in range(self.capacity):
+                index = (self.next_slot + offset) % self.capacity
+                if index == self.latest_slot or self.refcounts[index] > 0:
+                    continue
+                array = self.slots[index]
+                if array is None or array.shape != tuple(shape) or array.dtype != dtype:
+                    array = np.empty(shape, dtype=dtype)
+                    self.slots[index] = array
+                # Mark the slot busy so it is not handed out twice before publish()
+                self.refcounts[index] = 1
+                self.next_slot = (index + 1) % self.capacity
+                return index, array
+            self.dropped += 1
+            return None, None
+
+    def publish(self, slot, timestamp_ms, monotonic_ms, array=None):
+        """
+        Makes a filled slot the latest frame and returns its sequence number. If the
+        capture produced a new array instead of filling the slot, pass it as `array`.
+        """
+        with self.lock:
+            if array is not None and array is not self.slots[slot]:
+                self.slots[slot] = array
+            self.refcounts[slot] = 0
+            self.latest_seq += 1
+            self.latest_slot = slot
+            self.slot_seq[slot] = self.latest_seq
+            self.slot_times[slot] = (timestamp_ms, monotonic_ms)
+            self.new_frame.notify_all()
+            return self.latest_seq
+
+    def cancel_write(self, slot):
+        with self.lock:
+            self.refcounts[slot] = 0
+
+    def acquire_latest(self, after_seq=None):
+        """
+        Returns a FrameRef to the most recent frame, or None if there is no frame yet
+        or (when after_seq is given) the latest frame is not newer than after_seq.
+        """
+        with self.lock:
+            return self._acquire_latest_locked(after_seq)
+
+    def wait_for_frame(self, after_seq=0, timeout=None):
+        """
+        Blocks until a frame newer than after_seq is published (or timeout seconds pass,
+        or the buffer is closed) and returns a FrameRef to it, or None.
+        """
+        with self.lock:
+            self.new_frame.wait_for(
+                lambda: self.closed or (self.latest_slot is not None and self.latest_seq > after_seq),
+                timeout=timeout
+            )
+            return self._acquire_latest_locked(after_seq)
+
+    def close(self):
+        """
+        Wakes every waiting consumer; used on shutdown.
+        """
+        with self.lock:
+            self.closed = True
+            self.new_frame.notify_all()
+
+    def _acquire_latest_locked(self, after_seq):
+        if self.latest_slot is None:
+            return None
+        if after_seq is not None and self.latest_seq <= after_seq:
+            return None
+        slot = self.latest_slot
+        self.refcounts[slot] += 1
+        view = self.slots[slot].view()
+        view.flags.writeable = False
+        timestamp_ms, monotonic_ms = self.slot_times[slot]
+        return FrameRef(self, slot, self.slot_seq[slot], timestamp_ms, monotonic_ms, view)
+
+    def _release(self, slot):
+        with self.lock:
+            self.refcounts[slot] -= 1
+
+
+class FrameSubscriber:
+    """
+    One consumer's view of a FrameRingBuffer. next_frame() blocks until the camera
+    publishes a frame this subscriber has not seen yet, and never returns frames faster
+    than max_rate_hz (None means every new frame). Frames published while the consumer
+    was busy or rate limited are skipped, not queued, so a slow model always works on
+    the freshest frame.
+    """
+    def __init__(self, buffer, max_rate_hz=None):
+        self.buffer = buffer
+        self.last_seq = 0
+        self.last_delivery = None
+        self.delivered = 0
+        self.skipped = 0
+        self.set_rate(max_rate_hz)
+
+    def set_rate(self, max_rate_hz):
+        self.min_interval = 1.0 / max_rate_hz if max_rate_hz else 0.0
+
+    def next_frame(self, timeout=None):
+        """
+        Returns a FrameRef to the next frame (release it when done), or None if no new
+        frame arrived within timeout seconds or the buffer was closed. Callers use the
+        timeout to periodically check their own stop flags.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        if self.last_delivery is not None and self.min_interval > 0:
+            ready_at = self.last_delivery + self.min_interval
+            wait = ready_at - time.monotonic()
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            if wait > 0:
+                # Sleep on the condition so close() still wakes us up
+                with self.buffer.lock:
+                    self.buffer.new_frame.wait_for(lambda: self.buffer.closed, timeout=wait)
+            if self.buffer.closed or time.monotonic() < ready_at:
+                return None
+
+        remaining = None
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+        ref = self.buffer.wait_for_frame(after_seq=self.last_seq, timeout=remaining)
+        if ref is None:
+            return None
+
+        if self.last_seq:
+            self.skipped += max(0, ref.seq - self.last_seq - 1)
+        self.last_seq = ref.seq
+        self.last_delivery = time.monotonic()
+        self.delivered += 1
+        return ref
+
+    def stats(self):
+        return {"delivered": self.delivered, "skipped": self.skipped}
@@ -2,44 +2,163 @@
 
 import threading
 import time
+import cv2
 import numpy as np
+import torch
 from PyQt5.QtCore import QThread, pyqtSignal, QObject
-from transformers import BlipProcessor, BlipForConditionalGeneration
+from transformers import (
+    BlipProcessor, BlipForConditionalGeneration, VisionEncoderDecoderModel,
+    ViTImageProcessor, AutoTokenizer, ViltProcessor, ViltForQuestionAnswering
+)
 from PIL import Image
+from modules.model_registry import get_model
+from modules.inference_backends import resolve_backend, optimize_model, registry_dtype
+from modules.frame_buffer import FrameSubscriber
+from modules.scene_change import SceneChangeGate
+from modules.inference_scheduler import PRIORITY_CAPTION
+from modules.profiling import latency
 
 
+BLIP_LARGE_MODEL_ID = "Salesforce/blip-image-captioning-large"
+BLIP_BASE_MODEL_ID = "salesforce/blip-image-captioning-base"
+VIT_GPT2_MODEL_ID = "nlpconnect/vit-gpt2-image-captioning"
+VILT_MODEL_ID = "dandelin/vilt-b32-finetuned-vqa"
+
+
+def load_blip(model_id=BLIP_LARGE_MODEL_ID, device="cpu", backend=None):
+    """
+    Returns the shared (processor, model) pair for a BLIP captioning checkpoint.
+    backend defaults to the one configured for the checkpoint or for "blip".
+    """
+    backend = resolve_backend("blip", model_id, backend)
+
+    def loader():
+        processor = BlipProcessor.from_pretrained(model_id)
+        model = BlipForConditionalGeneration.from_pretrained(model_id)
+        model.to(device)
+        model.eval()
+        return processor, optimize_model(model, backend, device)
+
+    return get_model(model_id, loader, device=device, dtype=registry_dtype(backend))
+
+
+def load_vit_gpt2(device="cpu", backend=None):
+    """
+    Returns the shared (model, feature_extractor, tokenizer) triple for ViT-GPT2 captioning.
+    """
+    backend = resolve_backend("vit_gpt2", VIT_GPT2_MODEL_ID, backend)
+
+    def loader():
+        model = VisionEncoderDecoderModel.from_pretrained(VIT_GPT2_MODEL_ID)
+        model.to(device)
+        model.eval()
+        model = optimize_model(model, backend, device)
+        feature_extractor = ViTImageProcessor.from_pretrained(VIT_GPT2_MODEL_ID)
+        tokenizer = AutoTokenizer.from_pretrained(VIT_GPT2_MODEL_ID)
+        return model, feature_extractor, tokenizer
+
+    return get_model(VIT_GPT2_MODEL_ID, loader, device=device, dtype=registry_dtype(backend))
+
+
+def load_vilt(device="cpu", backend=None):
+    """
+    Returns the shared (processor, model) pair for ViLT visual question answering.
+    """
+    backend = resolve_backend("vilt", VILT_MODEL_ID, backend)
+
+    def loader():
+        processor = ViltProcessor.from_pretrained(VILT_MODEL_ID)
+        model = ViltForQuestionAnswering.from_pretrained(VILT_MODEL_ID)
+        model.to(device)
+        model.eval()
+        return processor, optimize_model(model, backend, device)
+
+    return get_model(VILT_MODEL_ID, loader, device=device, dtype=registry_dtype(backend))
+
 class SFImageCaptioningThread(threading.Thread):
     """
-    A background thread that periodically runs image captioning on the latest frame
-    to generate image descriptions without blocking the GUI.
+    A background thread that runs image captioning on new camera frames (at most one
+    every `interval` seconds) to generate image descriptions without blocking the GUI.
+
+    BLIP only runs when the scene changed since the last captioned frame (see
+    SceneChangeGate, change_threshold is the mean thumbnail difference that counts as a
+    change); otherwise the previous caption is kept. counters() reports how many
+    captions were generated and how many were skipped.
+
+    Generation runs on app.inference (InferenceScheduler) at the lowest priority with a
+    deadline, so captions never delay the detection overlay; a caption job that could not
+    start in time is dropped and the next changed frame is tried instead.
+
+    The BLIP model is loaded on this thread when it starts, not in the constructor. If
+    it cannot be loaded the thread ends with the error in load_error.
     """
-    def __init__(self, app, interval=0.5):
+    def __init__(self, app, interval=0.5, change_threshold=0.04, max_reuse_seconds=None):
         super().__init__(daemon=True)
         self.app = app
         self.interval = interval
         self.stop_flag = False
+        self.subscriber = FrameSubscriber(app.frames, max_rate_hz=1.0 / interval if interval else None)
+        self.gate = SceneChangeGate(threshold=change_threshold, max_reuse_seconds=max_reuse_seconds)
+        self.generated = 0
+        self.skipped = 0
 
-        # Initialize the captioning model
-        self.processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-large")
-        self.model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-large")
-        self.model.to(self.app.device)
+        self.processor = None
+        self.model = None
+        self.load_error = None
+
+    def load_model(self):
+        """
+        Gets BLIP from the model registry, loading it the first time. Called before every
+        caption, which keeps the model from counting as idle in the registry. Returns
+        False (with the message in load_error) if it could not be loaded.
+        """
+        try:
+            self.processor, self.model = load_blip(BLIP_LARGE_MODEL_ID, self.app.device)
+        except Exception as e:
+            print(f"Error loading captioning model: {e}")
+            self.load_error = str(e)
+            return False
+        return True
 
     def run(self):
+        # Initialize the captioning model (shared through the model registry)
+        if not self.load_model():
+            return
+
         while not self.stop_flag:
-            frame_copy = None
-            with self.app.lock:
-                if self.app.frame is not None:
-                    frame_copy = self.app.frame.copy()
-
-            if frame_copy is not None:
-                pil_image = Image.fromarray(frame_copy[:, :, ::-1])  # Convert BGR to RGB
-                inputs = self.processor(images=pil_image, return_tensors="pt")  # type: ignore
-                out = self.model.generate(**inputs, max_length=16, num_beams=4) # type: ignore
-                caption = self.processor.decode(out[0], skip_special_tokens=True) # type: ignore
+            # Wait for a frame we have not captioned yet; the timeout lets us notice stop()
+            ref = self.subscriber.next_frame(timeout=1.0)
+            if ref is not None:
+                with ref:
+                    with latency.measure("caption.gate"):
+                        changed = self.gate.changed(ref.array)
+                    if not changed:
+                        # Same scene as the last caption; keep it
+                        self.skipped += 1
+                        continue
+                    pil_image = Image.fromarray(cv2.cvtColor(ref.array, cv2.COLOR_BGR2RGB))
+                if not self.load_model():
+                    return
+                caption = self.app.inference.run(
+                    "blip", self.caption, pil_image,
+                    priority=PRIORITY_CAPTION, deadline_s=max(1.0, 2 * self.interval), replace=True
+                )
+                if caption is None:
+                    # Not started before its deadline; caption the next frame instead
+                    self.gate.reset()
+                    continue
+                self.generated += 1
                 with self.app.lock:
                     self.app.live_image_caption = caption
 
-            time.sleep(self.interval)
+    def caption(self, pil_image):
+        inputs = self.processor(images=pil_image, return_tensors="pt")  # type: ignore
+        with torch.no_grad():
+            out = self.model.generate(**inputs, max_length=16, num_beams=4) # type: ignore
+        return self.processor.decode(out[0], skip_special_tokens=True) # type: ignore
+
+    def counters(self):
+        return {"generated": self.generated, "skipped": self.skipped}
 
     def stop(self):
         self.stop_flag = True
\ No newline at end of file
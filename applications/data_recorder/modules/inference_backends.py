@@ -0,0 +1,89 @@
+# modules/inference_backends.py
+
+import threading
+import torch
+
+
+# Available backends:
+#   "eager":   the model as loaded (fp32, eager PyTorch)
+#   "int8":    dynamic int8 quantization of the Linear layers (CPU only)
+#   "compile": torch.compile on the modules the model runs (the first calls are slow while it compiles)
+BACKENDS = ("eager", "int8", "compile")
+DEFAULT_BACKEND = "eager"
+
+_configured = {}
+_lock = threading.Lock()
+
+
+def configure_backends(backends):
+    """
+    Sets the backend to use per model id (or per short name, as used by the loaders:
+    "detr", "blip", "vit_gpt2", "vilt", "depth", "superpoint"). Loaders called without an
+    explicit backend pick it up from here.
+    """
+    for name, backend in backends.items():
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}' for {name}, expected one of {BACKENDS}")
+    with _lock:
+        _configured.update(backends)
+
+
+def resolve_backend(name, model_id=None, backend=None):
+    """
+    Returns the backend to use: the explicit one if given, else the configured one for
+    the model id or short name, else "eager".
+    """
+    if backend is not None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+        return backend
+    with _lock:
+        return _configured.get(model_id, _configured.get(name, DEFAULT_BACKEND))
+
+
+def registry_dtype(backend):
+    """
+    The dtype part of the model registry key, so each backend is cached separately.
+    """
+    return None if backend == DEFAULT_BACKEND else backend
+
+
+def _compiled_modules(model):
+    """
+    The modules whose forward the "compile" backend compiles. generate() of BLIP calls
+    its vision_model and text_decoder directly (never the top-level forward), and
+    encoder-decoder models (ViT-GPT2) run the encoder on its own before decoding, so for
+    those the submodules are compiled; everything else has its forward compiled.
+    """
+    if hasattr(model, "vision_model") and hasattr(model, "text_decoder"):
+        return [model.vision_model, model.text_decoder]
+    if hasattr(model, "encoder") and hasattr(model, "decoder"):
+        return [model.encoder, model.decoder]
+    return [model]
+
+
+def optimize_model(model, backend, device="cpu"):
+    """
+    Returns the model prepared for the given backend. The model must already be in eval
+    mode on its device. Backends that do not apply (int8 on a GPU, torch.compile on a
+    build without it) fall back to eager with a message rather than failing.
+    """
+    if backend == "eager":
+        return model
+
+    if backend == "int8":
+        if str(device) != "cpu":
+            print(f"int8 dynamic quantization is CPU only; using eager {type(model).__name__} on {device}")
+            return model
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if backend == "compile":
+        if not hasattr(torch, "compile"):
+            print("torch.compile is not available in this PyTorch build; using eager")
+            return model
+        for module in _compiled_modules(model):
+            # Compiled in place, so the model object and its callers stay the same
+            module.forward = torch.compile(module.forward, dynamic=True)
+        return model
+
+    raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
@@ -0,0 +1,212 @@
+# modules/inference_scheduler.py
+
+import os
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from modules.profiling import latency
+
+
+# Lower runs first
+PRIORITY_DETECTION = 0
+PRIORITY_DEPTH = 1
+PRIORITY_KEYPOINTS = 1
+PRIORITY_CAPTION = 2
+
+
+class _ModelStats:
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.expired = 0
+        self.replaced = 0
+        self.failed = 0
+        self.wait_ms = None
+        self.run_ms = None
+        self.max_run_ms = 0.0
+
+    def record(self, wait_ms, run_ms, smoothing=0.2):
+        self.completed += 1
+        self.wait_ms = wait_ms if self.wait_ms is None else self.wait_ms + smoothing * (wait_ms - self.wait_ms)
+        self.run_ms = run_ms if self.run_ms is None else self.run_ms + smoothing * (run_ms - self.run_ms)
+        self.max_run_ms = max(self.max_run_ms, run_ms)
+
+
+class _Task:
+    def __init__(self, model, func, args, kwargs, priority, deadline):
+        self.model = model
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.deadline = deadline
+        self.submitted = time.monotonic()
+        self.future = Future()
+
+
+class InferenceScheduler:
+    """
+    Runs model calls from every live feature (detection, captioning, ...) on one fixed
+    pool of worker threads instead of letting each feature thread compete for the CPU.
+
+    Jobs are ordered by priority (lower first; detection before captions), then by
+    deadline, then by submission order. A job whose deadline passes while it is still
+    queued is dropped rather than run late. With replace=True a new job replaces the
+    model's queued one, so a slow model only ever has its freshest frame waiting.
+
+    torch_threads sets torch.set_num_threads for the process; by default the cores are
+    split between the workers so concurrent jobs do not oversubscribe the CPU.
+    """
+    def __init__(self, num_workers=2, torch_threads=None):
+        self.num_workers = max(1, num_workers)
+        if torch_threads is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.torch_threads = torch_threads
+        self.condition = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        self.latest = {}
+        self.stats_by_model = {}
+        self.workers = []
+        self.stopped = False
+
+    def start(self):
+        try:
+            import torch
+            torch.set_num_threads(self.torch_threads)
+        except ImportError:
+            pass
+        for index in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"inference-{index}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, model, func, *args, priority=PRIORITY_DETECTION, deadline_s=None, replace=False, **kwargs):
+        """
+        Queues func(*args, **kwargs) as a job for `model` (a name used for statistics)
+        and returns a concurrent.futures.Future. deadline_s is relative to now. Dropped
+        (expired or replaced) jobs end up cancelled.
+        """
+        deadline = time.monotonic() + deadline_s if deadline_s is not None else None
+        task = _Task(model, func, args, kwargs, priority, deadline)
+        with self.condition:
+            if self.stopped:
+                task.future.cancel()
+                return task.future
+            stats = self.stats_by_model.setdefault(model, _ModelStats())
+            if replace:
+                previous = self.latest.get(model)
+                if previous is not None and previous.future.cancel():
+                    stats.replaced += 1
+                    stats.queued -= 1
+            self.latest[model] = task
+            stats.queued += 1
+            sort_deadline = deadline if deadline is not None else float("inf")
+            heapq.heappush(self.heap, (priority, sort_deadline, next(self.counter), task))
+            self.condition.notify()
+        return task.future
+
+    def run(self, model, func, *args, priority=PRIORITY_DETECTION, deadline_s=None, replace=False, **kwargs):
+        """
+        Submits a job and waits for it. Returns None if it was dropped; re-raises errors.
+        """
+        future = self.submit(model, func, *args, priority=priority, deadline_s=deadline_s, replace=replace, **kwargs)
+        if future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            if future.cancelled():
+                return None
+            raise
+
+    def _next_task(self):
+        with self.condition:
+            while True:
+                while not self.heap and not self.stopped:
+                    self.condition.wait()
+                if self.stopped and not self.heap:
+                    return None
+                _, _, _, task = heapq.heappop(self.heap)
+                if self.latest.get(task.model) is task:
+                    del self.latest[task.model]
+                if task.future.cancelled():
+                    # Replaced; already counted
+                    continue
+                stats = self.stats_by_model[task.model]
+                stats.queued -= 1
+                if task.deadline is not None and time.monotonic() > task.deadline:
+                    stats.expired += 1
+                    task.future.cancel()
+                    continue
+                if not task.future.set_running_or_notify_cancel():
+                    continue
+                stats.running += 1
+                return task
+
+    def _worker_loop(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                break
+            started = time.monotonic()
+            try:
+                result = task.func(*task.args, **task.kwargs)
+            except Exception as e:
+                with self.condition:
+                    stats = self.stats_by_model[task.model]
+                    stats.running -= 1
+                    stats.failed += 1
+                task.future.set_exception(e)
+                continue
+            finished = time.monotonic()
+            wait_ms = (started - task.submitted) * 1000
+            run_ms = (finished - started) * 1000
+            with self.condition:
+                stats = self.stats_by_model[task.model]
+                stats.running -= 1
+                stats.record(wait_ms, run_ms)
+            latency.record(f"inference.{task.model}.wait", wait_ms, time.perf_counter() - (run_ms + wait_ms) / 1000)
+            latency.record(f"inference.{task.model}.run", run_ms, time.perf_counter() - run_ms / 1000)
+            task.future.set_result(result)
+
+    def stop(self):
+        """
+        Cancels queued jobs and waits for the running ones to finish.
+        """
+        with self.condition:
+            self.stopped = True
+            for _, _, _, task in self.heap:
+                task.future.cancel()
+            self.heap = []
+            self.latest = {}
+            for stats in self.stats_by_model.values():
+                stats.queued = 0
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def stats(self):
+        """
+        Per-model queue depth, running jobs, counters and smoothed queue wait / run
+        latency (ms).
+        """
+        with self.condition:
+            return {
+                model: {
+                    "queued": stats.queued,
+                    "running": stats.running,
+                    "completed": stats.completed,
+                    "expired": stats.expired,
+                    "replaced": stats.replaced,
+                    "failed": stats.failed,
+                    "wait_ms": round(stats.wait_ms, 1) if stats.wait_ms is not None else None,
+                    "run_ms": round(stats.run_ms, 1) if stats.run_ms is not None else None,
+                    "max_run_ms": round(stats.max_run_ms, 1),
+                }
+                for model, stats in self.stats_by_model.items()
+            }
@@ -4,8 +4,25 @@ import torch
 import numpy as np
 from transformers import AutoImageProcessor, SuperPointForKeypointDetection
 from PIL import Image
+from modules.model_registry import get_model
 
 
+SUPERPOINT_MODEL_ID = "magic-leap-community/superpoint"
+
+
+def load_superpoint(device="cpu"):
+    """
+    Returns the shared (processor, model) pair for SuperPoint, loading it on first use.
+    """
+    def loader():
+        processor = AutoImageProcessor.from_pretrained(SUPERPOINT_MODEL_ID)
+        model = SuperPointForKeypointDetection.from_pretrained(SUPERPOINT_MODEL_ID)
+        model.to(device)
+        model.eval()
+        return processor, model
+
+    return get_model(SUPERPOINT_MODEL_ID, loader, device=device)
+
 def detect_keypoints_superpoint(image, processor, model, device):
     """
     Runs SuperPoint keypoint detection on 'image' and returns the detected keypoints.
@@ -40,4 +57,35 @@ def detect_keypoints_superpoint(image, processor, model, device):
         return keypoints
     except Exception as e:
         print(f"Keypoint detection error: {e}")
-        return np.array([])  # Return empty array on failure
\ No newline at end of file
+        return np.array([])  # Return empty array on failure
+
+
+def detect_keypoints_superpoint_batch(images, processor, model, device):
+    """
+    Runs SuperPoint keypoint detection on a list of BGR images in a single forward pass.
+
+    Returns:
+        list: One (N, 2) keypoint array per input image.
+    """
+    if len(images) == 0:
+        return []
+    try:
+        pil_images = [Image.fromarray(image[:, :, ::-1]) for image in images]
+        inputs = processor(images=pil_images, return_tensors="pt")
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+
+        with torch.no_grad():
+            outputs = model(**inputs)
+
+        if not hasattr(outputs, 'keypoints') or outputs.keypoints is None:
+            return [np.array([]) for _ in images]
+
+        keypoints = outputs.keypoints.cpu().numpy()
+        # Images in a batch detect different numbers of keypoints; the mask marks real ones
+        mask = outputs.mask.cpu().numpy().astype(bool) if getattr(outputs, 'mask', None) is not None else None
+        if mask is None:
+            return [keypoints[i] for i in range(len(images))]
+        return [keypoints[i][mask[i]] for i in range(len(images))]
+    except Exception as e:
+        print(f"Keypoint detection error: {e}")
+        return [np.array([]) for _ in images]
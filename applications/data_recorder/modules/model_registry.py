@@ -0,0 +1,175 @@
+# modules/model_registry.py
+
+import threading
+import time
+from collections import OrderedDict
+
+
+# Default memory budget for cached models (None = unlimited)
+DEFAULT_MEMORY_BUDGET_MB = None
+
+
+def _estimate_nbytes(obj):
+    """
+    Roughly estimates the memory held by a loaded model object by summing the sizes
+    of its torch parameters and buffers. Tuples/lists and pipelines are walked recursively.
+    """
+    if obj is None:
+        return 0
+    if isinstance(obj, (tuple, list)):
+        return sum(_estimate_nbytes(item) for item in obj)
+    if hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+        try:
+            nbytes = sum(p.numel() * p.element_size() for p in obj.parameters())
+            nbytes += sum(b.numel() * b.element_size() for b in obj.buffers())
+            return nbytes
+        except Exception:
+            return 0
+    # transformers pipelines keep the underlying model on `.model`
+    if hasattr(obj, "model"):
+        return _estimate_nbytes(obj.model)
+    return 0
+
+
+class _RegistryEntry:
+    def __init__(self, value, nbytes, load_seconds=0.0):
+        self.value = value
+        self.nbytes = nbytes
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.hits = 0
+
+
+class ModelRegistry:
+    """
+    A process-wide cache of loaded models keyed by (model_id, device, dtype).
+
+    Models are loaded lazily the first time they are requested and the same instance
+    is handed out to every caller afterwards. When a memory budget is set, the least
+    recently used models are evicted once the estimated total size exceeds it.
+    """
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        self.memory_budget_mb = memory_budget_mb
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+    @staticmethod
+    def make_key(model_id, device="cpu", dtype=None):
+        return (model_id, str(device), str(dtype) if dtype is not None else "default")
+
+    def get(self, model_id, loader, device="cpu", dtype=None):
+        """
+        Returns the cached model for (model_id, device, dtype), calling loader() to
+        create it on first use. Concurrent requests for the same key load it only once.
+        """
+        key = self.make_key(model_id, device, dtype)
+        with self._lock:
+            entry = self._touch(key)
+            if entry is not None:
+                return entry.value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                entry = self._touch(key)
+                if entry is not None:
+                    return entry.value
+
+            start = time.time()
+            value = loader()
+            load_seconds = time.time() - start
+            nbytes = _estimate_nbytes(value)
+            print(f"Loaded model {key[0]} on {key[1]} ({nbytes / 1e6:.1f} MB) in {load_seconds:.2f}s")
+
+            with self._lock:
+                self._entries[key] = _RegistryEntry(value, nbytes, load_seconds)
+                self._evict_over_budget(keep=key)
+            return value
+
+    def is_loaded(self, model_id, device="cpu", dtype=None):
+        with self._lock:
+            return self.make_key(model_id, device, dtype) in self._entries
+
+    def evict(self, model_id, device="cpu", dtype=None):
+        """
+        Drops a model from the registry. Callers still holding a reference keep it alive.
+        """
+        with self._lock:
+            return self._entries.pop(self.make_key(model_id, device, dtype), None) is not None
+
+    def evict_idle(self, max_idle_seconds):
+        """
+        Evicts every model that has not been requested within max_idle_seconds.
+        """
+        now = time.time()
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if now - entry.last_used > max_idle_seconds]
+            for key in idle:
+                del self._entries[key]
+        return idle
+
+    def set_memory_budget(self, memory_budget_mb):
+        with self._lock:
+            self.memory_budget_mb = memory_budget_mb
+            self._evict_over_budget()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def total_nbytes(self):
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def stats(self):
+        """
+        Returns a list of dicts describing the cached models, most recently used last.
+        """
+        with self._lock:
+            return [
+                {
+                    "model_id": key[0],
+                    "device": key[1],
+                    "dtype": key[2],
+                    "size_mb": round(entry.nbytes / 1e6, 1),
+                    "hits": entry.hits,
+                    "load_seconds": round(entry.load_seconds, 2),
+                    "idle_seconds": round(time.time() - entry.last_used, 1),
+                }
+                for key, entry in self._entries.items()
+            ]
+
+    def _touch(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.last_used = time.time()
+            entry.hits += 1
+            self._entries.move_to_end(key)
+        return entry
+
+    def _evict_over_budget(self, keep=None):
+        if self.memory_budget_mb is None:
+            return
+        budget = self.memory_budget_mb * 1e6
+        total = sum(entry.nbytes for entry in self._entries.values())
+        for key in list(self._entries.keys()):
+            if total <= budget:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key).nbytes
+            print(f"Evicted model {key[0]} on {key[1]} to stay within {self.memory_budget_mb} MB")
+
+
+# Shared instance used by every module in the app
+registry = ModelRegistry()
+
+
+def get_model(model_id, loader, device="cpu", dtype=None):
+    """
+    Convenience wrapper around the shared registry.
+    """
+    return registry.get(model_id, loader, device=device, dtype=dtype)
@@ -0,0 +1,173 @@
+# modules/offline_tracking.py
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from modules.detection import detect_objects_batch, track_objects, coast_objects
+from modules.sort_tracker import Sort
+from modules.video_reader import iter_video_frames, get_video_info
+from modules.session_store import save_track_table, load_track_table
+
+
+def _iter_batches(iterator, batch_size):
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class TrackTableBuilder:
+    """
+    Accumulates per-frame tracks into flat columns (one row per track per frame).
+    """
+    def __init__(self):
+        self.frames = []
+        self.track_ids = []
+        self.boxes = []
+        self.scores = []
+        self.labels = []
+
+    def add(self, frame_number, objects):
+        for obj in objects:
+            self.frames.append(frame_number)
+            self.track_ids.append(obj["id"])
+            self.boxes.append(obj["box"])
+            self.scores.append(obj["score"])
+            self.labels.append(obj["label"])
+
+    def __len__(self):
+        return len(self.frames)
+
+    def to_arrays(self):
+        return {
+            "frame": np.array(self.frames, dtype=np.int32),
+            "track_id": np.array(self.track_ids, dtype=np.int32),
+            "box": np.array(self.boxes, dtype=np.float32).reshape(-1, 4),
+            "score": np.array(self.scores, dtype=np.float32),
+            "label": np.array(self.labels, dtype=np.str_),
+        }
+
+
+class OfflineTracker:
+    """
+    Headless multi-object tracking over a recorded session video.
+
+    video.avi is decoded once, front to back. DETR runs on every detection_stride-th frame
+    (in batches of batch_size, decoded on a background thread while the previous batch is
+    being detected). SORT runs on every frame: detection frames update the tracks, the
+    frames in between only advance the Kalman state (Sort.coast), so those frames are
+    never converted or copied out of the decoder.
+
+    The result is one compact table per session in store/tracks.npz with a row per track
+    per frame: frame, track_id, box (x1, y1, x2, y2), score and label. Setting
+    inference_size downscales detection inputs; boxes stay in video coordinates.
+    """
+    def __init__(self, device="cpu", detection_stride=5, batch_size=8, confidence_threshold=0.5,
+                 max_age=5, min_hits=2, iou_threshold=0.3, inference_size=None, progress_callback=None):
+        self.device = device
+        self.inference_size = inference_size
+        self.detection_stride = max(1, int(detection_stride))
+        self.batch_size = batch_size
+        self.confidence_threshold = confidence_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.progress_callback = progress_callback
+        self.stop_requested = False
+
+    def stop(self):
+        self.stop_requested = True
+
+    def track_video(self, video_path):
+        """
+        Tracks objects through one video and returns (TrackTableBuilder, summary).
+        """
+        start = time.time()
+        frame_rate, frame_count = get_video_info(video_path)
+        tracker = Sort(max_age=self.max_age, min_hits=self.min_hits, iou_threshold=self.iou_threshold, batched=True)
+        # SORT does not keep labels; remember the last label/score seen for each track
+        track_info = {}
+        table = TrackTableBuilder()
+        next_frame = 0
+        detected_frames = 0
+
+        def coast_until(frame_number):
+            # Advance the tracker through frames without detections
+            nonlocal next_frame
+            while next_frame < frame_number:
+                table.add(next_frame, coast_objects(tracker, track_info))
+                next_frame += 1
+
+        frames = iter_video_frames(video_path, stride=self.detection_stride)
+        batches = _iter_batches(frames, self.batch_size)
+        try:
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                pending = pool.submit(next, batches, None)
+                while not self.stop_requested:
+                    batch = pending.result()
+                    if batch is None:
+                        break
+                    pending = pool.submit(next, batches, None)
+
+                    detections = detect_objects_batch(
+                        [frame for _, frame in batch], self.confidence_threshold, self.device,
+                        inference_size=self.inference_size
+                    )
+                    for (frame_number, _), detected_objects in zip(batch, detections):
+                        coast_until(frame_number)
+                        objects = track_objects(tracker, detected_objects, track_info)
+                        table.add(frame_number, objects)
+                        next_frame = frame_number + 1
+                        detected_frames += 1
+
+                    if self.progress_callback:
+                        self.progress_callback(next_frame, frame_count)
+                pending.cancel()
+        finally:
+            # Leaving the pool waited for the prefetch, so the generators are idle: close
+            # them to release the video now rather than when they are garbage collected
+            batches.close()
+            frames.close()
+
+        if not self.stop_requested and frame_count:
+            coast_until(frame_count)
+
+        seconds = time.time() - start
+        video_seconds = next_frame / frame_rate if frame_rate else 0.0
+        summary = {
+            "frames": next_frame,
+            "detected_frames": detected_frames,
+            "rows": len(table),
+            "tracks": len(set(table.track_ids)),
+            "seconds": round(seconds, 2),
+            "realtime_factor": round(video_seconds / seconds, 2) if seconds > 0 else 0.0,
+        }
+        return table, summary
+
+    def run(self, session_dir, video_name="video.avi", force=False):
+        """
+        Tracks one session and writes store/tracks.npz. Sessions that already have a
+        track table are skipped unless force is set. Returns a summary dict.
+        """
+        video_path = os.path.join(session_dir, video_name)
+        if not os.path.exists(video_path):
+            return {"session": session_dir, "skipped": True, "reason": "no video"}
+        if not force and load_track_table(session_dir) is not None:
+            return {"session": session_dir, "skipped": True, "reason": "already tracked"}
+
+        table, summary = self.track_video(video_path)
+        if self.stop_requested:
+            summary.update({"session": session_dir, "skipped": True, "reason": "stopped"})
+            return summary
+
+        arrays = table.to_arrays()
+        arrays["detection_stride"] = np.array(self.detection_stride, dtype=np.int32)
+        arrays["confidence_threshold"] = np.array(self.confidence_threshold, dtype=np.float32)
+        save_track_table(session_dir, arrays)
+        summary.update({"session": session_dir, "skipped": False})
+        return summary
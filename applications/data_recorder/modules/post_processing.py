@@ -8,46 +8,104 @@ from PyQt5.QtCore import QObject, pyqtSignal
 from modules.depth_estimation import get_depth_map
 from modules.detection import detect_objects_with_huggingface
 from modules.emotion_detection import detect_emotions_deepface
+from modules.batch_post_processing import BatchPostProcessor, to_native_emotions
+from modules.video_reader import iter_video_frames, timestamps_to_frame_numbers, get_video_info
+from PIL import Image
 
 
 class PostProcessingThread(QObject, threading.Thread):
+    """
+    Runs depth, detection and emotion models over frames of a recorded session video.
+
+    The video is decoded once in a single sequential pass; only the frames nearest to
+    the requested timestamps (and, optionally, every Nth frame) are handed to the models.
+    Depth maps are saved as PNG files under <session_dir>/depth_maps and referenced by path.
+    """
     finished = pyqtSignal()
 
-    def __init__(self, session_dir, video_path, timestamps):
+    def __init__(self, session_dir, video_path, timestamps, device="cpu", frame_stride=None):
         super().__init__()
         self.session_dir = session_dir
         self.video_path = video_path
         self.timestamps = timestamps
+        self.device = device
+        self.frame_stride = frame_stride
 
     def run(self):
-        cap = cv2.VideoCapture(self.video_path)
-        frame_rate = int(cap.get(cv2.CAP_PROP_FPS))
+        frame_rate, frame_count = get_video_info(self.video_path)
+        if frame_rate <= 0:
+            print(f"Could not read frame rate from {self.video_path}")
+            self.finished.emit()
+            return
+
+        # Several timestamps can land on the same frame; decode it once and reuse it
+        timestamps_by_frame = {}
+        frame_numbers = timestamps_to_frame_numbers(self.timestamps, frame_rate, frame_count)
+        for timestamp, frame_number in zip(self.timestamps, frame_numbers):
+            timestamps_by_frame.setdefault(frame_number, []).append(timestamp)
+
+        depth_dir = os.path.join(self.session_dir, "depth_maps")
+        os.makedirs(depth_dir, exist_ok=True)
 
         processed_data = []
-        for timestamp in self.timestamps:
-            frame_number = int((timestamp / 1000) * frame_rate)
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            ret, frame = cap.read()
-            if not ret:
-                continue
+        for frame_number, frame in iter_video_frames(self.video_path, timestamps_by_frame.keys(), self.frame_stride):
+            timestamps = timestamps_by_frame.get(frame_number) or [int(frame_number / frame_rate * 1000)]
 
             # Process frame
-            depth_map = get_depth_map(frame)
-            detections = detect_objects_with_huggingface(frame)
-            emotions = detect_emotions_deepface(frame)
+            depth_map = get_depth_map(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)), device=self.device)
+            depth_filename = os.path.join(depth_dir, f"depth_{frame_number}.png")
+            depth_map.save(depth_filename)
+            detections = detect_objects_with_huggingface(frame, device=self.device)
+            emotions = to_native_emotions(detect_emotions_deepface(frame))
 
-            processed_data.append({
-                "timestamp": timestamp,
-                "depth_map": depth_map,
-                "detections": detections,
-                "emotions": emotions
-            })
+            for timestamp in timestamps:
+                processed_data.append({
+                    "timestamp": timestamp,
+                    "frame_number": frame_number,
+                    "depth_map": os.path.relpath(depth_filename, self.session_dir),
+                    "detections": detections,
+                    "emotions": emotions
+                })
 
-        cap.release()
+        processed_data.sort(key=lambda item: item["timestamp"])
 
         # Save processed data
         output_file = os.path.join(self.session_dir, "processed_data.json")
         with open(output_file, "w") as f:
             json.dump(processed_data, f, indent=4)
 
-        self.finished.emit()
\ No newline at end of file
+        self.finished.emit()
+
+
+class BatchPostProcessingWorker(QObject):
+    """
+    Runs the BatchPostProcessor over a recordings folder from a QThread so the GUI
+    stays responsive, reporting progress through Qt signals.
+    """
+    finished = pyqtSignal()
+    progress = pyqtSignal(int, int)
+    result = pyqtSignal(dict)
+    error = pyqtSignal(str)
+
+    def __init__(self, base_dir, device="cpu", batch_size=8, num_workers=4, confidence_threshold=0.5):
+        super().__init__()
+        self.base_dir = base_dir
+        self.processor = BatchPostProcessor(
+            device=device,
+            batch_size=batch_size,
+            num_workers=num_workers,
+            confidence_threshold=confidence_threshold,
+            progress_callback=self.progress.emit
+        )
+
+    def run(self):
+        try:
+            summary = self.processor.run(self.base_dir)
+            self.result.emit(summary)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            self.finished.emit()
+
+    def stop(self):
+        self.processor.stop()
@@ -0,0 +1,110 @@
+# modules/post_processing_manifest.py
+
+import os
+import json
+import hashlib
+import threading
+from importlib import metadata
+
+
+MANIFEST_NAME = "post_processing_manifest.jsonl"
+
+# Bump when the post-processing output format or logic changes so every snapshot is redone
+PIPELINE_VERSION = 1
+
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def build_fingerprint(config):
+    """
+    Returns (fingerprint, description) for a post-processing configuration.
+
+    The description records pipeline/library versions alongside the given config
+    (model ids, thresholds, enabled stages); the fingerprint is a short hash of it.
+    """
+    description = {
+        "pipeline_version": PIPELINE_VERSION,
+        "transformers": _package_version("transformers"),
+        "deepface": _package_version("deepface"),
+        **config,
+    }
+    encoded = json.dumps(description, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16], description
+
+
+class PostProcessingManifest:
+    """
+    Append-only record of which snapshots in a session have been post-processed,
+    with which configuration fingerprint and against which image file.
+
+    One JSON line is appended (and flushed) per finished snapshot, so an interrupted
+    run can resume from where it stopped; the latest line for a snapshot wins.
+    """
+    def __init__(self, session_dir):
+        self.path = os.path.join(session_dir, MANIFEST_NAME)
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            text = f.read()
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from an interrupted run
+                continue
+            self.entries[entry["snapshot"]] = entry
+        if text and not text.endswith("\n"):
+            # Drop the truncated tail so new lines are not appended onto it
+            self.compact()
+
+    @staticmethod
+    def _image_signature(image_path):
+        stat = os.stat(image_path)
+        return {"image_size": stat.st_size, "image_mtime": int(stat.st_mtime)}
+
+    def is_current(self, snapshot_name, image_path, fingerprint):
+        """
+        True if the snapshot was already processed with this fingerprint and its image
+        has not changed since.
+        """
+        entry = self.entries.get(snapshot_name)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return False
+        try:
+            signature = self._image_signature(image_path)
+        except OSError:
+            return False
+        return all(entry.get(k) == v for k, v in signature.items())
+
+    def record(self, snapshot_name, image_path, fingerprint):
+        entry = {"snapshot": snapshot_name, "fingerprint": fingerprint, **self._image_signature(image_path)}
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+            self.entries[snapshot_name] = entry
+
+    def compact(self):
+        """
+        Rewrites the manifest with only the latest entry per snapshot.
+        """
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
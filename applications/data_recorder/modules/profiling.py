@@ -0,0 +1,178 @@
+# modules/profiling.py
+
+import csv
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+
+class StartupTimer:
+    """
+    Records how long each named startup stage takes and prints a short report,
+    so slow imports, model loads or camera initialisation are easy to spot.
+    """
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.stages = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - stage_start)
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.stages.append((name, seconds, time.perf_counter() - self.start))
+
+    def mark(self, name):
+        """
+        Records a milestone (e.g. "first frame displayed") as the time elapsed since start.
+        """
+        self.record(name, time.perf_counter() - self.start)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def report(self):
+        """
+        Returns the recorded stages as a printable table.
+        """
+        with self.lock:
+            stages = list(self.stages)
+        lines = ["Startup timing report:"]
+        for name, seconds, at in stages:
+            lines.append(f"  {name:<32} {seconds * 1000:9.1f} ms   (t+{at:.2f}s)")
+        lines.append(f"  {'total':<32} {self.elapsed() * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+class LatencyRecorder:
+    """
+    Collects per-stage latencies (capture, detection, tracking, captioning, snapshot
+    writing, display, ...) from any thread.
+
+    Each stage keeps its most recent `window` samples, so percentiles follow the current
+    load while memory stays bounded. While a trace is active every sample is also kept as
+    an event (stage, start, duration, thread) for export as CSV or as a Chrome trace JSON
+    (chrome://tracing, Perfetto); the trace is capped at max_trace_events.
+    """
+    def __init__(self, window=500, max_trace_events=200000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.counts = {}
+        self.tracing = False
+        self.trace = deque(maxlen=max_trace_events)
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000, start)
+
+    def record(self, stage, duration_ms, start=None):
+        """
+        Adds one sample in milliseconds. start is a perf_counter() value; when omitted the
+        sample is taken to have ended now.
+        """
+        if start is None:
+            start = time.perf_counter() - duration_ms / 1000
+        with self.lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.window)
+                self.counts[stage] = 0
+            samples.append(duration_ms)
+            self.counts[stage] += 1
+            if self.tracing:
+                self.trace.append((stage, (start - self.origin) * 1000, duration_ms, threading.current_thread().name))
+
+    def start_trace(self):
+        with self.lock:
+            self.trace.clear()
+            self.tracing = True
+
+    def stop_trace(self):
+        with self.lock:
+            self.tracing = False
+
+    def reset(self):
+        with self.lock:
+            self.samples = {}
+            self.counts = {}
+
+    def summary(self):
+        """
+        Returns {stage: {"count", "p50", "p95", "p99", "max"}} over the current window (ms).
+        """
+        with self.lock:
+            windows = {stage: np.array(samples) for stage, samples in self.samples.items()}
+            counts = dict(self.counts)
+        result = {}
+        for stage in sorted(windows):
+            values = windows[stage]
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            result[stage] = {
+                "count": counts[stage],
+                "p50": round(float(p50), 2),
+                "p95": round(float(p95), 2),
+                "p99": round(float(p99), 2),
+                "max": round(float(values.max()), 2),
+            }
+        return result
+
+    def hud_lines(self):
+        """
+        Short per-stage lines for an on-screen overlay.
+        """
+        return [
+            f"{stage:<22} p50 {stats['p50']:6.1f}  p95 {stats['p95']:6.1f}  p99 {stats['p99']:6.1f} ms"
+            for stage, stats in self.summary().items()
+        ]
+
+    def export_csv(self, path):
+        """
+        Writes the trace events, one row per sample: stage, start_ms, duration_ms, thread.
+        """
+        with self.lock:
+            events = list(self.trace)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "start_ms", "duration_ms", "thread"])
+            for stage, start_ms, duration_ms, thread in events:
+                writer.writerow([stage, f"{start_ms:.3f}", f"{duration_ms:.3f}", thread])
+
+    def export_json(self, path):
+        """
+        Writes the trace in Chrome trace event format, with the percentile summary
+        under "summary".
+        """
+        with self.lock:
+            events = list(self.trace)
+        threads = {}
+        trace_events = []
+        for stage, start_ms, duration_ms, thread in events:
+            tid = threads.setdefault(thread, len(threads))
+            trace_events.append({
+                "name": stage, "cat": stage.split(".")[0], "ph": "X",
+                "ts": round(start_ms * 1000, 1), "dur": round(duration_ms * 1000, 1),
+                "pid": 0, "tid": tid,
+            })
+        for thread, tid in threads.items():
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": thread}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "summary": self.summary()}, f)
+
+
+# Process-wide recorder shared by the capture, model and display threads
+latency = LatencyRecorder()
@@ -0,0 +1,52 @@
+# modules/scene_change.py
+
+import time
+import cv2
+import numpy as np
+
+
+class SceneChangeGate:
+    """
+    A cheap test for whether a frame differs enough from the last accepted one to be
+    worth running an expensive model on again.
+
+    Each frame is reduced to a small grayscale thumbnail (thumbnail_size, area
+    interpolation, so sensor noise averages out) and compared with the thumbnail of the
+    last accepted frame by mean absolute difference, as a fraction of full scale. A frame
+    is accepted when that difference is at least `threshold`, or when the last accepted
+    frame is older than max_reuse_seconds (if set).
+    """
+    def __init__(self, threshold=0.04, thumbnail_size=(32, 18), max_reuse_seconds=None):
+        self.threshold = threshold
+        self.thumbnail_size = thumbnail_size
+        self.max_reuse_seconds = max_reuse_seconds
+        self.reference = None
+        self.reference_time = None
+        self.last_difference = None
+
+    def reset(self):
+        self.reference = None
+        self.reference_time = None
+
+    def thumbnail(self, frame):
+        small = cv2.resize(frame, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.float32) / 255.0
+
+    def changed(self, frame):
+        """
+        Returns True (and makes this frame the new reference) if the scene changed.
+        """
+        thumbnail = self.thumbnail(frame)
+        now = time.monotonic()
+        if self.reference is None:
+            self.last_difference = None
+        else:
+            self.last_difference = float(np.mean(np.abs(thumbnail - self.reference)))
+            expired = self.max_reuse_seconds is not None and now - self.reference_time >= self.max_reuse_seconds
+            if self.last_difference < self.threshold and not expired:
+                return False
+        self.reference = thumbnail
+        self.reference_time = now
+        return True
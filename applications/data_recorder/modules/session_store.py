@@ -0,0 +1,423 @@
+# modules/session_store.py
+
+import os
+import io
+import json
+import glob
+import threading
+import time
+import numpy as np
+
+
+STORE_DIR_NAME = "store"
+SESSION_META_NAME = "session.json"
+SNAPSHOT_CHUNK_PREFIX = "snapshots_"
+POST_CHUNK_PREFIX = "post_processing_"
+TRACKS_NAME = "tracks.npz"
+TIMING_NAME = "timing.npz"
+TRANSCRIPTS_NAME = "transcripts.npz"
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+
+def get_store_dir(session_dir):
+    return os.path.join(session_dir, STORE_DIR_NAME)
+
+
+def has_session_store(session_dir):
+    return os.path.isdir(get_store_dir(session_dir))
+
+
+def _chunk_paths(store_dir, prefix):
+    return sorted(glob.glob(os.path.join(store_dir, f"{prefix}*.npz")))
+
+
+def _write_chunk(store_dir, prefix, arrays):
+    """
+    Writes arrays to the next free <prefix><index>.npz file. The archive is built in
+    memory and the file is created exclusively, so concurrent writers never clobber each
+    other and readers never see a partially written chunk under its final name.
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    index = len(_chunk_paths(store_dir, prefix))
+    while True:
+        path = os.path.join(store_dir, f"{prefix}{index:05d}.npz")
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "xb") as f:
+                f.write(buffer.getvalue())
+        except FileExistsError:
+            index += 1
+            continue
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            index += 1
+            continue
+        os.replace(tmp_path, path)
+        return path
+
+
+class SessionStoreWriter:
+    """
+    Append-only, chunked columnar store for one recording session.
+
+    Snapshot rows (timestamp, joints, instruction, intent) are buffered in memory and
+    written as typed arrays to store/snapshots_XXXXX.npz every chunk_size rows, or
+    with flush_interval (seconds) once that long has passed since the last write, which
+    bounds what a crash during live recording can lose.
+    Post-processing results are flattened into per-object tables and written to
+    store/post_processing_XXXXX.npz. Replaces the per-snapshot indented JSON files.
+    """
+    def __init__(self, session_dir, chunk_size=256, metadata=None, flush_interval=None):
+        self.session_dir = session_dir
+        self.store_dir = get_store_dir(session_dir)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        meta_path = os.path.join(self.store_dir, SESSION_META_NAME)
+        if metadata is not None and not os.path.exists(meta_path):
+            with open(meta_path, "w") as f:
+                json.dump(metadata, f, indent=4)
+
+        self._snapshots = []
+        self._post_processing = []
+        self._last_snapshot_flush = time.monotonic()
+
+    def append_snapshot(self, snapshot_id, timestamp, joints, instruction="", intent=""):
+        with self.lock:
+            self._snapshots.append((snapshot_id, timestamp, np.asarray(joints, dtype=np.float32), instruction, intent))
+            due = (
+                self.flush_interval is not None
+                and time.monotonic() - self._last_snapshot_flush >= self.flush_interval
+            )
+            if due or len(self._snapshots) >= self.chunk_size:
+                self._flush_snapshots()
+
+    def append_post_processing(self, timestamp, result):
+        """
+        Appends post-processing output for the snapshot at `timestamp`. The result uses
+        the same dict layout as the JSON "post_processing" field.
+        """
+        with self.lock:
+            self._post_processing.append((timestamp, result))
+            if len(self._post_processing) >= self.chunk_size:
+                self._flush_post_processing()
+
+    def flush(self):
+        with self.lock:
+            self._flush_snapshots()
+            self._flush_post_processing()
+
+    def close(self):
+        self.flush()
+
+    def _flush_snapshots(self):
+        self._last_snapshot_flush = time.monotonic()
+        if not self._snapshots:
+            return
+        rows = self._snapshots
+        self._snapshots = []
+        _write_chunk(self.store_dir, SNAPSHOT_CHUNK_PREFIX, {
+            "snapshot_id": np.array([row[0] for row in rows], dtype=np.int64),
+            "timestamp": np.array([row[1] for row in rows], dtype=np.int64),
+            "joints": np.stack([row[2] for row in rows]),
+            "instruction": np.array([row[3] for row in rows], dtype=np.str_),
+            "intent": np.array([row[4] for row in rows], dtype=np.str_),
+        })
+
+    def _flush_post_processing(self):
+        if not self._post_processing:
+            return
+        # Keep only the latest result per snapshot within a chunk
+        latest = {}
+        for timestamp, result in self._post_processing:
+            latest[timestamp] = result
+        rows = list(latest.items())
+        self._post_processing = []
+
+        det_ts, det_label, det_score, det_box = [], [], [], []
+        emo_ts, emo_dominant, emo_scores, emo_region = [], [], [], []
+        kp_ts, kp_xy = [], []
+        for timestamp, result in rows:
+            for obj in result.get("detected_objects", []):
+                det_ts.append(timestamp)
+                det_label.append(obj["label"])
+                det_score.append(obj["score"])
+                det_box.append(obj["box"])
+            for emo in result.get("emotions", []):
+                region = emo["region"]
+                emo_ts.append(timestamp)
+                emo_dominant.append(emo["dominant_emotion"])
+                emo_scores.append([emo["emotions"].get(label, np.nan) for label in EMOTION_LABELS])
+                emo_region.append([region["x"], region["y"], region["w"], region["h"]])
+            keypoints = np.asarray(result.get("keypoints", []), dtype=np.float32).reshape(-1, 2)
+            kp_ts.extend([timestamp] * len(keypoints))
+            kp_xy.append(keypoints)
+
+        _write_chunk(self.store_dir, POST_CHUNK_PREFIX, {
+            "timestamp": np.array([row[0] for row in rows], dtype=np.int64),
+            "fingerprint": np.array([row[1].get("fingerprint", "") for row in rows], dtype=np.str_),
+            "det_timestamp": np.array(det_ts, dtype=np.int64),
+            "det_label": np.array(det_label, dtype=np.str_),
+            "det_score": np.array(det_score, dtype=np.float32),
+            "det_box": np.array(det_box, dtype=np.float32).reshape(-1, 4),
+            "emo_timestamp": np.array(emo_ts, dtype=np.int64),
+            "emo_dominant": np.array(emo_dominant, dtype=np.str_),
+            "emo_scores": np.array(emo_scores, dtype=np.float32).reshape(-1, len(EMOTION_LABELS)),
+            "emo_region": np.array(emo_region, dtype=np.int32).reshape(-1, 4),
+            "kp_timestamp": np.array(kp_ts, dtype=np.int64),
+            "kp_xy": np.concatenate(kp_xy) if kp_xy else np.empty((0, 2), dtype=np.float32),
+        })
+
+
+def _save_npz(session_dir, name, arrays):
+    """
+    Writes a whole-session table to store/<name>, replacing a previous one atomically.
+    """
+    store_dir = get_store_dir(session_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, name)
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+    return path
+
+
+def _load_npz(session_dir, name):
+    path = os.path.join(get_store_dir(session_dir), name)
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+def save_track_table(session_dir, table):
+    """
+    Writes a whole-session track table (columns: frame, track_id, box, score, label, plus
+    any scalar settings) to store/tracks.npz, replacing a previous one atomically.
+    """
+    return _save_npz(session_dir, TRACKS_NAME, table)
+
+
+def load_track_table(session_dir):
+    """
+    Returns the session's track table as a dict of arrays, or None if it has none.
+    """
+    return _load_npz(session_dir, TRACKS_NAME)
+
+
+def save_timing_index(session_dir, arrays):
+    """
+    Writes the session's capture timing index (see modules.timing_index) to store/timing.npz.
+    """
+    return _save_npz(session_dir, TIMING_NAME, arrays)
+
+
+def load_timing_index(session_dir):
+    """
+    Returns the session's timing index arrays, or None if it was recorded without one.
+    """
+    return _load_npz(session_dir, TIMING_NAME)
+
+
+def save_transcripts(session_dir, arrays):
+    """
+    Writes the session's transcript table (segments plus snapshot links, see
+    modules.session_transcription) to store/transcripts.npz.
+    """
+    return _save_npz(session_dir, TRANSCRIPTS_NAME, arrays)
+
+
+def load_transcripts(session_dir):
+    """
+    Returns the session's transcript table, or None if it has not been transcribed.
+    """
+    return _load_npz(session_dir, TRANSCRIPTS_NAME)
+
+
+def _concat_chunks(paths, keys):
+    columns = {key: [] for key in keys}
+    for path in paths:
+        with np.load(path, allow_pickle=False) as chunk:
+            for key in keys:
+                columns[key].append(chunk[key])
+    return {key: np.concatenate(values) if values else None for key, values in columns.items()}
+
+
+class SessionStoreReader:
+    """
+    Reads a session store written by SessionStoreWriter.
+
+    Snapshot columns are exposed as arrays sorted by timestamp. Post-processing tables
+    are loaded on first use; when a snapshot was processed more than once, the most
+    recently written result wins.
+    """
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+        self.store_dir = get_store_dir(session_dir)
+
+        meta_path = os.path.join(self.store_dir, SESSION_META_NAME)
+        self.metadata = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                self.metadata = json.load(f)
+
+        columns = _concat_chunks(
+            _chunk_paths(self.store_dir, SNAPSHOT_CHUNK_PREFIX),
+            ["snapshot_id", "timestamp", "joints", "instruction", "intent"]
+        )
+        if columns["timestamp"] is None:
+            self.snapshot_ids = np.empty(0, dtype=np.int64)
+            self.timestamps = np.empty(0, dtype=np.int64)
+            self.joints = np.empty((0, 360, 3), dtype=np.float32)
+            self.instructions = np.empty(0, dtype=np.str_)
+            self.intents = np.empty(0, dtype=np.str_)
+        else:
+            order = np.argsort(columns["timestamp"], kind="stable")
+            self.snapshot_ids = columns["snapshot_id"][order]
+            self.timestamps = columns["timestamp"][order]
+            self.joints = columns["joints"][order]
+            self.instructions = columns["instruction"][order]
+            self.intents = columns["intent"][order]
+        self._post = None
+        self._transcripts = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def index_of(self, timestamp):
+        """
+        Returns the row index of the snapshot with this timestamp, or None.
+        """
+        index = int(np.searchsorted(self.timestamps, timestamp))
+        if index < len(self.timestamps) and self.timestamps[index] == timestamp:
+            return index
+        return None
+
+    def snapshot(self, index):
+        """
+        Returns one snapshot in the legacy JSON layout.
+        """
+        timestamp = int(self.timestamps[index])
+        data = {
+            "snapshot_id": int(self.snapshot_ids[index]),
+            "recording_data": {"start_time": self.metadata.get("start_time")},
+            "timestamp": timestamp,
+            "instruction": str(self.instructions[index]),
+            "intent": str(self.intents[index]),
+            "audio": self.metadata.get("audio", "audio.wav"),
+            "video": self.metadata.get("video", "video.avi"),
+            "joint_outputs": self.joints[index].tolist(),
+        }
+        post_processing = self.post_processing_for(timestamp)
+        if post_processing is not None:
+            data["post_processing"] = post_processing
+        transcripts = self.transcripts_for(timestamp)
+        if transcripts:
+            data["transcripts"] = transcripts
+        return data
+
+    def transcripts_for(self, timestamp):
+        """
+        Returns the transcribed speech segments overlapping a snapshot as a list of
+        {"start_ms", "end_ms", "text"} (session time), or [] if there are none.
+        """
+        if self._transcripts is None:
+            self._transcripts = load_transcripts(self.session_dir) or {}
+        if not self._transcripts:
+            return []
+        tables = self._transcripts
+        rows = tables["link_segment"][tables["link_timestamp"] == timestamp]
+        return [
+            {
+                "start_ms": float(tables["segment_start_ms"][row]),
+                "end_ms": float(tables["segment_end_ms"][row]),
+                "text": str(tables["segment_text"][row]),
+            }
+            for row in rows
+        ]
+
+    def _load_post_processing(self):
+        if self._post is not None:
+            return self._post
+        self._post = {}
+        for path in _chunk_paths(self.store_dir, POST_CHUNK_PREFIX):
+            with np.load(path, allow_pickle=False) as chunk:
+                tables = {key: chunk[key] for key in chunk.files}
+            for row, timestamp in enumerate(tables["timestamp"]):
+                self._post[int(timestamp)] = (tables, row)
+        return self._post
+
+    def processed_timestamps(self):
+        return np.array(sorted(self._load_post_processing().keys()), dtype=np.int64)
+
+    def post_processing_for(self, timestamp):
+        """
+        Returns the latest post-processing result for a snapshot as a dict in the
+        legacy JSON layout, or None if the snapshot has not been processed.
+        """
+        entry = self._load_post_processing().get(int(timestamp))
+        if entry is None:
+            return None
+        tables, row = entry
+        det = tables["det_timestamp"] == timestamp
+        emo = tables["emo_timestamp"] == timestamp
+        kp = tables["kp_timestamp"] == timestamp
+        return {
+            "detected_objects": [
+                {"label": str(label), "score": float(score), "box": box.tolist()}
+                for label, score, box in zip(tables["det_label"][det], tables["det_score"][det], tables["det_box"][det])
+            ],
+            "emotions": [
+                {
+                    "dominant_emotion": str(dominant),
+                    "emotions": {label: float(value) for label, value in zip(EMOTION_LABELS, scores)},
+                    "region": dict(zip(["x", "y", "w", "h"], region.tolist())),
+                }
+                for dominant, scores, region in zip(tables["emo_dominant"][emo], tables["emo_scores"][emo], tables["emo_region"][emo])
+            ],
+            "keypoints": tables["kp_xy"][kp].tolist(),
+            "fingerprint": str(tables["fingerprint"][row]),
+        }
+
+
+def convert_session_directory(session_dir, chunk_size=256, remove_json=False):
+    """
+    Converts a session recorded with per-snapshot JSON files
+    (snapshot_<ts>/data_<ts>.json) into a session store. Snapshot images are left in place.
+
+    Returns:
+        int: Number of snapshots converted.
+    """
+    snapshot_files = []
+    for json_path in glob.glob(os.path.join(session_dir, "snapshot_*", "data_*.json")):
+        with open(json_path, "r") as f:
+            snapshot_files.append((json_path, json.load(f)))
+    if not snapshot_files:
+        return 0
+    snapshot_files.sort(key=lambda item: item[1]["timestamp"])
+
+    first = snapshot_files[0][1]
+    writer = SessionStoreWriter(session_dir, chunk_size=chunk_size, metadata={
+        "start_time": first.get("recording_data", {}).get("start_time"),
+        "audio": first.get("audio", "audio.wav"),
+        "video": first.get("video", "video.avi"),
+    })
+    for _, data in snapshot_files:
+        writer.append_snapshot(
+            data["snapshot_id"], data["timestamp"], data["joint_outputs"],
+            data.get("instruction", ""), data.get("intent", "")
+        )
+        if "post_processing" in data:
+            writer.append_post_processing(data["timestamp"], data["post_processing"])
+    writer.close()
+
+    if remove_json:
+        for json_path, _ in snapshot_files:
+            os.remove(json_path)
+    return len(snapshot_files)
@@ -0,0 +1,303 @@
+# modules/session_transcription.py
+
+import os
+import math
+import threading
+import time
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy.signal import resample_poly
+from modules.speech_recognition import (
+    VoskSpeechBackend, SpeechRecognitionError, UnintelligibleSpeechError, get_speech_backend
+)
+from modules.session_store import SessionStoreReader, save_transcripts, load_transcripts, load_timing_index
+from modules.timing_index import TimingIndex, read_audio_samples
+
+
+RECOGNIZER_RATE = 16000
+
+
+def get_audio_info(audio_path):
+    """
+    Returns (sample_rate, channels, frame_count) of a WAV or FLAC file.
+    """
+    if audio_path.lower().endswith(".flac"):
+        import soundfile as sf
+        info = sf.info(audio_path)
+        return info.samplerate, info.channels, info.frames
+    with wave.open(audio_path, "rb") as f:
+        return f.getframerate(), f.getnchannels(), f.getnframes()
+
+
+def iter_audio_blocks(audio_path, block_frames):
+    """
+    Yields the file as consecutive mono int16 blocks of block_frames samples (the last
+    one may be shorter), holding one block in memory at a time.
+    """
+    if audio_path.lower().endswith(".flac"):
+        import soundfile as sf
+        for block in sf.blocks(audio_path, blocksize=block_frames, dtype="int16", always_2d=True):
+            yield block.mean(axis=1).astype(np.int16) if block.shape[1] > 1 else block[:, 0]
+        return
+    with wave.open(audio_path, "rb") as f:
+        channels = f.getnchannels()
+        while True:
+            data = f.readframes(block_frames)
+            if not data:
+                break
+            block = np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+            yield block.mean(axis=1).astype(np.int16) if channels > 1 else block[:, 0]
+
+
+class EnergyVAD:
+    """
+    Streaming voice activity detection on frame energy.
+
+    Each frame_ms frame is speech when its level (dBFS) is margin_db above a running
+    noise floor (which drops immediately to quieter frames and rises slowly) and above
+    min_db. Speech frames are merged into segments across gaps shorter than
+    min_silence_ms; segments shorter than min_speech_ms are dropped, the rest are padded
+    by pad_ms and split to at most max_segment_ms. Segments are (start, stop) sample
+    indices and are produced while the audio is still being read.
+    """
+    def __init__(self, rate, frame_ms=30, margin_db=10.0, min_db=-50.0, min_speech_ms=300,
+                 min_silence_ms=500, pad_ms=200, max_segment_ms=20000):
+        self.rate = rate
+        self.frame = max(1, int(rate * frame_ms / 1000))
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.min_speech = int(rate * min_speech_ms / 1000)
+        self.min_silence = int(rate * min_silence_ms / 1000)
+        self.pad = int(rate * pad_ms / 1000)
+        self.max_segment = int(rate * max_segment_ms / 1000)
+        self.noise_db = None
+        self.position = 0
+        self.remainder = np.empty(0, dtype=np.int16)
+        self.segment_start = None
+        self.last_speech = None
+
+    def _frame_levels(self, samples):
+        frames = samples[:len(samples) // self.frame * self.frame].reshape(-1, self.frame).astype(np.float32)
+        rms = np.sqrt(np.mean(frames ** 2, axis=1)) / 32768.0
+        return 20 * np.log10(np.maximum(rms, 1e-6))
+
+    def _close(self, total=None):
+        speech_samples = self.last_speech - self.segment_start
+        start = max(0, self.segment_start - self.pad)
+        stop = self.last_speech + self.pad
+        if total is not None:
+            stop = min(stop, total)
+        self.segment_start = None
+        if speech_samples < self.min_speech:
+            return []
+        pieces = max(1, math.ceil((stop - start) / self.max_segment))
+        bounds = np.linspace(start, stop, pieces + 1).astype(np.int64)
+        return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def feed(self, samples):
+        """
+        Adds audio and returns the segments completed by it.
+        """
+        samples = np.concatenate([self.remainder, samples]) if len(self.remainder) else samples
+        usable = len(samples) // self.frame * self.frame
+        self.remainder = samples[usable:]
+        segments = []
+        for level in self._frame_levels(samples[:usable]):
+            frame_start = self.position
+            self.position += self.frame
+            if self.noise_db is None or level < self.noise_db:
+                self.noise_db = level
+            else:
+                self.noise_db += 0.01 * (level - self.noise_db)
+            is_speech = level > max(self.noise_db + self.margin_db, self.min_db)
+            if is_speech:
+                if self.segment_start is None:
+                    self.segment_start = frame_start
+                self.last_speech = self.position
+            elif self.segment_start is not None and self.position - self.last_speech >= self.min_silence:
+                segments.extend(self._close())
+        return segments
+
+    def finish(self):
+        """
+        Returns the segment still open at the end of the audio, if any.
+        """
+        if self.segment_start is None:
+            return []
+        return self._close(total=self.position + len(self.remainder))
+
+
+class SessionTranscriber:
+    """
+    Offline transcription of the audio recorded with each session, aligned to its snapshots.
+
+    The session's audio file is streamed once through a voice activity detector; each
+    speech segment is handed to a pool of workers as soon as it is found, read back
+    from the file on its own, resampled to 16 kHz and transcribed. At most
+    2 * workers segments are queued at a time (reading waits for the oldest), so
+    memory does not grow with the session length. Each worker has its own recognizer;
+    Vosk models are shared between them.
+
+    A segment that fails (e.g. the online API is unreachable) stops the session, which
+    is skipped with the error as its reason and no transcripts are written, so it is
+    retried on the next run.
+
+    Segment times are session times from the timing index when the session has one
+    (see modules.timing_index), otherwise offsets from the start of the recording.
+    Snapshots are placed by their capture times in the index too, not their wall-clock
+    timestamps.
+    Snapshots are linked to every segment they fall within (widened by
+    snapshot_margin_ms). The result is store/transcripts.npz; SessionStoreReader adds
+    the linked transcripts to each snapshot.
+    """
+    def __init__(self, backend="vosk", backend_options=None, workers=4, vad_options=None,
+                 snapshot_margin_ms=1000, progress_callback=None):
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.workers = max(1, workers)
+        self.max_pending = 2 * self.workers
+        self.vad_options = vad_options or {}
+        self.snapshot_margin_ms = snapshot_margin_ms
+        self.progress_callback = progress_callback
+        self.local = threading.local()
+        self.stop_requested = False
+
+    def stop(self):
+        self.stop_requested = True
+
+    def _worker_backend(self):
+        # Vosk recognizers are not thread safe: one backend (sharing the model) per worker
+        backend = getattr(self.local, "backend", None)
+        if backend is None:
+            if self.backend == "vosk":
+                backend = VoskSpeechBackend(**self.backend_options)
+            else:
+                backend = get_speech_backend(self.backend, **self.backend_options)
+            self.local.backend = backend
+        return backend
+
+    def _transcribe_segment(self, audio_path, rate, start, stop):
+        samples = read_audio_samples(audio_path, start, stop)
+        samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+        if rate != RECOGNIZER_RATE:
+            divisor = math.gcd(RECOGNIZER_RATE, rate)
+            samples = resample_poly(samples.astype(np.float32), RECOGNIZER_RATE // divisor, rate // divisor)
+        pcm = np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+        try:
+            return self._worker_backend().transcribe(pcm, RECOGNIZER_RATE)
+        except UnintelligibleSpeechError:
+            # Noise that got past the VAD; not an error
+            return ""
+
+    def transcribe_audio(self, audio_path, block_seconds=1.0):
+        """
+        Transcribes one audio file and returns ([(start_sample, stop_sample, text)], rate, summary).
+        Reading stops at the first failed segment; summary["failed_segments"] counts the
+        failures and summary["error"] describes the first one.
+        """
+        start_time = time.time()
+        rate, _, frame_count = get_audio_info(audio_path)
+        vad = EnergyVAD(rate, **self.vad_options)
+        segments = []
+        errors = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def collect():
+                start, stop, future = pending.popleft()
+                try:
+                    segments.append((start, stop, future.result()))
+                except Exception as e:
+                    errors.append(f"segment at {start / rate:.1f}s: {e}")
+
+            def submit(new_segments):
+                for start, stop in new_segments:
+                    while len(pending) >= self.max_pending:
+                        collect()
+                    pending.append((start, stop, pool.submit(self._transcribe_segment, audio_path, rate, start, stop)))
+
+            read = 0
+            for block in iter_audio_blocks(audio_path, int(rate * block_seconds)):
+                if self.stop_requested or errors:
+                    break
+                submit(vad.feed(block))
+                read += len(block)
+                if self.progress_callback:
+                    self.progress_callback(read, frame_count)
+            if not errors:
+                submit(vad.finish())
+            while pending:
+                collect()
+
+        seconds = time.time() - start_time
+        speech_seconds = sum(stop - start for start, stop, _ in segments) / rate if rate else 0.0
+        summary = {
+            "segments": len(segments),
+            "failed_segments": len(errors),
+            "error": errors[0] if errors else None,
+            "speech_seconds": round(speech_seconds, 1),
+            "audio_seconds": round(frame_count / rate, 1) if rate else 0.0,
+            "seconds": round(seconds, 2),
+            "realtime_factor": round(frame_count / rate / seconds, 2) if rate and seconds > 0 else 0.0,
+        }
+        return segments, rate, summary
+
+    def run(self, session_dir, force=False):
+        """
+        Transcribes one session and writes store/transcripts.npz. Sessions that already
+        have transcripts are skipped unless force is set. Returns a summary dict.
+        """
+        reader = SessionStoreReader(session_dir)
+        audio_path = os.path.join(session_dir, reader.metadata.get("audio", "audio.wav"))
+        if not os.path.exists(audio_path):
+            return {"session": session_dir, "skipped": True, "reason": "no audio"}
+        if not force and load_transcripts(session_dir) is not None:
+            return {"session": session_dir, "skipped": True, "reason": "already transcribed"}
+
+        try:
+            # Fails here once, rather than in every worker, when e.g. the Vosk model is missing
+            self._worker_backend()
+        except SpeechRecognitionError as e:
+            return {"session": session_dir, "skipped": True, "reason": f"speech backend unavailable: {e}"}
+
+        segments, rate, summary = self.transcribe_audio(audio_path)
+        if self.stop_requested:
+            summary.update({"session": session_dir, "skipped": True, "reason": "stopped"})
+            return summary
+        if summary["failed_segments"]:
+            summary.update({"session": session_dir, "skipped": True, "reason": f"transcription failed ({summary['error']})"})
+            return summary
+        segments = [segment for segment in segments if segment[2]]
+
+        bounds = np.array([(start, stop) for start, stop, _ in segments], dtype=np.float64).reshape(-1, 2)
+        timing = TimingIndex(session_dir) if load_timing_index(session_dir) is not None else None
+        if timing is not None:
+            segment_ms = timing.audio_time_ms(bounds)
+            snapshot_ms = timing.snapshot_session_ms(reader.timestamps)
+        else:
+            segment_ms = bounds * 1000 / rate
+            start_time = reader.metadata.get("start_time")
+            snapshot_ms = reader.timestamps - (start_time * 1000 if start_time else 0.0)
+
+        link_timestamp, link_segment = [], []
+        for row, (start_ms, end_ms) in enumerate(segment_ms):
+            inside = (snapshot_ms >= start_ms - self.snapshot_margin_ms) & (snapshot_ms <= end_ms + self.snapshot_margin_ms)
+            link_timestamp.extend(reader.timestamps[inside].tolist())
+            link_segment.extend([row] * int(inside.sum()))
+
+        save_transcripts(session_dir, {
+            "segment_start_ms": segment_ms[:, 0],
+            "segment_end_ms": segment_ms[:, 1],
+            "segment_text": np.array([text for _, _, text in segments], dtype=np.str_),
+            "link_timestamp": np.array(link_timestamp, dtype=np.int64),
+            "link_segment": np.array(link_segment, dtype=np.int32),
+            "backend": np.array(self.backend),
+        })
+        summary.update({
+            "session": session_dir,
+            "skipped": False,
+            "transcribed_segments": len(segments),
+            "linked_snapshots": len(set(link_timestamp)),
+        })
+        return summary
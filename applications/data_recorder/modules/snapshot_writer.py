@@ -0,0 +1,157 @@
+# modules/snapshot_writer.py
+
+import os
+import queue
+import threading
+import cv2
+from modules.profiling import latency
+
+
+class SnapshotRequest:
+    """
+    Everything a writer thread needs to persist one snapshot.
+    """
+    def __init__(self, frame, timestamp, snapshot_id, session_dir, session_store,
+                 joints, instruction="", intent="", resolution=None):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.snapshot_id = snapshot_id
+        self.session_dir = session_dir
+        self.session_store = session_store
+        self.joints = joints
+        self.instruction = instruction
+        self.intent = intent
+        self.resolution = resolution
+
+
+class SnapshotWriter:
+    """
+    A bounded queue of snapshots drained by background worker threads, which do the
+    resizing, JPEG encoding, directory creation and session store appends so the Qt GUI
+    thread only has to enqueue a frame reference.
+
+    When the queue is full the back-pressure policy decides what happens:
+      - "drop":   the new snapshot is discarded
+      - "oldest": the oldest queued snapshot is discarded to make room
+      - "block":  the caller waits until there is room
+    """
+    POLICIES = ("drop", "oldest", "block")
+
+    def __init__(self, num_workers=2, max_queue=32, policy="drop"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown back-pressure policy '{policy}', expected one of {self.POLICIES}")
+        self.num_workers = num_workers
+        self.policy = policy
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.workers = []
+
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        for _ in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, request):
+        """
+        Queues a snapshot. Returns False if it was dropped because the queue was full.
+        """
+        with self.lock:
+            self.queued += 1
+
+        if self.policy == "block":
+            self.queue.put(request)
+            return True
+
+        try:
+            self.queue.put_nowait(request)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == "drop":
+            with self.lock:
+                self.dropped += 1
+            return False
+
+        # "oldest": make room by discarding the snapshot that has waited longest
+        while True:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                with self.lock:
+                    self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(request)
+                return True
+            except queue.Full:
+                continue
+
+    def flush(self):
+        """
+        Blocks until every queued snapshot has been written (or has failed).
+        """
+        self.queue.join()
+
+    def stop(self):
+        self.flush()
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def counters(self):
+        with self.lock:
+            return {
+                "queued": self.queued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": self.queue.qsize(),
+            }
+
+    def _worker_loop(self):
+        while True:
+            request = self.queue.get()
+            if request is None:
+                self.queue.task_done()
+                break
+            try:
+                with latency.measure("snapshot.write"):
+                    self._write(request)
+                with self.lock:
+                    self.written += 1
+            except Exception as e:
+                print(f"Snapshot write error: {e}")
+                with self.lock:
+                    self.failed += 1
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def _write(request):
+        frame = request.frame
+        if request.resolution is not None and (frame.shape[1], frame.shape[0]) != tuple(request.resolution):
+            frame = cv2.resize(frame, request.resolution)
+
+        snapshot_subdir = os.path.join(request.session_dir, f"snapshot_{request.timestamp}")
+        os.makedirs(snapshot_subdir, exist_ok=True)
+        clean_snapshot_filename = os.path.join(snapshot_subdir, "clean_image.jpg")
+        if not cv2.imwrite(clean_snapshot_filename, frame):
+            raise IOError(f"Could not write {clean_snapshot_filename}")
+
+        request.session_store.append_snapshot(
+            request.snapshot_id,
+            request.timestamp,
+            request.joints,
+            request.instruction,
+            request.intent
+        )
@@ -27,49 +27,60 @@ def linear_assignment(cost_matrix):
     Simple wrapper for the linear_sum_assignment from scipy
     """
     x, y = linear_sum_assignment(cost_matrix)
-    return np.array(list(zip(x, y)))
+    return np.stack([x, y], axis=1)
+
+
+def iou_batch(bb_test, bb_gt):
+    """
+    Computes the IOU between every pair of bboxes in bb_test (N x 4+) and bb_gt (M x 4+),
+    all in the form [x1,y1,x2,y2]. Returns an N x M matrix; same values as iou() per pair.
+    """
+    bb_test = np.asarray(bb_test, dtype=np.float64)[:, None, :4]
+    bb_gt = np.asarray(bb_gt, dtype=np.float64)[None, :, :4]
+
+    xx1 = np.maximum(bb_test[..., 0], bb_gt[..., 0])
+    yy1 = np.maximum(bb_test[..., 1], bb_gt[..., 1])
+    xx2 = np.minimum(bb_test[..., 2], bb_gt[..., 2])
+    yy2 = np.minimum(bb_test[..., 3], bb_gt[..., 3])
+    w = np.maximum(0., xx2 - xx1)
+    h = np.maximum(0., yy2 - yy1)
+    wh = w * h
+    area_test = (bb_test[..., 2] - bb_test[..., 0]) * (bb_test[..., 3] - bb_test[..., 1])
+    area_gt = (bb_gt[..., 2] - bb_gt[..., 0]) * (bb_gt[..., 3] - bb_gt[..., 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return wh / (area_test + area_gt - wh)
 
 
 def associate_detections_to_trackers(detections, trackers, iou_threshold=0.3):
     """
     Assigns detections to tracked objects (both represented as bounding boxes)
     Returns 3 lists of matches, unmatched_detections, and unmatched_trackers.
+
+    The IOU matrix is computed in one vectorized pass and unmatched rows/columns are
+    found with boolean masks, so the cost stays low with many boxes per frame.
     """
     if len(trackers) == 0:
         return np.empty((0, 2), dtype=int), np.arange(len(detections)), np.empty((0), dtype=int)
+    if len(detections) == 0:
+        return np.empty((0, 2), dtype=int), np.empty((0), dtype=int), np.arange(len(trackers))
 
-    iou_matrix = np.zeros((len(detections), len(trackers)), dtype=np.float32)
-
-    for d, det in enumerate(detections):
-        for t, trk in enumerate(trackers):
-            iou_matrix[d, t] = iou(det[:4], trk[:4])
+    iou_matrix = iou_batch(detections, trackers).astype(np.float32)
 
     matched_indices = linear_assignment(-iou_matrix)
 
-    unmatched_detections = []
-    for d in range(len(detections)):
-        if matched_indices.ndim > 1 and d not in matched_indices[:, 0]:
-            unmatched_detections.append(d)
-    unmatched_trackers = []
-    for t in range(len(trackers)):
-        if matched_indices.ndim > 1 and t not in matched_indices[:, 1]:
-            unmatched_trackers.append(t)
-
-    # Filter out matches with low IOU
-    matches = []
-    if matched_indices.ndim > 1:
-        for m in matched_indices:
-            if iou_matrix[m[0], m[1]] < iou_threshold:
-                unmatched_detections.append(m[0])
-                unmatched_trackers.append(m[1])
-            else:
-                matches.append(m.reshape(1, 2))
-    if len(matches) == 0:
-        matches = np.empty((0, 2), dtype=int)
-    else:
-        matches = np.concatenate(matches, axis=0)
-
-    return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+    detection_assigned = np.zeros(len(detections), dtype=bool)
+    tracker_assigned = np.zeros(len(trackers), dtype=bool)
+    detection_assigned[matched_indices[:, 0]] = True
+    tracker_assigned[matched_indices[:, 1]] = True
+
+    # Filter out matches with low IOU; those go to the end of the unmatched lists
+    low_iou = iou_matrix[matched_indices[:, 0], matched_indices[:, 1]] < iou_threshold
+    matches = matched_indices[~low_iou].reshape(-1, 2)
+
+    unmatched_detections = np.concatenate([np.flatnonzero(~detection_assigned), matched_indices[low_iou, 0]])
+    unmatched_trackers = np.concatenate([np.flatnonzero(~tracker_assigned), matched_indices[low_iou, 1]])
+
+    return matches, unmatched_detections, unmatched_trackers
 
 class KalmanBoxTracker:
     """
@@ -135,6 +146,16 @@ class KalmanBoxTracker:
         self.history.append(self.convert_x_to_bbox(self.kf.x))
         return self.history[-1]
 
+    def advance(self):
+        """
+        Moves the state vector one frame forward without touching the age/hit
+        bookkeeping; used for frames that have no detections to associate.
+        """
+        if (self.kf.x[6] + self.kf.x[2]) <= 0:
+            self.kf.x[6] *= 0.0
+        self.kf.predict()
+        return self.get_state()
+
     def get_state(self):
         """
         Returns the current bounding box estimate.
@@ -172,19 +193,175 @@ class KalmanBoxTracker:
             return np.array([x1, y1, x2, y2, score]).reshape((1, 5))
 
 
+class KalmanBoxTrackerBatch:
+    """
+    The state of every tracked object in stacked arrays: the same constant velocity
+    Kalman filter as KalmanBoxTracker (same matrices, same filterpy update equations),
+    but predict/update run for all tracks at once instead of one filter object per track.
+    Rows are kept in the same order as Sort.trackers would be.
+    """
+    F = np.array([[1,0,0,0,1,0,0],
+                  [0,1,0,0,0,1,0],
+                  [0,0,1,0,0,0,1],
+                  [0,0,0,1,0,0,0],
+                  [0,0,0,0,1,0,0],
+                  [0,0,0,0,0,1,0],
+                  [0,0,0,0,0,0,1]], dtype=float)
+    H = np.array([[1,0,0,0,0,0,0],
+                  [0,1,0,0,0,0,0],
+                  [0,0,1,0,0,0,0],
+                  [0,0,0,1,0,0,0]], dtype=float)
+    R = np.eye(4)
+    R[2:,2:] *= 10.
+    Q = np.eye(7)
+    Q[-1,-1] *= 0.01
+    Q[4:,4:] *= 0.01
+    P0 = np.eye(7)
+    P0[4:,4:] *= 1000.  # Give high uncertainty to the unobservable initial velocities
+    P0 *= 10.
+
+    def __init__(self):
+        self.x = np.empty((0, 7, 1))
+        self.P = np.empty((0, 7, 7))
+        self.ids = np.empty(0, dtype=int)
+        self.time_since_update = np.empty(0, dtype=int)
+        self.hits = np.empty(0, dtype=int)
+        self.hit_streak = np.empty(0, dtype=int)
+        self.age = np.empty(0, dtype=int)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, bboxes):
+        """
+        Starts one track per bbox ([x1,y1,x2,y2] rows), using KalmanBoxTracker's id counter.
+        """
+        count = len(bboxes)
+        if count == 0:
+            return
+        x = np.zeros((count, 7, 1))
+        x[:, :4] = self.convert_bbox_to_z(bboxes)
+        ids = np.arange(KalmanBoxTracker.count, KalmanBoxTracker.count + count)
+        KalmanBoxTracker.count += count
+
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, np.broadcast_to(self.P0, (count, 7, 7))])
+        self.ids = np.concatenate([self.ids, ids])
+        zeros = np.zeros(count, dtype=int)
+        self.time_since_update = np.concatenate([self.time_since_update, zeros])
+        self.hits = np.concatenate([self.hits, zeros])
+        self.hit_streak = np.concatenate([self.hit_streak, zeros])
+        self.age = np.concatenate([self.age, zeros])
+
+    def keep(self, mask):
+        """
+        Drops every track where mask is False.
+        """
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+        self.ids = self.ids[mask]
+        self.time_since_update = self.time_since_update[mask]
+        self.hits = self.hits[mask]
+        self.hit_streak = self.hit_streak[mask]
+        self.age = self.age[mask]
+
+    def advance(self):
+        """
+        Moves every state vector one frame forward without touching the age/hit
+        bookkeeping and returns the predicted boxes as an N x 4 array.
+        """
+        shrinking = (self.x[:, 6, 0] + self.x[:, 2, 0]) <= 0
+        self.x[shrinking, 6] *= 0.0
+        self.x = np.matmul(self.F, self.x)
+        self.P = np.matmul(np.matmul(self.F, self.P), self.F.T) + self.Q
+        return self.get_state()
+
+    def predict(self):
+        """
+        Advances every track and returns the predicted boxes as an N x 4 array.
+        """
+        self.advance()
+        self.age += 1
+        self.hit_streak[self.time_since_update > 0] = 0
+        self.time_since_update += 1
+        return self.get_state()
+
+    def update(self, indices, bboxes):
+        """
+        Updates the tracks at `indices` with their observed bboxes (one row per index).
+        """
+        if len(indices) == 0:
+            return
+        self.time_since_update[indices] = 0
+        self.hits[indices] += 1
+        self.hit_streak[indices] += 1
+
+        x = self.x[indices]
+        P = self.P[indices]
+        z = self.convert_bbox_to_z(bboxes)
+
+        y = z - np.matmul(self.H, x)
+        PHT = np.matmul(P, self.H.T)
+        S = np.matmul(self.H, PHT) + self.R
+        K = np.matmul(PHT, np.linalg.inv(S))
+        x = x + np.matmul(K, y)
+        I_KH = np.eye(7) - np.matmul(K, self.H)
+        P = np.matmul(np.matmul(I_KH, P), np.swapaxes(I_KH, 1, 2)) + np.matmul(np.matmul(K, self.R), np.swapaxes(K, 1, 2))
+
+        self.x[indices] = x
+        self.P[indices] = P
+
+    def get_state(self):
+        """
+        Returns the current bounding box estimates as an N x 4 array.
+        """
+        return self.convert_x_to_bbox(self.x)
+
+    @staticmethod
+    def convert_bbox_to_z(bboxes):
+        """
+        Vectorized KalmanBoxTracker.convert_bbox_to_z: N x 4 boxes to N x 4 x 1 measurements.
+        """
+        bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        w = bboxes[:, 2] - bboxes[:, 0]
+        h = bboxes[:, 3] - bboxes[:, 1]
+        x = bboxes[:, 0] + w / 2.
+        y = bboxes[:, 1] + h / 2.
+        s = w * h
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = w / h
+        return np.stack([x, y, s, r], axis=1)[:, :, None]
+
+    @staticmethod
+    def convert_x_to_bbox(x):
+        """
+        Vectorized KalmanBoxTracker.convert_x_to_bbox: N x 7 x 1 states to N x 4 boxes.
+        """
+        x = x[:, :, 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = np.sqrt(x[:, 2] * x[:, 3])
+            h = x[:, 2] / w
+        return np.stack([x[:, 0] - w / 2., x[:, 1] - h / 2., x[:, 0] + w / 2., x[:, 1] + h / 2.], axis=1)
+
+
 class Sort:
     """
     SORT tracker
+
+    With batched=True all tracks live in one KalmanBoxTrackerBatch and are predicted and
+    updated with stacked array operations; the output is the same as the default mode.
     """
-    def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+    def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3, batched=False):
         """
         Sets key parameters for SORT
         """
         self.max_age = max_age
         self.min_hits = min_hits
         self.iou_threshold = iou_threshold
+        self.batched = batched
 
         self.trackers = []
+        self.tracks = KalmanBoxTrackerBatch() if batched else None
         self.frame_count = 0
 
     def update(self, dets=np.empty((0, 5))):
@@ -195,6 +372,9 @@ class Sort:
         Returns a similar array, where the last column is the object ID.
         Note: The number of objects returned may differ from the number of detections provided.
         """
+        if self.batched:
+            return self._update_batched(dets)
+
         self.frame_count += 1
 
         # Get predicted locations from existing trackers.
@@ -233,4 +413,65 @@ class Sort:
 
         if len(ret) > 0:
             return np.concatenate(ret)
-        return np.empty((0, 5))
\ No newline at end of file
+        return np.empty((0, 5))
+
+    def coast(self):
+        """
+        Advances every track by one frame without detections and returns the tracks that
+        the last update() reported, at their predicted positions, in the same format.
+
+        Call it for frames where detection was skipped: the Kalman state keeps moving
+        frame by frame, while track ages, hit streaks and max_age still count update()
+        calls only, so skipping detection does not expire or unconfirm tracks.
+        """
+        if self.batched:
+            tracks = self.tracks
+            boxes = tracks.advance()
+            order = np.arange(len(tracks))[::-1]
+            confirmed = (tracks.time_since_update[order] < 1) & (
+                (tracks.hit_streak[order] >= self.min_hits) | (self.frame_count <= self.min_hits)
+            )
+            order = order[confirmed & ~np.any(np.isnan(boxes[order]), axis=1)]
+            return np.concatenate([boxes[order], (tracks.ids[order] + 1)[:, None]], axis=1).reshape(-1, 5)
+
+        ret = []
+        for trk in reversed(self.trackers):
+            d = trk.advance()[0]
+            if np.any(np.isnan(d)):
+                continue
+            if (trk.time_since_update < 1) and (trk.hit_streak >= self.min_hits or self.frame_count <= self.min_hits):
+                ret.append(np.concatenate((d, [trk.id+1])).reshape(1, -1))
+        if len(ret) > 0:
+            return np.concatenate(ret)
+        return np.empty((0, 5))
+
+    def _update_batched(self, dets):
+        self.frame_count += 1
+        tracks = self.tracks
+
+        # Predict every track at once and drop those whose prediction became invalid
+        predicted = tracks.predict()
+        valid = ~np.any(np.isnan(predicted), axis=1)
+        if not np.all(valid):
+            tracks.keep(valid)
+            predicted = predicted[valid]
+
+        matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets, predicted, self.iou_threshold)
+
+        tracks.update(matched[:, 1], dets[matched[:, 0], :4])
+        tracks.add(dets[unmatched_dets.astype(int), :4])
+
+        # Same output order as the per-object mode: newest track first
+        order = np.arange(len(tracks))[::-1]
+        confirmed = (tracks.time_since_update[order] < 1) & (
+            (tracks.hit_streak[order] >= self.min_hits) | (self.frame_count <= self.min_hits)
+        )
+        order = order[confirmed]
+        ret = np.concatenate([tracks.get_state()[order], (tracks.ids[order] + 1)[:, None]], axis=1)
+
+        # Remove dead tracklets
+        tracks.keep(tracks.time_since_update <= self.max_age)
+
+        if len(ret) > 0:
+            return ret
+        return np.empty((0, 5))
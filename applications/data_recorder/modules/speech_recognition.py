@@ -1,37 +1,242 @@
 # modules/speech_recognition.py
 
-import speech_recognition as sr
+import os
+import json
+import threading
+import time
 from PyQt5.QtCore import pyqtSignal, QObject
+from modules.model_registry import get_model
+
+
+SPEECH_BACKENDS = ("google", "vosk")
+DEFAULT_VOSK_MODEL_PATH = "models/vosk-model-small-en-us-0.15"
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+class SpeechRecognitionError(Exception):
+    """
+    Raised by speech backends with a message suitable for the UI.
+    """
+
+
+class UnintelligibleSpeechError(SpeechRecognitionError):
+    """
+    Raised when audio was received but no words could be recognized in it.
+    """
+    def __init__(self, message="Unable to recognize speech"):
+        super().__init__(message)
+
+
+class GoogleSpeechBackend:
+    """
+    The online Google Web Speech API through the speech_recognition package. Needs the
+    network and only returns once the whole phrase has been uploaded, so there are no
+    partial results. One Recognizer and Microphone are kept for every call, and the
+    ambient noise level is only measured on the first one.
+    """
+    name = "google"
+
+    def __init__(self):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.microphone = None
+        self.calibrated = False
+        self.lock = threading.Lock()
+
+    def _recognize(self, audio):
+        try:
+            return self.recognizer.recognize_google(audio)  # type: ignore
+        except self.sr.RequestError:
+            # API was unreachable or unresponsive
+            raise SpeechRecognitionError("API unavailable")
+        except self.sr.UnknownValueError:
+            # Speech was unintelligible
+            raise UnintelligibleSpeechError()
+
+    def listen(self, duration=None, on_partial=None, stop_event=None):
+        with self.lock:
+            if self.microphone is None:
+                self.microphone = self.sr.Microphone()
+            with self.microphone as source:
+                if not self.calibrated:
+                    self.recognizer.adjust_for_ambient_noise(source)
+                    self.calibrated = True
+                print("Listening...")
+                audio = self.recognizer.listen(source, phrase_time_limit=duration)
+            print("Recognizing...")
+            return self._recognize(audio)
+
+    def transcribe(self, pcm, rate):
+        """
+        Transcribes 16-bit mono PCM bytes.
+        """
+        return self._recognize(self.sr.AudioData(pcm, rate, 2))
+
+
+class VoskSpeechBackend:
+    """
+    Offline recognition with a local Vosk (Kaldi) model, e.g. vosk-model-small-en-us
+    (about 40 MB, faster than real time on one CPU core).
+
+    The microphone is read in short blocks that are fed to the recognizer as they
+    arrive, so a hypothesis for the words heard so far is available every block and
+    the final text is ready as soon as the speaker stops. The model is loaded once
+    (through the model registry) and one recognizer is reused for every utterance.
+    """
+    name = "vosk"
+
+    def __init__(self, model_path=DEFAULT_VOSK_MODEL_PATH, sample_rate=16000, block_seconds=0.2,
+                 no_speech_timeout=10.0):
+        try:
+            import vosk
+        except ImportError:
+            raise SpeechRecognitionError("vosk is not installed (pip install vosk)")
+        self.vosk = vosk
+        vosk.SetLogLevel(-1)
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.block_size = int(sample_rate * block_seconds)
+        self.no_speech_timeout = no_speech_timeout
+        self.model = load_vosk_model(model_path)
+        self.recognizer = vosk.KaldiRecognizer(self.model, sample_rate)
+        self.audio = None
+        self.lock = threading.Lock()
+
+    def _final_text(self):
+        return json.loads(self.recognizer.FinalResult()).get("text", "")
+
+    def listen(self, duration=None, on_partial=None, stop_event=None):
+        """
+        Records from the microphone until the end of the first utterance (Vosk's
+        endpoint detection), duration seconds or stop_event, calling on_partial(text)
+        whenever the hypothesis changes. Returns the final text.
+        """
+        import pyaudio
+        with self.lock:
+            if self.audio is None:
+                self.audio = pyaudio.PyAudio()
+            self.recognizer.Reset()
+            stream = self.audio.open(
+                format=pyaudio.paInt16, channels=1, rate=self.sample_rate, input=True,
+                frames_per_buffer=self.block_size
+            )
+            print("Listening...")
+            segments = []
+            last_partial = ""
+            start = time.monotonic()
+            try:
+                while stop_event is None or not stop_event.is_set():
+                    elapsed = time.monotonic() - start
+                    if duration is not None and elapsed >= duration:
+                        break
+                    if not segments and not last_partial and elapsed >= self.no_speech_timeout:
+                        break
+                    data = stream.read(self.block_size, exception_on_overflow=False)
+                    if self.recognizer.AcceptWaveform(data):
+                        text = json.loads(self.recognizer.Result()).get("text", "")
+                        if text:
+                            # Endpoint after speech: the utterance is complete
+                            segments.append(text)
+                            break
+                    else:
+                        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+                        if partial and partial != last_partial and on_partial is not None:
+                            on_partial(partial)
+                        last_partial = partial
+                if not segments:
+                    text = self._final_text()
+                    if text:
+                        segments.append(text)
+            finally:
+                stream.stop_stream()
+                stream.close()
+            text = " ".join(segments)
+            if not text:
+                raise UnintelligibleSpeechError()
+            return text
+
+    def transcribe(self, pcm, rate):
+        """
+        Transcribes 16-bit mono PCM bytes recorded at `rate` (which must match the
+        backend's sample_rate).
+        """
+        if rate != self.sample_rate:
+            raise ValueError(f"Expected {self.sample_rate} Hz audio, got {rate} Hz")
+        with self.lock:
+            self.recognizer.Reset()
+            segments = []
+            step = self.block_size * 2
+            for offset in range(0, len(pcm), step):
+                if self.recognizer.AcceptWaveform(pcm[offset:offset + step]):
+                    text = json.loads(self.recognizer.Result()).get("text", "")
+                    if text:
+                        segments.append(text)
+            text = self._final_text()
+            if text:
+                segments.append(text)
+            return " ".join(segments)
+
+
+def load_vosk_model(model_path=DEFAULT_VOSK_MODEL_PATH):
+    """
+    Loads a Vosk model directory once; later calls reuse it.
+    """
+    if not os.path.isdir(model_path):
+        raise SpeechRecognitionError(
+            f"Vosk model not found at {model_path} (download one from https://alphacephei.com/vosk/models)"
+        )
+
+    def loader():
+        import vosk
+        return vosk.Model(model_path)
+    return get_model(f"vosk:{model_path}", loader)
+
+
+def get_speech_backend(name="google", **kwargs):
+    """
+    Returns the shared backend instance for `name` (created on first use with kwargs),
+    so every caller reuses the same loaded model and microphone setup.
+    """
+    if name not in SPEECH_BACKENDS:
+        raise ValueError(f"Unknown speech backend '{name}', expected one of {SPEECH_BACKENDS}")
+    key = (name, tuple(sorted(kwargs.items())))
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = GoogleSpeechBackend() if name == "google" else VoskSpeechBackend(**kwargs)
+            _backends[key] = backend
+        return backend
 
 
 class SpeechToTextWorker(QObject):
+    """
+    Transcribes one utterance from the microphone with a speech backend. For backends
+    that stream (vosk), `result` is emitted with each new partial hypothesis and then
+    with the final text; `finished` is always emitted last.
+    """
     finished = pyqtSignal()
     error = pyqtSignal(str)
     result = pyqtSignal(str)
 
-    def __init__(self, duration=None):
+    def __init__(self, duration=None, backend="google", backend_options=None):
         super().__init__()
         self.duration = duration  # Optional: limit listening duration
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.stop_event = threading.Event()
 
-    def run(self):
-        recognizer = sr.Recognizer()
-        microphone = sr.Microphone()
+    def stop(self):
+        self.stop_event.set()
 
+    def run(self):
         try:
-            with microphone as source:
-                recognizer.adjust_for_ambient_noise(source)
-                print("Listening...")
-                audio = recognizer.listen(source, phrase_time_limit=self.duration)
-            print("Recognizing...")
-            text = recognizer.recognize_google(audio)  # type: ignore
+            backend = get_speech_backend(self.backend, **self.backend_options)
+            text = backend.listen(self.duration, on_partial=self.result.emit, stop_event=self.stop_event)
             self.result.emit(text)
-        except sr.RequestError:
-            # API was unreachable or unresponsive
-            self.error.emit("API unavailable")
-        except sr.UnknownValueError:
-            # Speech was unintelligible
-            self.error.emit("Unable to recognize speech")
         except Exception as e:
             self.error.emit(str(e))
         finally:
-            self.finished.emit()
\ No newline at end of file
+            self.finished.emit()
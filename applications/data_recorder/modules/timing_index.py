@@ -0,0 +1,269 @@
+# modules/timing_index.py
+
+import threading
+import time
+import wave
+import cv2
+import numpy as np
+from modules.session_store import save_timing_index, load_timing_index
+
+
+class TimingIndexWriter:
+    """
+    Records when every video frame, audio chunk and snapshot of a session was captured,
+    on one clock (time.monotonic, in ms since the recording started).
+
+    The video is written at a nominal FRAME_RATE but frames arrive whenever the camera and
+    display deliver them, audio runs on the sound card's clock and snapshots are keyed by
+    wall-clock time, so none of their own timestamps line up. With this index they can be
+    sliced together by session time (see TimingIndex). Written to store/timing.npz on close.
+
+    add_* may be called from different threads (display, audio and camera threads).
+    """
+    def __init__(self, session_dir, origin_ms=None, origin_wall_ms=None):
+        self.session_dir = session_dir
+        self.origin_ms = origin_ms if origin_ms is not None else time.monotonic() * 1000
+        self.origin_wall_ms = origin_wall_ms if origin_wall_ms is not None else time.time() * 1000
+        self.lock = threading.Lock()
+        self.video_ms = []
+        self.audio_sample = []
+        self.audio_ms = []
+        self.audio_rate = 0
+        self.snapshot_ids = []
+        self.snapshot_timestamps = []
+        self.snapshot_ms = []
+        self.closed = False
+
+    def add_video_frame(self, capture_ms):
+        """
+        Called for each frame written to the video, in order, with its camera capture
+        time (time.monotonic() * 1000).
+        """
+        with self.lock:
+            self.video_ms.append(capture_ms - self.origin_ms)
+
+    def add_audio_chunk(self, first_sample, capture_ms, rate):
+        """
+        Called for each audio chunk written, with the index of its first sample and the
+        time that sample was captured.
+        """
+        with self.lock:
+            self.audio_rate = rate
+            self.audio_sample.append(first_sample)
+            self.audio_ms.append(capture_ms - self.origin_ms)
+
+    def add_snapshot(self, snapshot_id, timestamp, capture_ms):
+        """
+        Called for each snapshot with its store timestamp (wall-clock ms) and capture time.
+        """
+        with self.lock:
+            self.snapshot_ids.append(snapshot_id)
+            self.snapshot_timestamps.append(timestamp)
+            self.snapshot_ms.append(capture_ms - self.origin_ms)
+
+    def to_arrays(self):
+        with self.lock:
+            # Snapshots are written by a pool of threads; keep the index sorted by time
+            order = np.argsort(np.array(self.snapshot_ms, dtype=np.float64), kind="stable")
+            return {
+                "origin_wall_ms": np.array(self.origin_wall_ms, dtype=np.float64),
+                "video_ms": np.array(self.video_ms, dtype=np.float64),
+                "audio_rate": np.array(self.audio_rate, dtype=np.int32),
+                "audio_sample": np.array(self.audio_sample, dtype=np.int64),
+                "audio_ms": np.array(self.audio_ms, dtype=np.float64),
+                "snapshot_id": np.array(self.snapshot_ids, dtype=np.int64)[order],
+                "snapshot_timestamp": np.array(self.snapshot_timestamps, dtype=np.int64)[order],
+                "snapshot_ms": np.array(self.snapshot_ms, dtype=np.float64)[order],
+            }
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        save_timing_index(self.session_dir, self.to_arrays())
+
+
+class TimingIndex:
+    """
+    Aligned access to a recorded session by session time (ms since recording started).
+
+    Every lookup is a binary search over the sorted capture times in store/timing.npz,
+    so slicing a window costs O(log n) regardless of session length; only the requested
+    samples / frames / rows are then read from the files.
+    """
+    def __init__(self, session_dir):
+        arrays = load_timing_index(session_dir)
+        if arrays is None:
+            raise FileNotFoundError(f"No timing index in {session_dir}")
+        self.session_dir = session_dir
+        self.origin_wall_ms = float(arrays["origin_wall_ms"])
+        self.video_ms = arrays["video_ms"]
+        self.audio_rate = int(arrays["audio_rate"])
+        self.audio_sample = arrays["audio_sample"]
+        self.audio_ms = arrays["audio_ms"]
+        self.snapshot_ids = arrays["snapshot_id"]
+        self.snapshot_timestamps = arrays["snapshot_timestamp"]
+        self.snapshot_ms = arrays["snapshot_ms"]
+
+    @property
+    def duration_ms(self):
+        ends = [times[-1] for times in (self.video_ms, self.audio_ms, self.snapshot_ms) if len(times)]
+        return float(max(ends)) if ends else 0.0
+
+    def wall_to_session_ms(self, timestamp):
+        """
+        Converts wall-clock ms (as used for snapshot timestamps) to session time.
+        """
+        return np.asarray(timestamp, dtype=np.float64) - self.origin_wall_ms
+
+    def snapshot_session_ms(self, timestamps):
+        """
+        Converts snapshot store timestamps to session time using the capture times
+        recorded for them, so they are on the same monotonic clock as the video and audio
+        even if the wall clock was adjusted during the recording. Timestamps missing from
+        the index fall back to wall_to_session_ms.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        session_ms = self.wall_to_session_ms(timestamps)
+        if not len(self.snapshot_timestamps):
+            return session_ms
+        order = np.argsort(self.snapshot_timestamps, kind="stable")
+        known = self.snapshot_timestamps[order]
+        rows = np.minimum(np.searchsorted(known, timestamps), len(known) - 1)
+        found = known[rows] == timestamps
+        return np.where(found, self.snapshot_ms[order][rows], session_ms)
+
+    def video_frames(self, start_ms, end_ms):
+        """
+        Returns (first, stop): the video frames captured in [start_ms, end_ms).
+        """
+        first, stop = np.searchsorted(self.video_ms, [start_ms, end_ms], side="left")
+        return int(first), int(stop)
+
+    def nearest_video_frame(self, time_ms):
+        """
+        Returns the frame number(s) captured closest to time_ms (scalar or array), or
+        None if the session has no video frames.
+        """
+        if not len(self.video_ms):
+            return None
+        times = np.asarray(time_ms, dtype=np.float64)
+        right = np.minimum(np.searchsorted(self.video_ms, times), len(self.video_ms) - 1)
+        left = np.maximum(right - 1, 0)
+        closer_left = np.abs(self.video_ms[left] - times) <= np.abs(self.video_ms[right] - times)
+        nearest = np.where(closer_left, left, right)
+        return int(nearest) if nearest.ndim == 0 else nearest
+
+    def audio_samples(self, start_ms, end_ms):
+        """
+        Returns (first, stop): the audio samples captured in [start_ms, end_ms). Sample
+        times are interpolated between the chunk timestamps (and extrapolated at the
+        sample rate outside them), so the sound card clock's drift is followed.
+        """
+        if not len(self.audio_ms) or not self.audio_rate:
+            return 0, 0
+        samples = []
+        for time_ms in (start_ms, end_ms):
+            if time_ms <= self.audio_ms[0]:
+                sample = self.audio_sample[0] + (time_ms - self.audio_ms[0]) * self.audio_rate / 1000
+            elif time_ms >= self.audio_ms[-1]:
+                sample = self.audio_sample[-1] + (time_ms - self.audio_ms[-1]) * self.audio_rate / 1000
+            else:
+                sample = np.interp(time_ms, self.audio_ms, self.audio_sample)
+            samples.append(max(0, int(np.ceil(sample))))
+        return samples[0], max(samples[0], samples[1])
+
+    def audio_time_ms(self, samples):
+        """
+        The session time at which audio sample index/indices were captured (the inverse
+        of audio_samples).
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if not len(self.audio_ms) or not self.audio_rate:
+            return samples * 0.0
+        times = np.interp(samples, self.audio_sample, self.audio_ms)
+        # Extrapolate at the sample rate outside the recorded chunks
+        times = np.where(samples < self.audio_sample[0], self.audio_ms[0] + (samples - self.audio_sample[0]) * 1000 / self.audio_rate, times)
+        times = np.where(samples > self.audio_sample[-1], self.audio_ms[-1] + (samples - self.audio_sample[-1]) * 1000 / self.audio_rate, times)
+        return times
+
+    def snapshots(self, start_ms, end_ms):
+        """
+        Returns the store timestamps of the snapshots captured in [start_ms, end_ms).
+        """
+        first, stop = np.searchsorted(self.snapshot_ms, [start_ms, end_ms], side="left")
+        return self.snapshot_timestamps[first:stop]
+
+    def window(self, start_ms, end_ms):
+        """
+        Everything captured in [start_ms, end_ms), as index ranges into the session files.
+        """
+        return {
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "video_frames": self.video_frames(start_ms, end_ms),
+            "audio_samples": self.audio_samples(start_ms, end_ms),
+            "snapshot_timestamps": self.snapshots(start_ms, end_ms),
+        }
+
+    def read_audio(self, audio_path, start_ms, end_ms):
+        """
+        Reads only the window's samples from the session's WAV or FLAC file (int16,
+        shape (samples, channels)).
+        """
+        first, stop = self.audio_samples(start_ms, end_ms)
+        return read_audio_samples(audio_path, first, stop)
+
+    def read_video(self, video_path, start_ms, end_ms):
+        """
+        Returns the window's video frames as a list of (frame_number, frame).
+        """
+        first, stop = self.video_frames(start_ms, end_ms)
+        return read_video_frames(video_path, first, stop)
+
+    def read_joints(self, reader, start_ms, end_ms):
+        """
+        Returns (timestamps, joints) for the window's snapshots from a SessionStoreReader.
+        """
+        rows = [reader.index_of(timestamp) for timestamp in self.snapshots(start_ms, end_ms)]
+        rows = [row for row in rows if row is not None]
+        return reader.timestamps[rows], reader.joints[rows]
+
+
+def read_audio_samples(audio_path, first, stop):
+    """
+    Reads samples [first, stop) of a WAV (or, with soundfile, FLAC) file without reading
+    the rest of it. Returns int16 samples of shape (samples, channels).
+    """
+    if audio_path.lower().endswith(".flac"):
+        import soundfile as sf
+        with sf.SoundFile(audio_path) as f:
+            f.seek(min(first, f.frames))
+            return f.read(max(0, stop - first), dtype="int16", always_2d=True)
+    with wave.open(audio_path, "rb") as f:
+        channels = f.getnchannels()
+        first = min(first, f.getnframes())
+        f.setpos(first)
+        data = f.readframes(max(0, stop - first))
+    return np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+
+
+def read_video_frames(video_path, first, stop):
+    """
+    Decodes frames [first, stop): one seek to the start of the window, then sequential reads.
+    """
+    frames = []
+    if stop <= first:
+        return frames
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if first:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+        for frame_number in range(first, stop):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append((frame_number, frame))
+    finally:
+        cap.release()
+    return frames
@@ -0,0 +1,79 @@
+# modules/video_reader.py
+
+import cv2
+
+
+def timestamps_to_frame_numbers(timestamps, frame_rate, frame_count=None):
+    """
+    Maps millisecond timestamps (relative to the start of the video) to the nearest
+    frame numbers, clamped to the video length when frame_count is known.
+    """
+    frame_numbers = []
+    for timestamp in timestamps:
+        frame_number = int(round((timestamp / 1000) * frame_rate))
+        frame_number = max(0, frame_number)
+        if frame_count:
+            frame_number = min(frame_number, frame_count - 1)
+        frame_numbers.append(frame_number)
+    return frame_numbers
+
+
+def iter_video_frames(video_path, frame_numbers=None, stride=None):
+    """
+    Decodes a video once, front to back, and yields (frame_number, frame) for the
+    requested frames only.
+
+    Instead of seeking with CAP_PROP_POS_FRAMES (which re-decodes from the previous
+    keyframe on every call), frames that are not needed are skipped with grab(), which
+    decodes without converting/copying the image.
+
+    Parameters:
+        video_path (str): Path to the video file.
+        frame_numbers (iterable, optional): Frames to yield. Duplicates are yielded once.
+        stride (int, optional): Yield every Nth frame. Combined with frame_numbers if both are given.
+    """
+    wanted = sorted(set(frame_numbers)) if frame_numbers is not None else None
+    if wanted is None and not stride:
+        stride = 1
+    if wanted is not None and not wanted and not stride:
+        return
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        last_wanted = wanted[-1] if wanted and not stride else None
+        wanted_index = 0
+        frame_number = 0
+        while True:
+            if last_wanted is not None and frame_number > last_wanted:
+                break
+            if not cap.grab():
+                break
+
+            is_wanted = False
+            if wanted is not None:
+                while wanted_index < len(wanted) and wanted[wanted_index] < frame_number:
+                    wanted_index += 1
+                is_wanted = wanted_index < len(wanted) and wanted[wanted_index] == frame_number
+            if stride and frame_number % stride == 0:
+                is_wanted = True
+
+            if is_wanted:
+                ret, frame = cap.retrieve()
+                if ret:
+                    yield frame_number, frame
+            frame_number += 1
+    finally:
+        cap.release()
+
+
+def get_video_info(video_path):
+    """
+    Returns (frame_rate, frame_count) as reported by the container.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frame_rate = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    finally:
+        cap.release()
+    return frame_rate, frame_count
@@ -0,0 +1,46 @@
+# post_process.py
+
+import argparse
+import torch
+from modules.batch_post_processing import BatchPostProcessor
+from modules.emotion_detection import FACE_DETECTORS, DEFAULT_FACE_DETECTOR
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs detection, emotion and keypoint post-processing over recorded sessions."
+    )
+    parser.add_argument("--recordings", default="recordings", help="Base recordings directory")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per model batch")
+    parser.add_argument("--workers", type=int, default=4, help="Threads used for image decoding and writing")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Detection confidence threshold")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--no-detection", action="store_true", help="Skip DETR object detection")
+    parser.add_argument("--no-emotions", action="store_true", help="Skip DeepFace emotion analysis")
+    parser.add_argument("--face-detector", default=DEFAULT_FACE_DETECTOR, choices=FACE_DETECTORS,
+                        help="Face detector used before emotion analysis")
+    parser.add_argument("--no-keypoints", action="store_true", help="Skip SuperPoint keypoints")
+    parser.add_argument("--force", action="store_true", help="Reprocess snapshots already in the manifest")
+    args = parser.parse_args()
+
+    def report_progress(done, total):
+        print(f"Processed {done}/{total} snapshots")
+
+    processor = BatchPostProcessor(
+        device=args.device,
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        confidence_threshold=args.threshold,
+        run_detection=not args.no_detection,
+        run_emotions=not args.no_emotions,
+        run_keypoints=not args.no_keypoints,
+        progress_callback=report_progress,
+        force=args.force,
+        face_detector=args.face_detector
+    )
+    summary = processor.run(args.recordings)
+    print(f"Post-processing finished: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Tests import the app's packages the same way the scripts do (from modules import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
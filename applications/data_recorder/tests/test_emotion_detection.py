@@ -0,0 +1,37 @@
+# tests/test_emotion_detection.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("deepface")
+
+from modules.emotion_detection import EmotionAnalyzer, FACE_DETECTORS, load_emotion_model
+
+
+@pytest.fixture(scope="module")
+def emotion_model():
+    try:
+        return load_emotion_model()
+    except Exception as e:
+        # The weights are downloaded on first use
+        pytest.skip(f"DeepFace emotion weights unavailable: {e}")
+
+
+def test_face_detectors_are_registered_in_deepface():
+    from deepface.modules import modeling
+    assert set(FACE_DETECTORS) <= set(modeling.AVAILABLE_MODELS["face_detector"])
+
+
+def test_emotion_model_classifies_48x48_faces(emotion_model):
+    probabilities = np.asarray(emotion_model.predict(np.zeros((2, 48, 48, 1), np.float32), verbose=0))
+    assert probabilities.shape == (2, 7)
+
+
+def test_detector_backend_path_finds_no_face_in_blank_frame(emotion_model):
+    analyzer = EmotionAnalyzer("opencv")
+    # Go through DeepFace's detector instead of the bundled Haar cascade
+    analyzer.cascade = None
+    frame = np.zeros((240, 320, 3), np.uint8)
+    assert analyzer.detect_faces(frame) == []
+    assert analyzer.analyze(frame) == []
+    assert analyzer.stats()["images_without_faces"] == 1
@@ -0,0 +1,66 @@
+# tests/test_session_transcription.py
+
+import wave
+import numpy as np
+from modules.session_store import SessionStoreWriter, SessionStoreReader
+from modules.session_transcription import SessionTranscriber
+from modules.timing_index import TimingIndexWriter
+
+
+RATE = 16000
+ORIGIN_MS = 1000.0  # time.monotonic() * 1000 when recording started
+ORIGIN_WALL_MS = 1_700_000_000_000.0
+SPEECH_SECONDS = [(2.0, 3.0), (8.0, 9.0)]
+
+
+class FixedTextBackend:
+    def transcribe(self, pcm, rate):
+        return "hello"
+
+
+def write_tone_wav(path, seconds, bursts):
+    t = np.arange(int(RATE * seconds)) / RATE
+    on = np.zeros_like(t, dtype=bool)
+    for start, stop in bursts:
+        on |= (t >= start) & (t < stop)
+    samples = (np.sin(2 * np.pi * 300 * t) * 8000 * on).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(samples.tobytes())
+
+
+def test_snapshots_link_by_capture_time_when_wall_clock_jumps(tmp_path, monkeypatch):
+    session_dir = str(tmp_path)
+    write_tone_wav(str(tmp_path / "audio.wav"), 12, SPEECH_SECONDS)
+
+    # The wall clock jumped 6 s ahead right after the recording started, so each
+    # snapshot's wall timestamp is 6 s later than when it was actually captured
+    clock_jump_ms = 6000
+    captured_session_ms = [2500.0, 8500.0]
+    timestamps = [int(ORIGIN_WALL_MS + ms + clock_jump_ms) for ms in captured_session_ms]
+
+    store = SessionStoreWriter(session_dir, metadata={"audio": "audio.wav", "start_time": ORIGIN_WALL_MS / 1000})
+    timing = TimingIndexWriter(session_dir, origin_ms=ORIGIN_MS, origin_wall_ms=ORIGIN_WALL_MS)
+    timing.add_audio_chunk(0, ORIGIN_MS, RATE)
+    timing.add_audio_chunk(RATE * 12, ORIGIN_MS + 12000, RATE)
+    for snapshot_id, (timestamp, session_ms) in enumerate(zip(timestamps, captured_session_ms)):
+        store.append_snapshot(snapshot_id, timestamp, np.zeros((1, 3)))
+        timing.add_snapshot(snapshot_id, timestamp, ORIGIN_MS + session_ms)
+    store.close()
+    timing.close()
+
+    transcriber = SessionTranscriber(backend="google", workers=2, snapshot_margin_ms=0)
+    monkeypatch.setattr(transcriber, "_worker_backend", lambda: FixedTextBackend())
+    summary = transcriber.run(session_dir)
+    assert not summary["skipped"]
+    assert summary["transcribed_segments"] == 2
+
+    reader = SessionStoreReader(session_dir)
+    for timestamp, session_ms in zip(timestamps, captured_session_ms):
+        segments = reader.transcripts_for(timestamp)
+        # Exactly the segment spoken while the snapshot was captured, not the one at
+        # its (shifted) wall-clock time
+        assert len(segments) == 1
+        assert segments[0]["start_ms"] <= session_ms <= segments[0]["end_ms"]
@@ -0,0 +1,49 @@
+# track_sessions.py
+
+import os
+import argparse
+import torch
+from modules.offline_tracking import OfflineTracker
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs offline multi-object tracking over the video of each recorded session."
+    )
+    parser.add_argument("--recordings", default="recordings", help="Base recordings directory")
+    parser.add_argument("--stride", type=int, default=5, help="Run detection on every Nth frame")
+    parser.add_argument("--batch-size", type=int, default=8, help="Detection frames per model batch")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Detection confidence threshold")
+    parser.add_argument("--max-age", type=int, default=5, help="Detection steps a track survives unmatched")
+    parser.add_argument("--min-hits", type=int, default=2, help="Matches before a track is reported")
+    parser.add_argument("--inference-size", type=int, default=None, help="Long side of detection inputs in pixels")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--force", action="store_true", help="Re-track sessions that already have a track table")
+    args = parser.parse_args()
+
+    def report_progress(done, total):
+        print(f"  frame {done}/{total}", end="\r")
+
+    tracker = OfflineTracker(
+        device=args.device,
+        detection_stride=args.stride,
+        batch_size=args.batch_size,
+        confidence_threshold=args.threshold,
+        max_age=args.max_age,
+        min_hits=args.min_hits,
+        inference_size=args.inference_size,
+        progress_callback=report_progress
+    )
+    for session_folder in sorted(os.listdir(args.recordings)):
+        session_path = os.path.join(args.recordings, session_folder)
+        if not os.path.isdir(session_path):
+            continue
+        summary = tracker.run(session_path, force=args.force)
+        if summary.get("skipped"):
+            print(f"Skipping {session_path}: {summary['reason']}")
+        else:
+            print(f"Tracked {session_path}: {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# transcribe_sessions.py
+
+import os
+import argparse
+from modules.speech_recognition import SPEECH_BACKENDS, DEFAULT_VOSK_MODEL_PATH
+from modules.session_transcription import SessionTranscriber
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Transcribes the recorded audio of each session and links the speech to its snapshots."
+    )
+    parser.add_argument("--recordings", default="recordings", help="Base recordings directory")
+    parser.add_argument("--backend", default="vosk", choices=SPEECH_BACKENDS, help="Speech recognition backend")
+    parser.add_argument("--vosk-model", default=DEFAULT_VOSK_MODEL_PATH, help="Vosk model directory")
+    parser.add_argument("--workers", type=int, default=4, help="Speech segments transcribed in parallel")
+    parser.add_argument("--min-silence-ms", type=int, default=500, help="Pause that ends a speech segment")
+    parser.add_argument("--max-segment-ms", type=int, default=20000, help="Longer segments are split")
+    parser.add_argument("--margin-ms", type=int, default=1000, help="Link snapshots this close to a segment")
+    parser.add_argument("--force", action="store_true", help="Re-transcribe sessions that already have transcripts")
+    args = parser.parse_args()
+
+    def report_progress(done, total):
+        print(f"  sample {done}/{total}", end="\r")
+
+    transcriber = SessionTranscriber(
+        backend=args.backend,
+        backend_options={"model_path": args.vosk_model} if args.backend == "vosk" else {},
+        workers=args.workers,
+        vad_options={"min_silence_ms": args.min_silence_ms, "max_segment_ms": args.max_segment_ms},
+        snapshot_margin_ms=args.margin_ms,
+        progress_callback=report_progress
+    )
+    for session_folder in sorted(os.listdir(args.recordings)):
+        session_path = os.path.join(args.recordings, session_folder)
+        if not os.path.isdir(session_path):
+            continue
+        try:
+            summary = transcriber.run(session_path, force=args.force)
+        except Exception as e:
+            # e.g. an unreadable audio file; carry on with the other sessions
+            print(f"Skipping {session_path}: {e}")
+            continue
+        if summary.get("skipped"):
+            print(f"Skipping {session_path}: {summary['reason']}")
+        else:
+            print(f"Transcribed {session_path}: {summary}")
+
+
+if __name__ == "__main__":
+    main()